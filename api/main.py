@@ -1,5 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from api.routes import router as chat_router
+from config import settings
+from core.async_db import close_async_client
+from core.indexes import ensure_indexes
+from core.invalidation import InvalidationListener, ensure_invalidation_indexes
+from core.metrics import registry as metrics_registry
+from services.lexical_index import lexical_indexes
+from services.local_vector_store import local_vector_stores
+from services.retriever_registry import retriever_registry
+from services.session_store import session_store
+from workers.file_event_source import seed_local_stores
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Dựng retriever graph một lần khi khởi động thay vì ở request đầu tiên
+    retriever_registry.get()
+
+    if settings.PROVIDER_MODE == "local":
+        # Không có Mongo/Kafka: nạp chỉ mục trong bộ nhớ từ file, không cần listener
+        await asyncio.to_thread(seed_local_stores)
+        yield
+        return
+
+    # Nhận thông báo vô hiệu hóa cache từ Kafka consumer / cleanup job
+    ensure_invalidation_indexes()
+    session_store.ensure_indexes()
+    # Index theo job_id/deadline và filter field của vector index cho pre_filter
+    ensure_indexes()
 
-app = FastAPI(title="Smart RAG Chatbot Service")
+    # Backend vector cục bộ phải có dữ liệu trước khi nhận request
+    if settings.VECTOR_BACKEND == "local":
+        await asyncio.wrap_future(local_vector_stores.start())
+
+    # Chỉ mục BM25 được dựng ở nền; trong lúc chờ chỉ dùng vector search
+    if settings.LEXICAL_SEARCH_ENABLED:
+        lexical_indexes.start()
+    listener = InvalidationListener(
+        settings.CACHE_INVALIDATION_POLL_SECONDS, settings.CACHE_INVALIDATION_OVERLAP_SECONDS)
+    listener_task = asyncio.create_task(listener.run_forever())
+    yield
+    listener_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener_task
+    await close_async_client()
+
+
+app = FastAPI(title="Smart RAG Chatbot Service", lifespan=lifespan)
 app.include_router(chat_router, prefix="/api/v1")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Định dạng text của Prometheus
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
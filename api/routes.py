@@ -1,10 +1,34 @@
-from fastapi import APIRouter
-from schemas.common import ChatRequest
+from fastapi import APIRouter, HTTPException
+from schemas.common import ChatRequest, SessionResponse
 from services.rag_service import process_query_stream
+from services.session_store import session_store
 from fastapi.responses import StreamingResponse
 
 router = APIRouter()
 
 @router.post("/chat")
 async def chat_endpoint(request: ChatRequest):
-    return StreamingResponse(process_query_stream(request.query, request.history), media_type="text/event-stream")
+    session = None
+    if request.session_id:
+        session = await session_store.get(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+    return StreamingResponse(process_query_stream(
+        request.query, request.history, session=session, include_timings=request.include_timings), media_type="text/event-stream")
+
+@router.post("/sessions", response_model=SessionResponse)
+async def create_session():
+    session = await session_store.create()
+    return SessionResponse(session_id=session.session_id)
+
+@router.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str):
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return SessionResponse(session_id=session.session_id, messages=session.messages, summary=session.summary)
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
@@ -0,0 +1,451 @@
+# FILE: benchmarks/chat_load.py
+"""
+Benchmark tải end-to-end cho /api/v1/chat.
+
+Nhiều client đồng thời, mỗi client chạy các hội thoại gồm một câu hỏi đầu và
+các câu hỏi nối tiếp, lấy từ corpus dựng từ data/jobs.json và data/policies.txt.
+Đo time-to-first-token (gói answer_chunk đầu tiên), thời gian cả stream,
+throughput và tỉ lệ lỗi; kết quả được lưu JSON để so sánh giữa các lần chạy.
+
+Mặc định gọi thẳng api.main:app trong process (PROVIDER_MODE=local nếu chưa đặt),
+hoặc một server đang chạy với --url.
+
+    python -m benchmarks.chat_load --concurrency 32 --conversations 200
+    python -m benchmarks.chat_load --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ingestion import iter_json_array
+
+CHAT_PATH = "/api/v1/chat"
+SESSIONS_PATH = "/api/v1/sessions"
+PERCENTILES = (50, 95, 99)
+
+WORK_TYPE_TEXT = {"REMOTE": "làm từ xa", "HYBRID": "hybrid", "ON_SITE": "tại văn phòng"}
+EXPERIENCE_TEXT = {
+    "INTERN": "thực tập sinh", "FRESHER": "fresher", "ENTRY_LEVEL": "mới ra trường",
+    "MID_LEVEL": "2-3 năm kinh nghiệm", "SENIOR_LEVEL": "senior", "EXECUTIVE": "quản lý",
+}
+JOB_FIRST_TURNS = [
+    "Có việc {title} ở {city} không?",
+    "Tìm việc {title} {work_type}",
+    "Tôi là {experience}, có vị trí {title} nào phù hợp không?",
+    "Việc {title} ở {district}, {city} lương khoảng {salary} USD",
+]
+JOB_FOLLOW_UPS = [
+    "Còn ở {other_city} thì sao?",
+    "Mức lương bao nhiêu?",
+    "Yêu cầu kinh nghiệm thế nào?",
+    "Có làm remote được không?",
+    "Công việc đó có phúc lợi gì?",
+    "Hạn nộp hồ sơ khi nào?",
+]
+POLICY_FIRST_TURNS = [
+    "Quy định về {topic} là gì?",
+    "CareerZone có chính sách gì về {topic}?",
+    "Cho tôi biết về {topic} trên CareerZone",
+]
+POLICY_FOLLOW_UPS = [
+    "Nếu vi phạm thì sao?",
+    "Giải thích rõ hơn được không?",
+    "Điều đó có áp dụng cho nhà tuyển dụng không?",
+    "Tóm tắt lại giúp tôi",
+]
+CITIES = ["Hà Nội", "TP. Hồ Chí Minh", "Đà Nẵng"]
+
+_POLICY_TOPIC_RE = re.compile(r"\*\*([^*:]{4,80}):\*\*")
+
+
+@dataclass
+class Conversation:
+    kind: str
+    turns: List[str]
+
+
+@dataclass
+class RequestResult:
+    kind: str  # "first" hoặc "follow_up"
+    ok: bool
+    status: int
+    ttft: Optional[float]
+    latency: float
+    chunks: int
+    error: Optional[str] = None
+    # Tổng thời gian (giây) theo từng bước, từ gói "timings" khi chạy với --timings
+    stages: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class RunStats:
+    results: List[RequestResult] = field(default_factory=list)
+    started: float = 0.0
+    finished: float = 0.0
+
+
+def build_corpus(jobs_path: str, policies_path: str, conversations: int, follow_ups: int,
+                 policy_ratio: float, seed: int) -> List[Conversation]:
+    """Hội thoại tất định theo seed: câu đầu từ một job/mục chính sách, sau đó tối đa `follow_ups` câu nối tiếp."""
+    rng = random.Random(seed)
+    jobs = [job for job in iter_json_array(jobs_path) if job.get("title")]
+    with open(policies_path, "r", encoding="utf-8") as f:
+        topics = sorted({topic.strip().lower() for topic in _POLICY_TOPIC_RE.findall(f.read())})
+
+    corpus = []
+    for _ in range(conversations):
+        if topics and rng.random() < policy_ratio:
+            kind, first = "policy", rng.choice(POLICY_FIRST_TURNS).format(topic=rng.choice(topics))
+            pool = POLICY_FOLLOW_UPS
+        else:
+            job = rng.choice(jobs)
+            location = job.get("location") or {}
+            city = location.get("city") if location.get("city") in CITIES else rng.choice(CITIES)
+            kind, first = "job", rng.choice(JOB_FIRST_TURNS).format(
+                title=job["title"],
+                city=city,
+                district=location.get("district") or "Quận 1",
+                work_type=WORK_TYPE_TEXT.get(job.get("workType"), ""),
+                experience=EXPERIENCE_TEXT.get(job.get("experience"), "mới ra trường"),
+                salary=job.get("minSalary") or 1000,
+            ).strip()
+            pool = [turn.format(other_city=rng.choice([c for c in CITIES if c != city]))
+                    for turn in JOB_FOLLOW_UPS]
+        corpus.append(Conversation(kind, [first] + rng.sample(pool, rng.randint(0, min(follow_ups, len(pool))))))
+    return corpus
+
+
+# --- Transport ---
+
+
+class InProcessClient:
+    """
+    Gọi ASGI app trực tiếp. httpx.ASGITransport chỉ trả response sau khi app chạy
+    xong nên không đo được TTFT; ở đây mỗi gói body được nhận ngay khi app gửi.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def stream(self, path: str, payload: Optional[dict]) -> AsyncIterator[tuple]:
+        body = json.dumps(payload or {}).encode("utf-8")
+        queue: asyncio.Queue = asyncio.Queue()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            await queue.put(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"host", b"benchmark")],
+            "client": ("127.0.0.1", 0), "server": ("benchmark", 80), "root_path": "",
+        }
+        task = asyncio.create_task(self.app(scope, receive, send))
+        try:
+            status = 0
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    task.result()  # Ném lại lỗi của app nếu có
+                    if queue.empty():
+                        return
+                    continue
+                message = getter.result()
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                elif message["type"] == "http.response.body":
+                    yield status, message.get("body", b"")
+                    if not message.get("more_body", False):
+                        return
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @asynccontextmanager
+    async def running(self):
+        async with self.app.router.lifespan_context(self.app):
+            yield self
+
+
+class HttpClient:
+    """Gọi server thật qua HTTP, dùng khi cần đo cả uvicorn và mạng."""
+
+    def __init__(self, base_url: str, timeout: float):
+        import httpx
+        self._client = httpx.AsyncClient(base_url=base_url, timeout=timeout)
+
+    async def stream(self, path: str, payload: Optional[dict]) -> AsyncIterator[tuple]:
+        async with self._client.stream("POST", path, json=payload or {}) as response:
+            async for chunk in response.aiter_bytes():
+                yield response.status_code, chunk
+
+    @asynccontextmanager
+    async def running(self):
+        try:
+            yield self
+        finally:
+            await self._client.aclose()
+
+
+# --- Chạy tải ---
+
+
+async def _send_turn(client, payload: dict, kind: str) -> tuple:
+    started = time.perf_counter()
+    ttft = None
+    status = 0
+    chunks = 0
+    buffer = b""
+    answer = []
+    stages: Dict[str, float] = {}
+    try:
+        async for status, body in client.stream(CHAT_PATH, payload):
+            buffer += body
+            while b"\n\n" in buffer:
+                event, buffer = buffer.split(b"\n\n", 1)
+                if not event.startswith(b"data: "):
+                    continue
+                packet = json.loads(event[len(b"data: "):])
+                if packet.get("type") == "answer_chunk":
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    chunks += 1
+                    answer.append(packet.get("data", ""))
+                elif packet.get("type") == "timings":
+                    for item in packet["data"]["spans"]:
+                        stages[item["stage"]] = stages.get(item["stage"], 0.0) + item["ms"] / 1000
+        ok = status == 200 and chunks > 0
+        error = None if ok else f"HTTP {status}, {chunks} chunks"
+    except Exception as e:
+        ok, error = False, f"{type(e).__name__}: {e}"
+    result = RequestResult(kind, ok, status, ttft, time.perf_counter() - started, chunks, error, stages)
+    return result, "".join(answer)
+
+
+async def _run_conversation(client, conversation: Conversation, use_sessions: bool,
+                            include_timings: bool) -> List[RequestResult]:
+    results = []
+    history: List[dict] = []
+    session_id = None
+    if use_sessions:
+        body = b"".join([chunk async for _, chunk in client.stream(SESSIONS_PATH, None)])
+        session_id = json.loads(body)["session_id"]
+    for index, query in enumerate(conversation.turns):
+        payload = {"query": query, "session_id": session_id} if use_sessions else {"query": query, "history": history}
+        payload["include_timings"] = include_timings
+        result, answer = await _send_turn(client, payload, "first" if index == 0 else "follow_up")
+        results.append(result)
+        if not result.ok:
+            break
+        history = history + [{"role": "user", "content": query}, {"role": "assistant", "content": answer}]
+    return results
+
+
+async def run_load(client, corpus: List[Conversation], concurrency: int, use_sessions: bool,
+                   include_timings: bool = False) -> RunStats:
+    stats = RunStats()
+    queue: asyncio.Queue = asyncio.Queue()
+    for conversation in corpus:
+        queue.put_nowait(conversation)
+
+    async def worker():
+        while not queue.empty():
+            stats.results.extend(await _run_conversation(
+                client, queue.get_nowait(), use_sessions, include_timings))
+
+    stats.started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats.finished = time.perf_counter()
+    return stats
+
+
+# --- Báo cáo ---
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": round(float(np.percentile(values, p)) * 1000, 2) for p in PERCENTILES}
+
+
+def summarize(results: List[RequestResult], elapsed: float) -> dict:
+    ok = [r for r in results if r.ok]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+        "ttft_ms": _percentiles([r.ttft for r in ok if r.ttft is not None]),
+        "latency_ms": _percentiles([r.latency for r in ok]),
+        "chunks_per_answer": round(float(np.mean([r.chunks for r in ok])), 1) if ok else 0.0,
+    }
+
+
+def build_report(stats: RunStats, args: argparse.Namespace) -> dict:
+    elapsed = stats.finished - stats.started
+    by_kind = {kind: summarize([r for r in stats.results if r.kind == kind], elapsed)
+               for kind in ("first", "follow_up")}
+    errors: Dict[str, int] = {}
+    for result in stats.results:
+        if result.error:
+            errors[result.error] = errors.get(result.error, 0) + 1
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "environment": _environment(),
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(stats.results, elapsed),
+        "by_kind": by_kind,
+        "top_errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:10]),
+        "stages_ms": _stage_percentiles([r for r in stats.results if r.ok]),
+    }
+
+
+def _stage_percentiles(results: List[RequestResult]) -> Dict[str, Dict[str, Optional[float]]]:
+    stages = sorted({stage for result in results for stage in result.stages})
+    return {stage: _percentiles([r.stages[stage] for r in results if stage in r.stages]) for stage in stages}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _environment() -> dict:
+    # Các setting ảnh hưởng đến độ trễ, để biết hai lần chạy có so sánh được không
+    from config import settings
+    keys = [
+        "PROVIDER_MODE", "VECTOR_BACKEND", "FAKE_LLM_FIRST_TOKEN_LATENCY_MS", "FAKE_LLM_TOKENS_PER_SECOND",
+        "FAKE_LLM_RESPONSE_TOKENS", "SEMANTIC_CACHE_ENABLED", "SPECULATIVE_RETRIEVAL_ENABLED",
+        "CONDENSE_CLASSIFIER_ENABLED", "LEXICAL_SEARCH_ENABLED", "FAST_ROUTER_ENABLED",
+        "FILTER_EXTRACTION_ENABLED", "SESSION_BACKEND",
+    ]
+    return {key: getattr(settings, key, None) for key in keys}
+
+
+def print_report(report: dict) -> None:
+    print(f"\n=== /chat benchmark ({report['elapsed_s']}s, commit {report['git_commit']}) ===")
+    header = ["", "req", "err%", "rps", "ttft p50", "p95", "p99", "lat p50", "p95", "p99"]
+    print("".join(f"{cell:>10}" for cell in header))
+    for name, summary in [("overall", report["overall"]), *report["by_kind"].items()]:
+        cells = [name, summary["requests"], f"{summary['error_rate'] * 100:.2f}", summary["throughput_rps"]]
+        for metric in ("ttft_ms", "latency_ms"):
+            cells.extend("-" if value is None else f"{value:.1f}" for value in summary[metric].values())
+        print("".join(f"{cell:>10}" for cell in cells))
+    if report["stages_ms"]:
+        print(f"\n{'bước':<20}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES))
+        for stage, values in report["stages_ms"].items():
+            print(f"{stage:<20}" + "".join(f"{value:>10.1f}" for value in values.values()))
+    for error, count in report["top_errors"].items():
+        print(f"  lỗi x{count}: {error}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Các chỉ số overall xấu đi quá `tolerance` (tỉ lệ) so với baseline."""
+    regressions = []
+    current, previous = report["overall"], baseline["overall"]
+    for metric in ("ttft_ms", "latency_ms"):
+        for p, value in current[metric].items():
+            old = previous.get(metric, {}).get(p)
+            if value is not None and old and value > old * (1 + tolerance):
+                regressions.append(f"{metric} {p}: {old:.1f} -> {value:.1f} ms")
+    if previous.get("throughput_rps") and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+    if current["error_rate"] > previous.get("error_rate", 0.0):
+        regressions.append(f"error_rate: {previous.get('error_rate', 0.0)} -> {current['error_rate']}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark tải cho /api/v1/chat.")
+    parser.add_argument("--url", help="Gọi server đang chạy thay vì api.main:app trong process.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--follow-ups", type=int, default=2, help="Số câu nối tiếp tối đa mỗi hội thoại.")
+    parser.add_argument("--policy-ratio", type=float, default=0.3)
+    parser.add_argument("--warmup", type=int, default=5, help="Số hội thoại chạy trước, không tính vào kết quả.")
+    parser.add_argument("--sessions", action="store_true", help="Dùng session phía server thay vì gửi history.")
+    parser.add_argument("--timings", action="store_true",
+                        help="Yêu cầu gói \"timings\" và báo cáo thời gian theo từng bước của pipeline.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--jobs-file", default="data/jobs.json")
+    parser.add_argument("--policies-file", default="data/policies.txt")
+    parser.add_argument("--output", help="File JSON kết quả (mặc định benchmarks/results/chat_load_<thời gian>.json).")
+    parser.add_argument("--compare", help="File JSON của lần chạy trước để so sánh.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Mức xấu đi cho phép khi --compare.")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(args.jobs_file, args.policies_file, args.warmup + args.conversations,
+                          args.follow_ups, args.policy_ratio, args.seed)
+    warmup, corpus = corpus[:args.warmup], corpus[args.warmup:]
+    if args.url:
+        client = HttpClient(args.url, args.timeout)
+    else:
+        # Mặc định không gọi mạng để kết quả lặp lại được
+        os.environ.setdefault("PROVIDER_MODE", "local")
+        from api.main import app
+        client = InProcessClient(app)
+
+    async with client.running():
+        if warmup:
+            await run_load(client, warmup, args.concurrency, args.sessions, args.timings)
+        stats = await run_load(client, corpus, args.concurrency, args.sessions, args.timings)
+    return build_report(stats, args)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(_main(args))
+    print_report(report)
+
+    output = Path(args.output or f"benchmarks/results/chat_load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Đã lưu kết quả vào {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Chậm hơn baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("Không có chỉ số nào xấu đi so với baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,3 +16,195 @@ KAFKA_SECURITY_ENABLED = os.getenv(
     "KAFKA_SECURITY_ENABLED", "False").lower() in ("true", "1", "t")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_LLM_MODEL = os.getenv("OPENROUTER_LLM_MODEL")
+
+# Cấu hình retriever (được retriever registry theo dõi để hot reload)
+JOBS_VECTOR_INDEX = os.getenv("JOBS_VECTOR_INDEX", "jobs_vector_index")
+POLICIES_VECTOR_INDEX = os.getenv(
+    "POLICIES_VECTOR_INDEX", "policies_vector_index")
+JOBS_RETRIEVER_K = int(os.getenv("JOBS_RETRIEVER_K", "10"))
+POLICIES_RETRIEVER_K = int(os.getenv("POLICIES_RETRIEVER_K", "3"))
+# Khoảng thời gian (giây) giữa hai lần kiểm tra file .env để hot reload
+RETRIEVER_RELOAD_CHECK_SECONDS = float(
+    os.getenv("RETRIEVER_RELOAD_CHECK_SECONDS", "30"))
+
+# Router cục bộ chạy trước LLM router
+FAST_ROUTER_ENABLED = os.getenv(
+    "FAST_ROUTER_ENABLED", "True").lower() in ("true", "1", "t")
+# Độ chênh lệch cosine tối thiểu giữa nguồn tốt nhất và nguồn thứ hai để bỏ qua LLM
+FAST_ROUTER_MARGIN = float(os.getenv("FAST_ROUTER_MARGIN", "0.05"))
+
+# Semantic cache cho câu trả lời
+SEMANTIC_CACHE_ENABLED = os.getenv(
+    "SEMANTIC_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(
+    os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "900"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+# Thông báo vô hiệu hóa cache giữa các process (qua collection cache_invalidations)
+CACHE_INVALIDATION_POLL_SECONDS = float(
+    os.getenv("CACHE_INVALIDATION_POLL_SECONDS", "5"))
+CACHE_INVALIDATION_RETENTION_SECONDS = int(
+    os.getenv("CACHE_INVALIDATION_RETENTION_SECONDS", "86400"))
+# Mỗi lần poll đọc lại thông báo trong khoảng này trước mốc đã đọc, để không bỏ sót
+# thông báo có _id nhỏ hơn nhưng ghi sau (đồng hồ lệch giữa các process, ghi chậm)
+CACHE_INVALIDATION_OVERLAP_SECONDS = float(
+    os.getenv("CACHE_INVALIDATION_OVERLAP_SECONDS", "60"))
+
+# Embedding và cache embedding
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+# Đường dẫn file SQLite cho tầng cache trên đĩa, để trống để tắt
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+# Nạp dữ liệu ban đầu (scripts/initial_load.py)
+INITIAL_LOAD_BATCH_SIZE = int(os.getenv("INITIAL_LOAD_BATCH_SIZE", "64"))
+INITIAL_LOAD_CONCURRENCY = int(os.getenv("INITIAL_LOAD_CONCURRENCY", "4"))
+INITIAL_LOAD_MAX_RETRIES = int(os.getenv("INITIAL_LOAD_MAX_RETRIES", "6"))
+INITIAL_LOAD_CHECKPOINT_DIR = os.getenv(
+    "INITIAL_LOAD_CHECKPOINT_DIR", ".checkpoints")
+
+# Kafka consumer: "batch" (micro-batch, commit thủ công), "pool" (nhiều worker song song,
+# xem workers/kafka_worker_pool.py) hoặc "single" (từng message)
+KAFKA_CONSUMER_MODE = os.getenv("KAFKA_CONSUMER_MODE", "batch").lower()
+KAFKA_BATCH_MAX_RECORDS = int(os.getenv("KAFKA_BATCH_MAX_RECORDS", "200"))
+KAFKA_BATCH_MAX_WAIT_MS = int(os.getenv("KAFKA_BATCH_MAX_WAIT_MS", "1000"))
+KAFKA_BATCH_RETRY_SECONDS = float(os.getenv("KAFKA_BATCH_RETRY_SECONDS", "5"))
+
+# Connection pool MongoDB (dùng cho cả client sync và async)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(
+    os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+# Truy vấn song song khi router không chọn được nguồn
+RETRIEVER_SOURCE_TIMEOUT_SECONDS = float(
+    os.getenv("RETRIEVER_SOURCE_TIMEOUT_SECONDS", "5"))
+# Số thread tối đa của mỗi nguồn ở đường sync; nguồn đã dùng hết (các lần gọi quá
+# timeout vẫn đang chạy) bị bỏ qua thay vì xếp hàng
+RETRIEVER_SOURCE_MAX_WORKERS = int(os.getenv("RETRIEVER_SOURCE_MAX_WORKERS", "4"))
+FALLBACK_MAX_DOCS = int(os.getenv("FALLBACK_MAX_DOCS", "10"))
+FALLBACK_MAX_CONTEXT_CHARS = int(
+    os.getenv("FALLBACK_MAX_CONTEXT_CHARS", "12000"))
+
+# Truy xuất speculative song song với bước condense câu hỏi
+SPECULATIVE_RETRIEVAL_ENABLED = os.getenv(
+    "SPECULATIVE_RETRIEVAL_ENABLED", "False").lower() in ("true", "1", "t")
+# Cosine tối thiểu giữa câu hỏi độc lập và câu hỏi speculative để giữ kết quả
+SPECULATIVE_SIMILARITY_THRESHOLD = float(
+    os.getenv("SPECULATIVE_SIMILARITY_THRESHOLD", "0.9"))
+
+# Bỏ qua bước condense khi câu hỏi đã độc lập (không có đại từ/từ chỉ định)
+CONDENSE_CLASSIFIER_ENABLED = os.getenv(
+    "CONDENSE_CLASSIFIER_ENABLED", "True").lower() in ("true", "1", "t")
+# Câu hỏi có số từ không vượt quá ngưỡng này luôn được condense
+CONDENSE_SHORT_QUERY_WORDS = int(os.getenv("CONDENSE_SHORT_QUERY_WORDS", "3"))
+# Giới hạn lịch sử gửi cho bước condense
+CONDENSE_MAX_MESSAGES = int(os.getenv("CONDENSE_MAX_MESSAGES", "6"))
+CONDENSE_MAX_HISTORY_TOKENS = int(os.getenv("CONDENSE_MAX_HISTORY_TOKENS", "1500"))
+
+# Session hội thoại phía server: "memory" hoặc "mongo" (collection chat_sessions)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+# Số tin nhắn tối đa giữ lại cho mỗi session (ring buffer)
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "20"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_IN_MEMORY = int(os.getenv("SESSION_MAX_IN_MEMORY", "10000"))
+# Tóm tắt các lượt bị đẩy ra khỏi ring buffer bằng LLM (chạy nền)
+SESSION_SUMMARY_ENABLED = os.getenv(
+    "SESSION_SUMMARY_ENABLED", "True").lower() in ("true", "1", "t")
+
+# Ngữ cảnh cho QA prompt: ngân sách token (ước lượng) và tỉ lệ shingle chung để bỏ đoạn gần trùng
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# Tìm kiếm từ khóa BM25 trong bộ nhớ, gộp với vector search bằng RRF
+LEXICAL_SEARCH_ENABLED = os.getenv(
+    "LEXICAL_SEARCH_ENABLED", "True").lower() in ("true", "1", "t")
+
+# Trích bộ lọc job (thành phố, cấp bậc, lương...) từ câu hỏi bằng gazetteer cục bộ
+FILTER_EXTRACTION_ENABLED = os.getenv(
+    "FILTER_EXTRACTION_ENABLED", "True").lower() in ("true", "1", "t")
+# Số VND cho một đơn vị lương trong dữ liệu job (USD), dùng để quy đổi "20 triệu"
+SALARY_VND_PER_UNIT = float(os.getenv("SALARY_VND_PER_UNIT", "25000"))
+
+# Backend vector search: "atlas" ($vectorSearch) hoặc "local" (ma trận NumPy trong process)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "atlas").lower()
+# Backend cục bộ: "exact" (quét toàn bộ) hoặc "ivf" (chỉ quét các cụm gần nhất)
+LOCAL_VECTOR_SEARCH_MODE = os.getenv("LOCAL_VECTOR_SEARCH_MODE", "exact").lower()
+LOCAL_VECTOR_IVF_LISTS = int(os.getenv("LOCAL_VECTOR_IVF_LISTS", "64"))
+LOCAL_VECTOR_IVF_PROBES = int(os.getenv("LOCAL_VECTOR_IVF_PROBES", "8"))
+# Thư mục snapshot (memory-map) để khởi động nhanh, để trống để tắt
+LOCAL_VECTOR_SNAPSHOT_DIR = os.getenv("LOCAL_VECTOR_SNAPSHOT_DIR", "")
+
+# Chế độ provider: "remote" (OpenRouter, Gemini, MongoDB, Kafka) hoặc "local"
+# (LLM giả lập streaming, embedding băm tất định, vector store trong bộ nhớ nạp
+# từ file) để đo tải trên máy không có mạng và cho kết quả lặp lại được
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "remote").lower()
+# LLM giả lập: độ trễ token đầu, tốc độ sinh và độ dài câu trả lời (số token)
+FAKE_LLM_FIRST_TOKEN_LATENCY_MS = float(os.getenv("FAKE_LLM_FIRST_TOKEN_LATENCY_MS", "200"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+FAKE_LLM_RESPONSE_TOKENS = int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "60"))
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "768"))
+# Dữ liệu nạp vào vector store trong bộ nhớ khi API khởi động ở chế độ local
+LOCAL_POLICIES_FILE = os.getenv("LOCAL_POLICIES_FILE", "data/policies.txt")
+LOCAL_JOB_EVENTS_FILE = os.getenv("LOCAL_JOB_EVENTS_FILE", "data/job_events.jsonl")
+LOCAL_JOB_EVENTS_BATCH_SIZE = int(os.getenv("LOCAL_JOB_EVENTS_BATCH_SIZE", "64"))
+
+if PROVIDER_MODE == "local":
+    # Không có Atlas/Mongo: vector search và session đều chạy trong process
+    VECTOR_BACKEND = "local"
+    SESSION_BACKEND = "memory"
+    EMBEDDING_MODEL = f"local-hash-{FAKE_EMBEDDING_DIM}"
+
+# Luôn gửi gói "timings" (thời gian từng bước của request) ở cuối stream SSE,
+# kể cả khi request không đặt include_timings
+SSE_TIMINGS_ENABLED = os.getenv(
+    "SSE_TIMINGS_ENABLED", "False").lower() in ("true", "1", "t")
+
+# Cleanup job hết hạn: chạy liên tục theo batch nhỏ thay vì một lần mỗi đêm
+EXPIRY_INTERVAL_SECONDS = float(os.getenv("EXPIRY_INTERVAL_SECONDS", "60"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+# Thời gian tối đa cho một lần chạy, phần còn lại để lần sau
+EXPIRY_TIME_BUDGET_SECONDS = float(os.getenv("EXPIRY_TIME_BUDGET_SECONDS", "5"))
+EXPIRY_BATCH_PAUSE_SECONDS = float(os.getenv("EXPIRY_BATCH_PAUSE_SECONDS", "0.1"))
+
+# Tự tạo/cập nhật Atlas vector search index (kèm filter field) khi khởi động;
+# tắt nếu index được quản lý ngoài ứng dụng hoặc tài khoản không có quyền
+SEARCH_INDEX_AUTO_CREATE = os.getenv(
+    "SEARCH_INDEX_AUTO_CREATE", "True").lower() in ("true", "1", "t")
+# Số chiều vector của EMBEDDING_MODEL, dùng khi tạo vector search index
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "768"))
+
+# KAFKA_CONSUMER_MODE=pool: số worker xử lý song song (sự kiện cùng jobId luôn vào cùng worker)
+KAFKA_POOL_WORKERS = int(os.getenv("KAFKA_POOL_WORKERS", "4"))
+# Partition bị pause khi có quá số message chưa xử lý xong này, resume khi còn một nửa
+KAFKA_POOL_MAX_IN_FLIGHT_PER_PARTITION = int(
+    os.getenv("KAFKA_POOL_MAX_IN_FLIGHT_PER_PARTITION", "1000"))
+# Chu kỳ in lag/throughput của từng partition
+KAFKA_POOL_REPORT_SECONDS = float(os.getenv("KAFKA_POOL_REPORT_SECONDS", "30"))
+# Thời gian chờ xử lý xong message của partition bị thu hồi khi rebalance
+KAFKA_POOL_REVOKE_TIMEOUT_SECONDS = float(os.getenv("KAFKA_POOL_REVOKE_TIMEOUT_SECONDS", "30"))
+
+# Retry sự kiện Kafka lỗi (exponential backoff có jitter) trước khi đưa vào dead-letter queue
+KAFKA_EVENT_MAX_RETRIES = int(os.getenv("KAFKA_EVENT_MAX_RETRIES", "5"))
+KAFKA_EVENT_RETRY_BASE_SECONDS = float(os.getenv("KAFKA_EVENT_RETRY_BASE_SECONDS", "1"))
+KAFKA_EVENT_RETRY_MAX_SECONDS = float(os.getenv("KAFKA_EVENT_RETRY_MAX_SECONDS", "60"))
+# Dead-letter queue: "mongo" (collection KAFKA_DLQ_COLLECTION) hoặc "file" (JSONL, dùng khi chạy offline)
+KAFKA_DLQ_BACKEND = os.getenv("KAFKA_DLQ_BACKEND", "mongo").lower()
+KAFKA_DLQ_COLLECTION = os.getenv("KAFKA_DLQ_COLLECTION", "job_events_dlq")
+KAFKA_DLQ_FILE = os.getenv("KAFKA_DLQ_FILE", "data/job_events_dlq.jsonl")
+
+# Điều phối gọi embedding API (core/embedding_service.py)
+# Cửa sổ gom các embed_query đồng thời thành một request
+EMBEDDING_COALESCE_WINDOW_MS = float(os.getenv("EMBEDDING_COALESCE_WINDOW_MS", "5"))
+# Số văn bản tối đa mỗi request tới provider (Gemini: 100)
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "100"))
+# Số request tới provider mỗi giây của process này (0 = không giới hạn)
+EMBEDDING_RATE_LIMIT_PER_SECOND = float(os.getenv("EMBEDDING_RATE_LIMIT_PER_SECOND", "0"))
+EMBEDDING_RATE_LIMIT_BURST = int(os.getenv("EMBEDDING_RATE_LIMIT_BURST", "10"))
+# Số request tới provider chạy đồng thời
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8"))
@@ -0,0 +1,35 @@
+# core/async_db.py
+"""
+Truy cập MongoDB bất đồng bộ cho luồng /chat.
+Dùng AsyncMongoClient của pymongo nên các truy vấn (kể cả $vectorSearch) không
+chặn event loop và không phải đẩy sang thread pool mặc định.
+"""
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+
+from config import settings
+from core.db import mongo_client_options
+
+_async_client: Optional[AsyncMongoClient] = None
+
+
+def get_async_client() -> AsyncMongoClient:
+    # Tạo lười để client gắn với event loop của uvicorn thay vì lúc import
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncMongoClient(
+            settings.MONGODB_URI, **mongo_client_options())
+    return _async_client
+
+
+def get_async_db() -> AsyncDatabase:
+    return get_async_client()[settings.DB_NAME]
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
@@ -1,5 +1,21 @@
 from pymongo import MongoClient
 from config import settings
 
-mongo_client = MongoClient(settings.MONGODB_URI)
+
+def mongo_client_options() -> dict:
+    """Cấu hình connection pool dùng chung cho MongoClient và AsyncMongoClient."""
+    return dict(
+        # Trả về datetime có múi giờ (UTC) để so sánh được với datetime.now(timezone.utc)
+        tz_aware=True,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    )
+
+
+mongo_client = MongoClient(settings.MONGODB_URI, **mongo_client_options())
 db = mongo_client[settings.DB_NAME]
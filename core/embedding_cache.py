@@ -0,0 +1,149 @@
+# core/embedding_cache.py
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from core.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Khóa cache: (model, loại embedding, văn bản đã chuẩn hóa).
+# Loại embedding cần thiết vì Gemini dùng task_type khác nhau cho query và document.
+CacheKey = Tuple[str, str, str]
+
+
+class _DiskTier:
+    """Tầng cache trên đĩa (SQLite) để giữ embedding qua các lần khởi động lại."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT, kind TEXT, text TEXT, vector BLOB, "
+            "PRIMARY KEY (model, kind, text))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND kind = ? AND text = ?", key
+                ).fetchone()
+                if row is not None:
+                    found[key] = array("f", row[0]).tolist()
+        return found
+
+    def put_many(self, items: Dict[CacheKey, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, kind, text, vector) VALUES (?, ?, ?, ?)",
+                [(*key, array("f", vector).tobytes())
+                 for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Bọc một model embedding với cache LRU trong bộ nhớ (và tùy chọn trên đĩa).
+    embed_query/embed_documents chỉ gọi API cho những văn bản chưa có trong cache.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, max_entries: int, disk_path: Optional[str] = None):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        # Lưu vector dạng float32 (array) để giảm bộ nhớ so với list[float]
+        self._memory: "OrderedDict[CacheKey, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, kind: str, text: str) -> CacheKey:
+        return (self.model_name, kind, normalize_text(text))
+
+    def _lookup(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector.tolist()
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if self._disk is not None and missing:
+            from_disk = self._disk.get_many(missing)
+            if from_disk:
+                self._remember(from_disk)
+                found.update(from_disk)
+        return found
+
+    def _remember(self, items: Dict[CacheKey, List[float]]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._memory[key] = array("f", vector)
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, items: Dict[CacheKey, List[float]]) -> None:
+        self._remember(items)
+        if self._disk is not None:
+            self._disk.put_many(items)
+
+    def _plan(self, kind: str, texts: List[str]) -> Tuple[List[CacheKey], Dict[CacheKey, List[float]], Dict[CacheKey, str]]:
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(keys)
+        # Mỗi văn bản thiếu chỉ gọi API một lần dù xuất hiện nhiều lần trong batch
+        to_embed: Dict[CacheKey, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in to_embed:
+                to_embed[key] = text
+        self.hits += len(keys) - len(to_embed)
+        self.misses += len(to_embed)
+        return keys, found, to_embed
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, to_embed = self._plan("document", texts)
+        if to_embed:
+            vectors = self.underlying.embed_documents(list(to_embed.values()))
+            new_items = dict(zip(to_embed.keys(), vectors))
+            self._store(new_items)
+            found.update(new_items)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, to_embed = self._plan("query", [text])
+        if to_embed:
+            vector = self.underlying.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, to_embed = self._plan("document", texts)
+        if to_embed:
+            vectors = await self.underlying.aembed_documents(list(to_embed.values()))
+            new_items = dict(zip(to_embed.keys(), vectors))
+            self._store(new_items)
+            found.update(new_items)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, to_embed = self._plan("query", [text])
+        if to_embed:
+            vector = await self.underlying.aembed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
@@ -0,0 +1,213 @@
+# core/embedding_service.py
+"""
+Lớp điều phối gọi embedding API, nằm giữa CachedEmbeddings và model thật.
+
+- Các embed_query đồng thời (API chat) được gom trong cửa sổ
+  EMBEDDING_COALESCE_WINDOW_MS thành một request batch.
+- embed_documents (initial load, Kafka consumer) được chia thành batch tối đa
+  EMBEDDING_MAX_BATCH_SIZE văn bản, mỗi batch là một request.
+- Hàng đợi ưu tiên: request query luôn được gửi trước request bulk, nên reindex
+  không làm tăng độ trễ của chat.
+- Token bucket giới hạn số request gửi tới provider mỗi giây; tối đa
+  EMBEDDING_MAX_CONCURRENCY request chạy cùng lúc.
+- Độ sâu hàng đợi, thời gian chờ và kích thước batch được xuất ở /metrics.
+
+Giới hạn tốc độ áp dụng trong từng process: khi API và worker chạy ở các process
+khác nhau, EMBEDDING_RATE_LIMIT_PER_SECOND của mỗi process là phần quota chia cho nó.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from core.metrics import registry
+
+QUERY = 0
+BULK = 1
+PRIORITY_NAMES = {QUERY: "query", BULK: "bulk"}
+
+QUEUE_DEPTH = registry.gauge(
+    "embedding_queue_depth", "Số request embedding đang chờ theo mức ưu tiên (query, bulk).")
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "embedding_queue_wait_seconds", "Thời gian request embedding chờ trong hàng đợi (giây).")
+BATCH_SIZE = registry.histogram(
+    "embedding_batch_size", "Số văn bản mỗi request gửi tới provider embedding.",
+    (1, 2, 4, 8, 16, 32, 64, 100))
+PROVIDER_SECONDS = registry.histogram(
+    "embedding_provider_seconds", "Thời gian một request tới provider embedding (giây).")
+
+
+class TokenBucket:
+    """Token bucket: tối đa `rate` request mỗi giây, cho phép dồn tới `burst` request."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    seq: int
+    texts: List[str] = field(compare=False)
+    future: Future = field(compare=False)
+    enqueued: float = field(compare=False, default_factory=time.monotonic)
+
+
+class CoalescingEmbeddings(Embeddings):
+    def __init__(
+        self,
+        underlying: Embeddings,
+        window_ms: float,
+        max_batch_size: int,
+        rate_per_second: float,
+        burst: int,
+        max_concurrency: int,
+        embed_queries: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    ):
+        """
+        `embed_queries` embed nhiều câu query trong một request (ví dụ Gemini
+        embed_documents với task_type RETRIEVAL_QUERY). Nếu không có, mỗi query
+        vẫn đi qua hàng đợi và bộ giới hạn nhưng được gọi riêng bằng embed_query.
+        """
+        self.underlying = underlying
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.embed_queries = embed_queries
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+        self._heap: List[_Request] = []
+        # Số request đang chờ theo mức ưu tiên và tổng số văn bản query đang chờ
+        self._depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self._queued_query_texts = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        for priority, name in PRIORITY_NAMES.items():
+            QUEUE_DEPTH.set_function(lambda p=priority: self.queue_depth(p), priority=name)
+        threading.Thread(target=self._dispatch_forever, name="embedding-dispatcher", daemon=True).start()
+
+    def queue_depth(self, priority: int) -> int:
+        with self._cond:
+            return self._depth[priority]
+
+    def _submit(self, priority: int, texts: List[str]) -> Future:
+        future: Future = Future()
+        with self._cond:
+            heapq.heappush(self._heap, _Request(priority, next(self._seq), texts, future))
+            self._depth[priority] += 1
+            if priority == QUERY:
+                self._queued_query_texts += len(texts)
+            self._cond.notify()
+        return future
+
+    def _pop(self) -> _Request:
+        request = heapq.heappop(self._heap)
+        self._depth[request.priority] -= 1
+        if request.priority == QUERY:
+            self._queued_query_texts -= len(request.texts)
+        return request
+
+    def _next_batch(self) -> List[_Request]:
+        """Chờ tới khi có batch để gửi: các query đầu hàng đợi (sau cửa sổ gom) hoặc một request bulk."""
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                first = self._heap[0]
+                if first.priority == BULK:
+                    return [self._pop()]
+                remaining = first.enqueued + self.window - time.monotonic()
+                if remaining <= 0 or self._queued_query_texts >= self.max_batch_size:
+                    batch, size = [], 0
+                    while self._heap and self._heap[0].priority == QUERY and size < self.max_batch_size:
+                        request = self._pop()
+                        batch.append(request)
+                        size += len(request.texts)
+                    return batch
+                self._cond.wait(remaining)
+
+    def _wait_for_work(self) -> None:
+        with self._cond:
+            while not self._heap:
+                self._cond.wait()
+
+    def _dispatch_forever(self) -> None:
+        while True:
+            # Chờ slot và token trước khi chọn batch, để batch được chọn theo mức ưu tiên
+            # tại lúc thực sự gửi: query đến trong lúc chờ vẫn được gửi trước bulk
+            self._slots.acquire()
+            self._wait_for_work()
+            self._bucket.acquire()
+            batch = self._next_batch()
+            self._executor.submit(self._run, batch)
+
+    def _embed(self, priority: int, texts: List[str]) -> List[List[float]]:
+        if priority == BULK:
+            return self.underlying.embed_documents(texts)
+        if self.embed_queries is not None:
+            return self.embed_queries(texts)
+        return [self.underlying.embed_query(text) for text in texts]
+
+    def _run(self, batch: List[_Request]) -> None:
+        priority = PRIORITY_NAMES[batch[0].priority]
+        try:
+            started = time.monotonic()
+            texts = [text for request in batch for text in request.texts]
+            for request in batch:
+                QUEUE_WAIT_SECONDS.observe(started - request.enqueued, priority=priority)
+            BATCH_SIZE.observe(len(texts), priority=priority)
+            try:
+                vectors = self._embed(batch[0].priority, texts)
+            finally:
+                PROVIDER_SECONDS.observe(time.monotonic() - started, priority=priority)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+    def _submit_documents(self, texts: List[str]) -> List[Future]:
+        return [self._submit(BULK, texts[start:start + self.max_batch_size])
+                for start in range(0, len(texts), self.max_batch_size)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [vector for future in self._submit_documents(texts) for vector in future.result()]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(QUERY, [text]).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in self._submit_documents(texts)))
+        return [vector for vectors in results for vector in vectors]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await asyncio.wrap_future(self._submit(QUERY, [text])))[0]
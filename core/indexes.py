@@ -0,0 +1,78 @@
+# core/indexes.py
+"""
+Index của các collection vector, tạo khi khởi động (API, Kafka consumer, initial load).
+
+- Index thường trên `jobs_vector`: (job_id, content_hash) cho upsert/xóa theo job,
+  `deadline` cho cleanup job hết hạn.
+- Atlas vector search index: field `embedding` và các filter field mà pre_filter
+  của $vectorSearch dùng. Field chưa được khai báo ở đây thì Atlas từ chối pre_filter.
+"""
+import logging
+from typing import Sequence
+
+from pymongo.errors import PyMongoError
+from pymongo.operations import SearchIndexModel
+
+from config import settings
+from core.db import db
+
+logger = logging.getLogger(__name__)
+
+# Các field metadata của chunk job dùng trong pre_filter của $vectorSearch
+JOB_FILTER_FIELDS = (
+    "deadline", "city", "district", "experience", "workType", "type", "category",
+    "minSalary", "maxSalary",
+)
+
+
+def ensure_job_indexes() -> None:
+    """Index thường của `jobs_vector`; create_index không làm gì nếu index đã tồn tại."""
+    jobs_collection = db["jobs_vector"]
+    try:
+        # Prefix job_id dùng cho cả find/delete_many theo job_id
+        jobs_collection.create_index([("job_id", 1), ("content_hash", 1)])
+        jobs_collection.create_index("deadline")
+    except PyMongoError as e:
+        logger.warning(f"Could not create jobs_vector indexes: {e}")
+
+
+def vector_index_definition(filter_fields: Sequence[str]) -> dict:
+    return {
+        "fields": [
+            {"type": "vector", "path": "embedding",
+             "numDimensions": settings.EMBEDDING_DIMENSIONS, "similarity": "cosine"},
+            *({"type": "filter", "path": field} for field in filter_fields),
+        ]
+    }
+
+
+def ensure_vector_search_index(collection_name: str, index_name: str, filter_fields: Sequence[str]) -> None:
+    """
+    Tạo vector search index nếu chưa có, hoặc cập nhật nếu index đang thiếu filter field.
+    Atlas dựng index bất đồng bộ nên hàm này không chờ index sẵn sàng.
+    """
+    collection = db[collection_name]
+    definition = vector_index_definition(filter_fields)
+    try:
+        existing = next(iter(collection.list_search_indexes(index_name)), None)
+        if existing is None:
+            collection.create_search_index(
+                SearchIndexModel(definition=definition, name=index_name, type="vectorSearch"))
+            logger.info(f"Created vector search index '{index_name}' on {collection_name}.")
+            return
+        declared = {field.get("path") for field in existing.get("latestDefinition", {}).get("fields", [])
+                    if field.get("type") == "filter"}
+        missing = [field for field in filter_fields if field not in declared]
+        if missing:
+            collection.update_search_index(index_name, definition)
+            logger.info(f"Updated vector search index '{index_name}': added filter fields {missing}.")
+    except PyMongoError as e:
+        # Mongo không phải Atlas hoặc tài khoản không có quyền quản lý search index
+        logger.warning(f"Could not ensure vector search index '{index_name}': {e}")
+
+
+def ensure_indexes() -> None:
+    ensure_job_indexes()
+    if settings.SEARCH_INDEX_AUTO_CREATE:
+        ensure_vector_search_index("jobs_vector", settings.JOBS_VECTOR_INDEX, JOB_FILTER_FIELDS)
+        ensure_vector_search_index("policies_vector", settings.POLICIES_VECTOR_INDEX, ())
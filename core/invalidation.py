@@ -0,0 +1,129 @@
+# core/invalidation.py
+"""
+Thông báo vô hiệu hóa cache khi dữ liệu job thay đổi.
+
+Kafka consumer và cleanup job thường chạy ở process khác với API, nên mỗi
+thông báo vừa được phát cho các subscriber trong cùng process, vừa được ghi vào
+collection `cache_invalidations` để API poll và phát lại cho subscriber của nó.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from config import settings
+from core.async_db import get_async_db
+from core.db import db
+
+logger = logging.getLogger(__name__)
+
+# Vô hiệu hóa toàn bộ (ví dụ sau khi nạp lại dữ liệu)
+WILDCARD = "*"
+
+# Định danh process để không xử lý lại thông báo do chính mình phát ra
+PROCESS_ID = uuid.uuid4().hex
+
+invalidations_collection = db["cache_invalidations"]
+
+_subscribers: List[Callable[[List[str]], None]] = []
+
+
+def subscribe(callback: Callable[[List[str]], None]) -> None:
+    """Đăng ký callback nhận danh sách job_id bị thay đổi/xóa."""
+    _subscribers.append(callback)
+
+
+def _dispatch(job_ids: List[str]) -> None:
+    for callback in list(_subscribers):
+        try:
+            callback(job_ids)
+        except Exception as e:
+            logger.error(f"Invalidation subscriber failed: {e}", exc_info=True)
+
+
+def publish_invalidation(job_ids: Iterable[str], reason: str) -> None:
+    ids = sorted({str(job_id) for job_id in job_ids if job_id})
+    if not ids:
+        return
+    _dispatch(ids)
+    if settings.PROVIDER_MODE == "local":
+        # Không có Mongo: mọi thành phần chạy trong cùng process với API
+        return
+    try:
+        invalidations_collection.insert_one({
+            "job_ids": ids,
+            "reason": reason,
+            "origin": PROCESS_ID,
+            "createdAt": datetime.now(timezone.utc),
+        })
+    except PyMongoError as e:
+        logger.warning(f"Could not persist invalidation for {len(ids)} jobs: {e}")
+
+
+def ensure_invalidation_indexes() -> None:
+    # Thông báo chỉ cần giữ đủ lâu để mọi process kịp poll
+    try:
+        invalidations_collection.create_index(
+            "createdAt", expireAfterSeconds=settings.CACHE_INVALIDATION_RETENTION_SECONDS)
+    except PyMongoError as e:
+        logger.warning(f"Could not create cache_invalidations TTL index: {e}")
+
+
+class InvalidationListener:
+    """
+    Poll `cache_invalidations` và phát lại các thông báo từ process khác.
+
+    _id (ObjectId) do từng process ghi tạo ra nên không tăng đơn điệu giữa các
+    process: thông báo ghi sau có thể có _id nhỏ hơn mốc đã đọc. Vì vậy mỗi lần
+    poll đọc lại cửa sổ `overlap_seconds` trước thời điểm mới nhất đã thấy và bỏ
+    qua các _id đã xử lý.
+    """
+
+    def __init__(self, poll_seconds: float, overlap_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._latest: Optional[datetime] = None
+        # _id đã xử lý trong cửa sổ overlap -> thời điểm tạo
+        self._seen: Dict[ObjectId, datetime] = {}
+
+    async def poll(self) -> int:
+        now = datetime.now(timezone.utc)
+        starting = self._latest is None
+        if starting:
+            self._latest = now
+        since = self._latest - self.overlap
+        collection = get_async_db()[invalidations_collection.name]
+        cursor = collection.find(
+            {"_id": {"$gt": ObjectId.from_datetime(since)}},
+            projection={"job_ids": 1, "origin": 1},
+        ).sort("_id", 1)
+        count = 0
+        async for record in cursor:
+            record_id = record["_id"]
+            if record_id in self._seen:
+                continue
+            created = record_id.generation_time
+            self._seen[record_id] = created
+            # Không để đồng hồ chạy nhanh của một process đẩy cửa sổ đọc về tương lai
+            self._latest = max(self._latest, min(created, now))
+            # Cache rỗng khi khởi động nên bỏ qua các thông báo cũ
+            if starting or record.get("origin") == PROCESS_ID:
+                continue
+            _dispatch(record.get("job_ids", []))
+            count += 1
+        # _id cũ hơn cửa sổ sẽ không được đọc lại nữa
+        horizon = self._latest - self.overlap - timedelta(seconds=1)
+        self._seen = {record_id: created for record_id, created in self._seen.items() if created >= horizon}
+        return count
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except PyMongoError as e:
+                logger.warning(f"Polling cache invalidations failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
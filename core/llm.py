@@ -2,25 +2,82 @@
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_openai import ChatOpenAI
 
-from config.settings import GOOGLE_API_KEY, OPENROUTER_API_KEY, OPENROUTER_LLM_MODEL
+from config.settings import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_COALESCE_WINDOW_MS,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MODEL,
+    EMBEDDING_RATE_LIMIT_BURST,
+    EMBEDDING_RATE_LIMIT_PER_SECOND,
+    FAKE_EMBEDDING_DIM,
+    FAKE_LLM_FIRST_TOKEN_LATENCY_MS,
+    FAKE_LLM_RESPONSE_TOKENS,
+    FAKE_LLM_TOKENS_PER_SECOND,
+    GOOGLE_API_KEY,
+    OPENROUTER_API_KEY,
+    OPENROUTER_LLM_MODEL,
+    PROVIDER_MODE,
+)
+from core.embedding_cache import CachedEmbeddings
+from core.embedding_service import CoalescingEmbeddings
+from core.local_providers import FakeStreamingChatModel, HashEmbeddings
 
 # Khởi tạo một lần và tái sử dụng
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=GOOGLE_API_KEY
-)
+if PROVIDER_MODE == "local":
+    # Chế độ local: không gọi mạng, dùng cho đo tải và CI
+    _base_embeddings = HashEmbeddings(dim=FAKE_EMBEDDING_DIM)
+    _embed_queries = _base_embeddings.embed_documents
+    # Mô hình để sinh câu trả lời
+    llm = FakeStreamingChatModel(
+        first_token_latency_ms=FAKE_LLM_FIRST_TOKEN_LATENCY_MS,
+        tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND,
+        response_tokens=FAKE_LLM_RESPONSE_TOKENS,
+    )
+    # Mô hình để trích xuất metadata
+    structured_llm = llm
+else:
+    _base_embeddings = GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        google_api_key=GOOGLE_API_KEY
+    )
+
+    # Nhiều câu query trong một request batch, cùng task type với embed_query
+    def _embed_queries(texts):
+        return _base_embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+
+    # Mô hình để sinh câu trả lời (không streaming)
+    llm = ChatOpenAI(
+        model=OPENROUTER_LLM_MODEL,
+        openai_api_key=OPENROUTER_API_KEY,
+        openai_api_base="https://openrouter.ai/api/v1",
+        temperature=0.1
+    )
+
+    # Mô hình để trích xuất metadata (không streaming)
+    structured_llm = ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash-latest",
+        temperature=0,
+        google_api_key=GOOGLE_API_KEY
+    )
 
-# Mô hình để sinh câu trả lời (không streaming)
-llm = ChatOpenAI(
-    model=OPENROUTER_LLM_MODEL,
-    openai_api_key=OPENROUTER_API_KEY,
-    openai_api_base="https://openrouter.ai/api/v1",
-    temperature=0.1
+# Mọi lời gọi tới provider (API, Kafka consumer, initial load) đi qua hàng đợi ưu tiên
+# có gom batch và giới hạn tốc độ
+_coalescing_embeddings = CoalescingEmbeddings(
+    _base_embeddings,
+    window_ms=EMBEDDING_COALESCE_WINDOW_MS,
+    max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+    rate_per_second=EMBEDDING_RATE_LIMIT_PER_SECOND,
+    burst=EMBEDDING_RATE_LIMIT_BURST,
+    max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+    embed_queries=_embed_queries,
 )
 
-# Mô hình để trích xuất metadata (không streaming)
-structured_llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash-latest",
-    temperature=0,
-    google_api_key=GOOGLE_API_KEY
+# Router, retriever và semantic cache dùng chung cache embedding này
+embedding_model = CachedEmbeddings(
+    _coalescing_embeddings,
+    model_name=EMBEDDING_MODEL,
+    max_entries=EMBEDDING_CACHE_SIZE,
+    disk_path=EMBEDDING_CACHE_PATH or None,
 )
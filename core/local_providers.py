@@ -0,0 +1,171 @@
+# core/local_providers.py
+"""
+Provider giả lập cho chế độ PROVIDER_MODE=local: không gọi mạng và cho kết quả
+tất định, để đo throughput/độ trễ lặp lại được trên máy cô lập hoặc trong CI.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from core.text_utils import normalize_text, strip_accents
+
+_WORD_RE = re.compile(r"\w+")
+_ROUTER_RE = re.compile(
+    r"<< CANDIDATE PROMPTS >>\s*(?P<candidates>.*?)<< INPUT >>\s*(?P<input>.*?)\s*<< OUTPUT", re.DOTALL)
+_CONDENSE_RE = re.compile(r"Câu hỏi theo sau:\s*(?P<question>.*?)\s*Câu hỏi độc lập:\s*$", re.DOTALL)
+
+
+def _seed(text: str) -> int:
+    # hash() của Python đổi theo process, blake2b thì không
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _words(text: str) -> List[str]:
+    """Từ đã chuẩn hóa, kèm bản không dấu nếu khác."""
+    words = []
+    for word in _WORD_RE.findall(normalize_text(text)):
+        words.append(word)
+        folded = strip_accents(word)
+        if folded != word:
+            words.append(folded)
+    return words
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Chat model giả lập có độ trễ token đầu và tốc độ sinh cấu hình được.
+    - Prompt router (MULTI_PROMPT_ROUTER_TEMPLATE): trả JSON chọn nguồn có mô tả
+      chung nhiều từ nhất với câu hỏi.
+    - Prompt condense: trả lại nguyên câu hỏi theo sau.
+    - Các prompt khác: câu trả lời gồm `response_tokens` từ lấy từ chính prompt,
+      chọn theo seed là hash của prompt nên cùng prompt luôn cho cùng câu trả lời.
+    """
+    first_token_latency_ms: float = 200.0
+    tokens_per_second: float = 50.0
+    response_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    @staticmethod
+    def _route(candidates: str, query: str) -> str:
+        query_words = set(_words(query))
+        best_name, best_score = "DEFAULT", -1
+        for line in candidates.strip().splitlines():
+            name, _, description = line.partition(":")
+            if not description:
+                continue
+            score = len(query_words & set(_words(description)))
+            if score > best_score:
+                best_name, best_score = name.strip(), score
+        return best_name
+
+    def _respond(self, prompt: str) -> List[str]:
+        """Câu trả lời, đã tách thành các token sẽ được stream."""
+        router = _ROUTER_RE.search(prompt)
+        if router:
+            query = router.group("input")
+            payload = json.dumps({"destination": self._route(router.group("candidates"), query),
+                                  "next_inputs": query}, ensure_ascii=False)
+            return [f"```json\n{payload}\n```"]
+        condense = _CONDENSE_RE.search(prompt)
+        if condense:
+            return [condense.group("question")]
+
+        vocabulary = _WORD_RE.findall(prompt) or ["ok"]
+        rng = random.Random(_seed(prompt))
+        return [("" if i == 0 else " ") + rng.choice(vocabulary) for i in range(self.response_tokens)]
+
+    def _delays(self, count: int) -> Iterator[float]:
+        yield self.first_token_latency_ms / 1000
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for _ in range(count - 1):
+            yield interval
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        tokens = self._respond(self._prompt_text(messages))
+        time.sleep(sum(self._delays(len(tokens))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        tokens = self._respond(self._prompt_text(messages))
+        await asyncio.sleep(sum(self._delays(len(tokens))))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._respond(self._prompt_text(messages))
+        for token, delay in zip(tokens, self._delays(len(tokens))):
+            time.sleep(delay)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._respond(self._prompt_text(messages))
+        for token, delay in zip(tokens, self._delays(len(tokens))):
+            await asyncio.sleep(delay)
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Embedding tất định bằng feature hashing có dấu trên từ và cặp từ liền kề
+    (cả bản có dấu và không dấu), chuẩn hóa L2. Văn bản chung nhiều từ có cosine
+    cao, nên router, cache ngữ nghĩa và vector search vẫn hoạt động có ý nghĩa.
+    """
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = [strip_accents(word) for word in _WORD_RE.findall(normalize_text(text))]
+        return _words(text) + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            seed = _seed(feature)
+            vector[seed % self.dim] += 1.0 if (seed >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Đủ nhanh để chạy trực tiếp trên event loop
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
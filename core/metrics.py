@@ -0,0 +1,239 @@
+# core/metrics.py
+"""
+Đo thời gian từng bước của pipeline RAG.
+
+Mỗi request /chat mở một RequestTrace trong ContextVar; các bước (condense,
+router, embedding, vector search...) ghi span vào trace đó và đồng thời vào
+histogram chung của process. Histogram/counter được xuất theo định dạng text
+của Prometheus ở endpoint /metrics; trace của từng request có thể được gửi kèm
+cuối stream SSE. Task asyncio tạo trong request kế thừa ContextVar nên span của
+chúng (ví dụ truy xuất speculative) cũng thuộc trace của request.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge lấy giá trị từ callback tại thời điểm xuất metrics."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._callbacks: Dict[LabelKey, Callable[[], float]] = {}
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set_function(self, fn: Callable[[], float], **labels: Any) -> None:
+        with self._lock:
+            self._callbacks[_label_key(labels)] = fn
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+            callbacks = dict(self._callbacks)
+        for key, fn in callbacks.items():
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # label -> (số quan sát theo từng bucket, tổng, số lượng)
+        self._series: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_seconds", "Thời gian từng bước của pipeline RAG (giây).")
+REQUESTS = registry.counter(
+    "rag_requests_total", "Số request /chat theo kết quả (answered, cache_hit, error).")
+IN_FLIGHT = registry.gauge(
+    "rag_requests_in_flight", "Số request /chat đang được xử lý.")
+ROUTE_DECISIONS = registry.counter(
+    "rag_route_decisions_total", "Quyết định định tuyến theo tầng (keyword, embedding, llm, fallback) và nguồn.")
+TOKENS = registry.histogram(
+    "rag_tokens", "Số token ước lượng mỗi request (context, prompt, answer).", TOKEN_BUCKETS)
+
+
+class RequestTrace:
+    """Các span và thuộc tính của một request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append({"stage": stage, "ms": round(seconds * 1000, 2), **labels})
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "spans": list(self.spans),
+                "attributes": dict(self.attributes),
+                "tokens": dict(self.tokens),
+                "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("rag_request_trace", default=None)
+
+
+def start_trace() -> RequestTrace:
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def observe_stage(stage: str, seconds: float, **labels: Any) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, seconds, labels)
+
+
+@contextmanager
+def span(stage: str, **labels: Any) -> Iterator[None]:
+    """Đo một bước; dùng được trong cả hàm sync và async (`with span(...)` quanh `await`)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **labels)
+
+
+def set_attribute(name: str, value: Any) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes[name] = value
+
+
+def record_route(tier: str, destination: Optional[str]) -> None:
+    ROUTE_DECISIONS.inc(tier=tier, destination=destination or "none")
+    set_attribute("route_tier", tier)
+    set_attribute("route_destination", destination)
+
+
+def record_tokens(kind: str, count: int) -> None:
+    TOKENS.observe(count, kind=kind)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tokens[kind] = count
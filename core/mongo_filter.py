@@ -0,0 +1,75 @@
+# core/mongo_filter.py
+"""
+Đánh giá một filter kiểu MongoDB (tập con dùng trong pre_filter của $vectorSearch)
+trên metadata của document trong bộ nhớ, để các chỉ mục cục bộ áp dụng đúng
+cùng điều kiện với Atlas.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping
+
+
+def _as_utc(value: datetime) -> datetime:
+    # pymongo trả về datetime không có múi giờ (UTC)
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _coerce_date(value: Any, operand: Any) -> Any:
+    """Metadata trong bộ nhớ lưu ngày dạng chuỗi ISO (make_serializable); so sánh với datetime thì đổi lại."""
+    if not isinstance(operand, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return value
+    return _as_utc(value) if isinstance(value, datetime) else value
+
+
+def _compare(op: str, value: Any, operand: Any) -> bool:
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    if isinstance(operand, datetime):
+        value, operand = _coerce_date(value, operand), _as_utc(operand)
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        # Khác kiểu (ví dụ chuỗi so với datetime) thì coi như không khớp, giống MongoDB
+        return False
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _matches_field(value: Any, condition: Any) -> bool:
+    if isinstance(condition, Mapping) and condition and all(str(k).startswith("$") for k in condition):
+        return all(_compare(op, value, operand) for op, operand in condition.items())
+    return value == condition
+
+
+def matches_filter(metadata: Mapping[str, Any], mongo_filter: Dict[str, Any]) -> bool:
+    """True nếu `metadata` thỏa `mongo_filter` (hỗ trợ $and/$or và các toán tử so sánh)."""
+    for key, condition in (mongo_filter or {}).items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif not _matches_field(metadata.get(key), condition):
+            return False
+    return True
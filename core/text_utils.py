@@ -0,0 +1,42 @@
+# core/text_utils.py
+import math
+import re
+import unicodedata
+from typing import Iterable
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hóa Unicode (NFC), chữ thường và gộp khoảng trắng."""
+    text = unicodedata.normalize("NFC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def strip_accents(text: str) -> str:
+    """Bỏ dấu tiếng Việt, ví dụ 'chính sách' -> 'chinh sach'."""
+    decomposed = unicodedata.normalize("NFD", text or "")
+    stripped = "".join(
+        ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng thô số token (~4 ký tự/token), đủ để giới hạn độ dài prompt."""
+    return math.ceil(len(text or "") / 4)
+
+
+def has_diacritics(text: str) -> bool:
+    """Văn bản có chứa chữ có dấu tiếng Việt hay không."""
+    return strip_accents(text) != text
+
+
+def keyword_pattern(keywords: Iterable[str]) -> "re.Pattern[str]":
+    """
+    Regex khớp nguyên từ bất kỳ từ khóa nào, đúng dạng đã cho (sau normalize_text).
+    Không tự thêm dạng bỏ dấu: bỏ dấu làm nhiều từ khác nhau trùng nhau
+    ("lượng"/"lương", "tuyến"/"tuyển"), caller tự quyết định khi nào dùng dạng đó.
+    """
+    variants = {normalize_text(keyword) for keyword in keywords}
+    alternatives = "|".join(re.escape(v) for v in sorted(variants, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
@@ -0,0 +1,26 @@
+# core/vector_utils.py
+import math
+from typing import List, Sequence
+
+
+def normalize_vector(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+def mean_vector(vectors: Sequence[Sequence[float]]) -> List[float]:
+    if not vectors:
+        return []
+    count = len(vectors)
+    return [sum(values) / count for values in zip(*vectors)]
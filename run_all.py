@@ -111,28 +111,28 @@ class ServiceManager:
                 # Import schedule và cleanup function
                 import schedule
 
+                from config import settings
+                from core.indexes import ensure_job_indexes
                 from scripts.cleanup_expired_jobs import run_cleanup
 
                 def scheduled_cleanup():
-                    self.log("CLEANUP", "Bắt đầu cleanup job...")
                     try:
-                        run_cleanup()
-                        self.log("CLEANUP", "Cleanup hoàn thành thành công!")
+                        deleted = run_cleanup()
+                        if deleted:
+                            self.log("CLEANUP", f"Đã xóa {deleted} chunk hết hạn.")
                     except Exception as e:
                         self.log("CLEANUP", f"Lỗi cleanup: {e}")
 
-                # Schedule cleanup hàng ngày lúc 2:00 AM
-                schedule.every().day.at("02:00").do(scheduled_cleanup)
-
-                # Có thể uncomment dòng dưới để test (chạy mỗi 5 phút)
-                # schedule.every(5).minutes.do(scheduled_cleanup)
+                ensure_job_indexes()
+                # Xóa job hết hạn liên tục theo batch nhỏ
+                schedule.every(settings.EXPIRY_INTERVAL_SECONDS).seconds.do(scheduled_cleanup)
 
                 self.log(
                     "CLEANUP", f"Scheduler thiết lập xong. Lần chạy tiếp theo: {schedule.next_run()}")
 
                 while self.running:
                     schedule.run_pending()
-                    time.sleep(60)  # Check every minute
+                    time.sleep(1)
 
             except Exception as e:
                 self.log("CLEANUP", f"Lỗi scheduler: {e}")
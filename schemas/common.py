@@ -8,3 +8,12 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     query: str
     history: List[ChatMessage] = []
+    # Nếu có, lịch sử được lưu phía server và `history` bị bỏ qua
+    session_id: Optional[str] = None
+    # Gửi thêm gói "timings" (thời gian từng bước) ở cuối stream
+    include_timings: bool = False
+
+class SessionResponse(BaseModel):
+    session_id: str
+    messages: List[ChatMessage] = []
+    summary: str = ""
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+AVAILABLE_LEVELS = ["Intern", "Junior", "Senior", "Lead", "Manager"]
+
+
+class JobFilters(BaseModel):
+    """Bộ lọc tìm việc trích từ câu hỏi, giá trị theo đúng enum lưu trong metadata của job."""
+    keywords: Optional[List[str]] = Field(
+        None, description="Các từ khóa chung hoặc thuật ngữ nghiệp vụ chữ thường, ví dụ: ['backend', 'api', 'python']."
+    )
+    city: Optional[List[str]] = Field(None, description="Thành phố, ví dụ: ['Hà Nội', 'TP. Hồ Chí Minh'].")
+    district: Optional[List[str]] = Field(None, description="Quận/huyện, ví dụ: ['Quận 1', 'Quận Cầu Giấy'].")
+    experience: Optional[List[str]] = Field(None, description="Cấp bậc, ví dụ: ['SENIOR_LEVEL', 'MID_LEVEL'].")
+    workType: Optional[List[str]] = Field(None, description="Hình thức làm việc: ON_SITE, HYBRID, REMOTE.")
+    type: Optional[List[str]] = Field(None, description="Loại hợp đồng, ví dụ: FULL_TIME, PART_TIME, INTERNSHIP.")
+    category: Optional[List[str]] = Field(None, description="Ngành nghề, ví dụ: ['IT', 'MARKETING'].")
+    minSalary: Optional[float] = Field(None, description="Mức lương tối thiểu mong muốn (cùng đơn vị với dữ liệu job).")
+    maxSalary: Optional[float] = Field(None, description="Mức lương tối đa mong muốn (cùng đơn vị với dữ liệu job).")
+
+    def is_empty(self) -> bool:
+        return all(value in (None, []) for name, value in self if name != "keywords")
@@ -2,6 +2,7 @@
 import logging
 import os
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -12,6 +13,8 @@ from pymongo.results import DeleteResult
 
 from config import settings  # Để load env vars nếu cần
 from core.db import db
+from core.indexes import ensure_job_indexes
+from core.invalidation import publish_invalidation
 
 # Setup logging
 
@@ -37,42 +40,46 @@ def setup_logging():
 logger = setup_logging()
 
 
-def run_cleanup():
+def delete_expired_batch(now: datetime, batch_size: int) -> int:
+    """Xóa tối đa `batch_size` chunk hết hạn và báo cho các cache/chỉ mục trong process về các job bị xóa."""
+    jobs_collection = db["jobs_vector"]
+    expired = list(jobs_collection.find(
+        {"deadline": {"$lt": now}}, {"job_id": 1}).limit(batch_size))
+    if not expired:
+        return 0
+    result: DeleteResult = jobs_collection.delete_many(
+        {"_id": {"$in": [record["_id"] for record in expired]}})
+    publish_invalidation(
+        [record.get("job_id") for record in expired], reason="JOB_EXPIRED")
+    return result.deleted_count
+
+
+def run_cleanup(batch_size: int = settings.EXPIRY_BATCH_SIZE,
+                time_budget_seconds: float = settings.EXPIRY_TIME_BUDGET_SECONDS) -> int:
     """
-    Tìm và xóa tất cả các chunk của các job đã hết hạn khỏi collection vector.
+    Xóa các chunk của job đã hết hạn theo từng batch nhỏ, dừng khi hết chunk hết hạn
+    hoặc hết `time_budget_seconds` (phần còn lại được xử lý ở lần chạy sau).
+    Trả về số chunk đã xóa.
     """
     try:
-        jobs_collection = db["jobs_vector"]
-        current_time_iso = datetime.now(timezone.utc).isoformat()
-
-        # Query để tìm tất cả các document có 'deadline' đã qua
-        # metadata.deadline được lưu dưới dạng ISO string
-        query = {
-            "deadline": {
-                "$lt": current_time_iso
-            }
-        }
-
-        logger.info(
-            f"Bắt đầu dọn dẹp các job hết hạn (trước ngày {current_time_iso})...")
-
-        # In ra số lượng job sẽ bị xóa để kiểm tra (tùy chọn)
-        count_to_delete = jobs_collection.count_documents(query)
-        if count_to_delete == 0:
-            logger.info("Không có job hết hạn nào để dọn dẹp.")
-            return
-
-        logger.info(
-            f"Tìm thấy {count_to_delete} chunk của các job đã hết hạn. Bắt đầu xóa...")
-
-        # Thực hiện xóa
-        result: DeleteResult = jobs_collection.delete_many(query)
-        logger.info(
-            f"Hoàn thành! Đã xóa thành công {result.deleted_count} chunk.")
-
-        # Ghi log thống kê
-        remaining_count = jobs_collection.count_documents({})
-        logger.info(f"Tổng số chunk còn lại trong database: {remaining_count}")
+        now = datetime.now(timezone.utc)
+        started = time.monotonic()
+        total_deleted = 0
+        while time.monotonic() - started < time_budget_seconds:
+            deleted = delete_expired_batch(now, batch_size)
+            total_deleted += deleted
+            if deleted < batch_size:
+                break
+            # Nghỉ giữa các batch để không dồn I/O
+            time.sleep(settings.EXPIRY_BATCH_PAUSE_SECONDS)
+
+        if total_deleted:
+            logger.info(
+                f"Đã xóa {total_deleted} chunk của các job hết hạn (trước {now.isoformat()}) "
+                f"trong {time.monotonic() - started:.2f}s.")
+        else:
+            logger.debug("Không có job hết hạn nào để dọn dẹp.")
+        return total_deleted
 
     except Exception as e:
         logger.error(
@@ -86,7 +93,10 @@ if __name__ == "__main__":
     logger.info("="*60)
 
     try:
-        run_cleanup()
+        # Index trên deadline để mỗi batch chỉ đọc các chunk đã hết hạn
+        ensure_job_indexes()
+        # Chạy một lần cho đến khi xóa hết các job đã hết hạn
+        run_cleanup(time_budget_seconds=float("inf"))
         logger.info("Script cleanup hoàn thành thành công!")
     except Exception as e:
         logger.error(f"Script cleanup thất bại: {e}")
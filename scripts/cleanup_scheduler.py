@@ -1,5 +1,7 @@
 # scripts/cleanup_scheduler.py
 from .cleanup_expired_jobs import run_cleanup
+from config import settings
+from core.indexes import ensure_job_indexes
 import os
 import sys
 import time
@@ -14,39 +16,30 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 def scheduled_cleanup():
     """
-    Wrapper function cho scheduled cleanup với logging
+    Wrapper function cho scheduled cleanup, chỉ in log khi có job bị xóa hoặc có lỗi
     """
-    print(f"\n{'='*50}")
-    print(
-        f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Bắt đầu cleanup định kỳ...")
-    print(f"{'='*50}")
-
     try:
-        run_cleanup()
-        print(
-            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Cleanup hoàn thành thành công!")
+        deleted = run_cleanup()
+        if deleted:
+            print(
+                f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Cleanup: đã xóa {deleted} chunk hết hạn.")
     except Exception as e:
         print(
             f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Lỗi khi chạy cleanup: {e}")
 
-    print(f"{'='*50}\n")
-
 
 def main():
     """
     Thiết lập và chạy scheduler
     """
     print("🕐 Khởi động Cleanup Scheduler...")
-    print("📅 Lịch trình: Chạy hàng ngày lúc 2:00 AM")
+    print(f"📅 Lịch trình: Chạy mỗi {settings.EXPIRY_INTERVAL_SECONDS:.0f} giây, "
+          f"tối đa {settings.EXPIRY_TIME_BUDGET_SECONDS:.0f} giây mỗi lần")
     print("🔄 Để dừng scheduler, nhấn Ctrl+C")
 
-    # Lên lịch chạy cleanup hàng ngày lúc 2:00 AM
-    schedule.every().day.at("02:00").do(scheduled_cleanup)
-
-    # Hoặc có thể dùng các lịch trình khác:
-    # schedule.every(6).hours.do(scheduled_cleanup)  # Mỗi 6 tiếng
-    # schedule.every().monday.at("01:00").do(scheduled_cleanup)  # Thứ 2 hàng tuần
-    # schedule.every(30).minutes.do(scheduled_cleanup)  # Mỗi 30 phút (cho test)
+    ensure_job_indexes()
+    # Xóa liên tục theo batch nhỏ để job hết hạn không nằm lại trong index cả ngày
+    schedule.every(settings.EXPIRY_INTERVAL_SECONDS).seconds.do(scheduled_cleanup)
 
     print(
         f"✅ Scheduler đã được thiết lập. Lần chạy tiếp theo: {schedule.next_run()}")
@@ -54,7 +47,7 @@ def main():
     try:
         while True:
             schedule.run_pending()
-            time.sleep(60)  # Kiểm tra mỗi phút
+            time.sleep(1)
     except KeyboardInterrupt:
         print("\n🛑 Dừng cleanup scheduler...")
         print("👋 Goodbye!")
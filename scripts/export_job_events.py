@@ -0,0 +1,57 @@
+# scripts/export_job_events.py
+"""
+Chuyển data/jobs.json thành file sự kiện JOB_CREATED dạng JSONL (mỗi dòng một
+JobEvent như message Kafka) cho workers.file_event_source và chế độ PROVIDER_MODE=local.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from services.ingestion import iter_json_array
+from services.job_documents import payload_from_raw_job
+
+
+def _to_event(job_data: dict, min_deadline: datetime) -> Optional[dict]:
+    payload = payload_from_raw_job(job_data)
+    if payload is None:
+        return None
+    if payload.deadline:
+        # Job hết hạn sẽ bị pre_filter loại bỏ, nên dời hạn để dữ liệu đo tải luôn dùng được
+        payload.deadline = max(payload.deadline, min_deadline)
+    created_at = job_data.get("createdAt")
+    return {
+        "eventType": "JOB_CREATED",
+        "timestamp": (created_at.get("$date") if isinstance(created_at, dict) else created_at) or "",
+        "payload": payload.model_dump(mode="json", exclude_none=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất data/jobs.json thành file sự kiện job JSONL.")
+    parser.add_argument("--input", default="data/jobs.json")
+    parser.add_argument("--output", default=settings.LOCAL_JOB_EVENTS_FILE)
+    parser.add_argument("--min-deadline-days", type=int, default=365,
+                        help="Hạn nộp sớm hơn (ngày xuất + N ngày) được dời tới mốc này.")
+    args = parser.parse_args()
+
+    min_deadline = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=args.min_deadline_days)
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for job_data in iter_json_array(args.input):
+            event = _to_event(job_data, min_deadline)
+            if event is None:
+                continue
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            count += 1
+    print(f"Đã ghi {count} sự kiện vào {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 # FILE: scripts/initial_load.py
+import argparse
 import json
 import os
 import sys
+from pathlib import Path
 from typing import List, Optional
 
 from langchain.prompts import PromptTemplate
@@ -10,11 +12,24 @@ from langchain_community.document_loaders import TextLoader
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from langchain_mongodb import MongoDBAtlasVectorSearch
 from pydantic import BaseModel, Field
 
+from config import settings
 from core.db import db
+from core.indexes import ensure_indexes
+from core.invalidation import WILDCARD, publish_invalidation
 from core.llm import embedding_model, structured_llm
+from services.ingestion import (
+    BulkLoader,
+    Checkpoint,
+    RetryPolicy,
+    SyncStats,
+    assign_chunk_identity,
+    iter_json_array,
+    sync_document_groups,
+    sync_documents,
+)
+from services.job_documents import build_job_documents, payload_from_raw_job
 
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -41,125 +56,161 @@ class Job(BaseModel):
     page_content: str  # Description of the job
 
 
-def load_policies():
-    """Tải, chia nhỏ và nạp dữ liệu chính sách."""
-    # kiểm tra đã nnapj dữ liệu jobs hay chưa
-    if db["policies_vector"].count_documents({}) > 0:
-        print("Dữ liệu chính sách đã được nạp trước đó. Bỏ qua quá trình nạp lại.")
-        return
-    print("--- Bắt đầu xử lý file chính sách ---")
+def _checkpoint(name: str) -> Checkpoint:
+    return Checkpoint(Path(settings.INITIAL_LOAD_CHECKPOINT_DIR) / f"{name}.json")
+
+
+def _bulk_loader(collection, checkpoint: Checkpoint) -> BulkLoader:
+    return BulkLoader(
+        collection=collection,
+        embeddings=embedding_model,
+        checkpoint=checkpoint,
+        batch_size=settings.INITIAL_LOAD_BATCH_SIZE,
+        concurrency=settings.INITIAL_LOAD_CONCURRENCY,
+        retry_policy=RetryPolicy(max_retries=settings.INITIAL_LOAD_MAX_RETRIES),
+    )
+
+
+def _policy_chunks() -> List[Document]:
     loader = TextLoader("data/policies.txt", encoding="utf-8")
     docs = loader.load()
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000, chunk_overlap=200)
     chunks = text_splitter.split_documents(docs)
     print(f"Đã chia file chính sách thành {len(chunks)} chunks.")
+    # _id cố định theo nội dung chunk để chạy lại không tạo bản trùng
+    return [assign_chunk_identity(chunk, "policies", settings.EMBEDDING_MODEL) for chunk in chunks]
+
+
+def load_policies():
+    """Tải, chia nhỏ và nạp dữ liệu chính sách."""
     policies_collection = db["policies_vector"]
-    policies_collection.delete_many({})
-    MongoDBAtlasVectorSearch.from_documents(
-        documents=chunks,
-        embedding=embedding_model,
-        collection=policies_collection,
-        index_name="policies_vector_index"
-    )
+    checkpoint = _checkpoint("policies")
+    # kiểm tra đã nnapj dữ liệu jobs hay chưa (trừ khi đang chạy tiếp từ checkpoint)
+    if not checkpoint.completed and policies_collection.count_documents({}) > 0:
+        print("Dữ liệu chính sách đã được nạp trước đó. Bỏ qua quá trình nạp lại.")
+        return
+    print("--- Bắt đầu xử lý file chính sách ---")
+    chunks = _policy_chunks()
+    if not checkpoint.completed:
+        policies_collection.delete_many({})
+    inserted = _bulk_loader(policies_collection, checkpoint).run(
+        ((i, [chunk]) for i, chunk in enumerate(chunks)), total=len(chunks))
+    checkpoint.clear()
+    print(f"Đã nạp {inserted} chunk chính sách.")
+    publish_invalidation([WILDCARD], reason="POLICIES_RELOADED")
     print("--- Hoàn thành nạp dữ liệu chính sách ---")
 
 
-def _get_value(data, key, sub_key=None):
-    """
-    Helper function to safely extract a value from a potentially nested dictionary.
-    """
-    value = data.get(key)
-    if isinstance(value, dict) and sub_key:
-        return value.get(sub_key)
-    return value
+def sync_policies():
+    """Đồng bộ tăng dần: chỉ embed các chunk chính sách có nội dung thay đổi."""
+    print("--- Bắt đầu đồng bộ dữ liệu chính sách ---")
+    stats = sync_documents(
+        db["policies_vector"],
+        _policy_chunks(),
+        embedding_model,
+        batch_size=settings.INITIAL_LOAD_BATCH_SIZE,
+        retry_policy=RetryPolicy(max_retries=settings.INITIAL_LOAD_MAX_RETRIES),
+    )
+    print(
+        f"Chính sách: thêm {stats.inserted}, cập nhật {stats.updated}, xóa {stats.deleted}, giữ nguyên {stats.unchanged} chunk.")
+    if stats.changed:
+        publish_invalidation([WILDCARD], reason="POLICIES_SYNCED")
+    print("--- Hoàn thành đồng bộ dữ liệu chính sách ---")
+
+
+def _job_documents():
+    # 1. Đọc dần dữ liệu từ file JSON; mỗi job được chia chunk theo lược đồ chung với Kafka consumer
+    for index, job_data in enumerate(iter_json_array("data/jobs.json")):
+        payload = payload_from_raw_job(job_data)
+        if payload is None:
+            print(f"Bỏ qua job thứ {index}: thiếu _id.")
+            continue
+        yield index, build_job_documents(payload)
 
 
 def load_jobs():
     """
     Nạp dữ liệu jobs từ file JSON, xử lý các định dạng dữ liệu không nhất quán.
+    File được đọc tuần tự từng job; embedding và ghi theo batch song song.
     """
+    jobs_collection = db["jobs_vector"]
+    checkpoint = _checkpoint("jobs")
 
-    # kiểm tra đã nnapj dữ liệu jobs hay chưa
-    if db["jobs_vector"].count_documents({}) > 0:
+    # kiểm tra đã nnapj dữ liệu jobs hay chưa (trừ khi đang chạy tiếp từ checkpoint)
+    if not checkpoint.completed and jobs_collection.count_documents({}) > 0:
         print("Dữ liệu jobs đã được nạp trước đó. Bỏ qua quá trình nạp lại.")
         return
     print("--- Bắt đầu xử lý file jobs ---")
-    jobs_collection = db["jobs_vector"]
-    jobs_collection.delete_many({})
+    if not checkpoint.completed:
+        jobs_collection.delete_many({})
 
-    # 1. Đọc dữ liệu từ file JSON
+    # 2. Nạp các chunk vào Vector Store
     try:
-        with open("data/jobs.json", "r", encoding="utf-8") as f:
-            raw_job_data = json.load(f)
-        print(f"Đã đọc được {len(raw_job_data)} jobs từ file JSON.")
+        inserted = _bulk_loader(jobs_collection, checkpoint).run(_job_documents())
     except FileNotFoundError:
         print("Lỗi: Không tìm thấy file data/jobs.json")
         return
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, ValueError):
         print("Lỗi: File data/jobs.json không có định dạng hợp lệ.")
         return
+    checkpoint.clear()
 
-    enriched_job_docs = []
-    for job_data in raw_job_data:
-        # 2. Tạo nội dung trang (page_content)
-        page_content = f"Tiêu đề: {job_data.get('title', '')}\n"
-        page_content += f"Mô tả: {job_data.get('description', '')}\n"
-        page_content += f"Yêu cầu: {job_data.get('requirements', '')}\n"
-        page_content += f"Phúc lợi: {job_data.get('benefits', '')}"
-
-        # 3. Tạo metadata, xử lý các định dạng không nhất quán
-        job_id = _get_value(job_data, "_id", "$oid")
-        deadline = _get_value(job_data, "deadline", "$date")
-        created_at = _get_value(job_data, "createdAt", "$date")
-        updated_at = _get_value(job_data, "updatedAt", "$date")
-        recruiter_id = _get_value(job_data, "recruiterProfileId", "$oid")
-        min_salary = _get_value(job_data, "minSalary", "$numberDecimal")
-        max_salary = _get_value(job_data, "maxSalary", "$numberDecimal")
-
-        full_metadata = {
-            "source": "jobs",
-            "jobId": str(job_id) if job_id else "",
-            "title": job_data.get("title", ""),
-            "category": job_data.get("category", ""),
-            "experience": job_data.get("experience", ""),
-            "type": job_data.get("type", ""),
-            "workType": job_data.get("workType", ""),
-            "status": job_data.get("status", ""),
-            "approved": job_data.get("approved", False),
-            "location_city": _get_value(job_data, "location", "city"),
-            "location_district": _get_value(job_data, "location", "district"),
-            "minSalary": float(min_salary) if min_salary is not None else None,
-            "maxSalary": float(max_salary) if max_salary is not None else None,
-            "deadline": deadline,
-            "createdAt": created_at,
-            "updatedAt": updated_at,
-            "recruiterProfileId": str(recruiter_id) if recruiter_id else ""
-        }
-        # Loại bỏ các khóa có giá trị None
-        full_metadata = {k: v for k,
-                         v in full_metadata.items() if v is not None}
-
-        # 4. Tạo Document hoàn chỉnh
-        doc = Document(page_content=page_content, metadata=full_metadata)
-        enriched_job_docs.append(doc)
-
-    # 5. Nạp các documents đã được làm giàu vào Vector Store
-    if enriched_job_docs:
-        MongoDBAtlasVectorSearch.from_documents(
-            documents=enriched_job_docs,
-            embedding=embedding_model,
-            collection=jobs_collection,
-            index_name="jobs_vector_index"
-        )
-        print(
-            f"Đã nạp {len(enriched_job_docs)} jobs đã được làm giàu metadata.")
+    if inserted:
+        print(f"Đã nạp {inserted} chunk jobs.")
     else:
         print("Không có job nào để nạp.")
 
+    publish_invalidation([WILDCARD], reason="JOBS_RELOADED")
     print("--- Hoàn thành nạp dữ liệu jobs ---")
 
 
+def sync_jobs():
+    """
+    Đồng bộ tăng dần jobs theo từng batch job đọc từ file: chỉ embed job có nội
+    dung thay đổi và cập nhật metadata tại chỗ cho job còn lại. Chỉ chunk của các
+    job có trong file được so sánh, nên job do Kafka consumer nạp không bị xóa.
+    """
+    print("--- Bắt đầu đồng bộ dữ liệu jobs ---")
+    groups = ((documents[0].metadata["job_id"], documents)
+              for _, documents in _job_documents() if documents)
+    total = SyncStats()
+    try:
+        for stats in sync_document_groups(
+            db["jobs_vector"],
+            groups,
+            "job_id",
+            embedding_model,
+            batch_size=settings.INITIAL_LOAD_BATCH_SIZE,
+            retry_policy=RetryPolicy(max_retries=settings.INITIAL_LOAD_MAX_RETRIES),
+        ):
+            total.add_counts(stats)
+            publish_invalidation(
+                [record.get("job_id") for record in stats.changed_records],
+                reason="JOBS_SYNCED")
+    except FileNotFoundError:
+        print("Lỗi: Không tìm thấy file data/jobs.json")
+        return
+    except (json.JSONDecodeError, ValueError):
+        print("Lỗi: File data/jobs.json không có định dạng hợp lệ.")
+        return
+    print(
+        f"Jobs: thêm {total.inserted}, cập nhật {total.updated}, xóa {total.deleted}, giữ nguyên {total.unchanged} chunk.")
+    print("--- Hoàn thành đồng bộ dữ liệu jobs ---")
+
+
 if __name__ == "__main__":
-    load_policies()
-    load_jobs()
+    parser = argparse.ArgumentParser(
+        description="Nạp dữ liệu chính sách và jobs vào vector store.")
+    parser.add_argument(
+        "--sync", action="store_true",
+        help="Đồng bộ tăng dần theo content hash thay vì bỏ qua khi collection đã có dữ liệu.")
+    args = parser.parse_args()
+
+    ensure_indexes()
+    if args.sync:
+        sync_policies()
+        sync_jobs()
+    else:
+        load_policies()
+        load_jobs()
@@ -0,0 +1,68 @@
+# scripts/migrate_deadlines.py
+"""
+Chuyển trường deadline của jobs_vector từ chuỗi ISO sang kiểu date của BSON (chạy một lần).
+
+pre_filter của retriever và cleanup so sánh deadline với datetime, nên chunk còn
+deadline dạng chuỗi sẽ không được tìm thấy cũng như không bị xóa khi hết hạn.
+Chạy script này trước khi triển khai bản dùng deadline kiểu date; chạy lại nhiều
+lần vẫn an toàn vì chỉ xử lý các bản ghi còn deadline dạng chuỗi.
+
+Chuỗi không parse được được giữ nguyên và in ra để sửa tay: đặt thành null sẽ làm
+job biến mất khỏi kết quả tìm kiếm vì pre_filter `deadline >= now` loại giá trị null.
+"""
+import argparse
+import os
+import sys
+from typing import List, Tuple
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.db import db
+from core.indexes import ensure_job_indexes
+
+
+def migrate_deadlines(batch_size: int) -> Tuple[int, List[dict]]:
+    """Trả về (số chunk đã chuyển, các chunk có deadline không parse được)."""
+    jobs_collection = db["jobs_vector"]
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"deadline": {"$type": "string"}}
+        if last_id is not None:
+            # Duyệt theo _id để chunk giữ nguyên chuỗi không bị đọc lại mãi
+            query["_id"] = {"$gt": last_id}
+        ids = [record["_id"] for record in jobs_collection.find(
+            query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+        if not ids:
+            break
+        last_id = ids[-1]
+        # onError giữ nguyên chuỗi gốc thay vì ghi null
+        result = jobs_collection.update_many(
+            {"_id": {"$in": ids}},
+            [{"$set": {"deadline": {"$dateFromString": {"dateString": "$deadline", "onError": "$deadline"}}}}],
+        )
+        migrated += result.modified_count
+        print(f"Đã chuyển deadline của {migrated} chunk...")
+    unparsable = list(jobs_collection.find(
+        {"deadline": {"$type": "string"}}, {"_id": 1, "job_id": 1, "deadline": 1}))
+    return migrated, unparsable
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển deadline dạng chuỗi của jobs_vector sang kiểu date.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    migrated, unparsable = migrate_deadlines(args.batch_size)
+    ensure_job_indexes()
+    print(f"Hoàn tất: đã chuyển deadline của {migrated} chunk, index trên deadline đã sẵn sàng.")
+    if unparsable:
+        print(f"{len(unparsable)} chunk có deadline không parse được, được giữ nguyên dạng chuỗi "
+              f"và sẽ không xuất hiện trong kết quả tìm kiếm cho tới khi được sửa:")
+        for record in unparsable:
+            print(f"  - job_id={record.get('job_id')} _id={record['_id']} deadline={record['deadline']!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# scripts/migrate_job_schema.py
+"""
+Chuyển các chunk job nạp bởi initial_load bản cũ sang lược đồ chung (chạy một lần).
+
+Bản cũ ghi `jobId`, `location_city`, `location_district` và `source: "jobs"`,
+trong khi Kafka consumer, cleanup và pre_filter dùng `job_id`, `city`, `district`.
+Script đổi tên các field này tại chỗ theo từng batch, nên job được xóa/cập nhật
+qua Kafka và lọc theo thành phố ngay sau khi chạy mà không cần embed lại.
+
+Nội dung chunk cũ (không có tên công ty, không chia chunk) vẫn giữ nguyên; chạy
+`python -m scripts.initial_load --sync` sau đó để dựng lại theo nội dung mới.
+"""
+import argparse
+import os
+import sys
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.db import db
+from core.indexes import ensure_indexes
+from core.invalidation import WILDCARD, publish_invalidation
+from services.job_documents import JOB_SOURCE
+
+LEGACY_FILTER = {"$or": [
+    {"jobId": {"$exists": True}},
+    {"location_city": {"$exists": True}},
+    {"location_district": {"$exists": True}},
+]}
+
+RENAME_PIPELINE = [
+    {"$set": {
+        "job_id": {"$ifNull": ["$job_id", "$jobId"]},
+        "city": {"$ifNull": ["$city", "$location_city"]},
+        "district": {"$ifNull": ["$district", "$location_district"]},
+        "source": JOB_SOURCE,
+    }},
+    {"$unset": ["jobId", "location_city", "location_district"]},
+]
+
+
+def migrate_job_schema(batch_size: int) -> int:
+    jobs_collection = db["jobs_vector"]
+    migrated = 0
+    while True:
+        ids = [record["_id"] for record in jobs_collection.find(LEGACY_FILTER, {"_id": 1}).limit(batch_size)]
+        if not ids:
+            return migrated
+        # Pipeline update luôn bỏ các field cũ nên vòng lặp luôn kết thúc
+        jobs_collection.update_many({"_id": {"$in": ids}}, RENAME_PIPELINE)
+        migrated += len(ids)
+        print(f"Đã chuyển {migrated} chunk sang lược đồ mới...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển chunk job của initial_load bản cũ sang lược đồ chung.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    ensure_indexes()
+    migrated = migrate_job_schema(args.batch_size)
+    if migrated:
+        publish_invalidation([WILDCARD], reason="JOB_SCHEMA_MIGRATED")
+    print(f"Hoàn tất: đã chuyển {migrated} chunk. Chạy `python -m scripts.initial_load --sync` "
+          f"để dựng lại nội dung chunk theo lược đồ mới.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# scripts/replay_dlq.py
+"""
+Xử lý lại các sự kiện job trong dead-letter queue theo batch.
+
+Với mỗi job chỉ sự kiện mới nhất trong DLQ được replay; các entry cũ hơn của cùng
+job được đánh dấu superseded. Entry replay thành công được đánh dấu replayed, entry
+vẫn lỗi giữ trạng thái pending (tăng attempts) để lần chạy sau xử lý tiếp.
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from services.ingestion import is_transient_error
+from workers.dead_letter import REPLAYED, SUPERSEDED, dead_letter_sink
+from workers.kafka_consumer import (
+    JobEvent,
+    _decode_event,
+    apply_event_batch,
+    event_retry_policy,
+    isolation_retry_policy,
+)
+
+
+def _entry_event(entry: dict) -> JobEvent:
+    return _decode_event(entry["event"] if entry.get("event") else entry["raw"])
+
+
+def _latest_per_job(entries: List[dict], dry_run: bool) -> Dict[str, tuple]:
+    """jobId -> (entry, sự kiện) của entry mới nhất; entry cũ hơn và entry vẫn không parse được bị tách ra."""
+    latest: Dict[str, tuple] = {}
+    superseded, unparsable = [], []
+    for entry in entries:  # đã sắp theo failedAt tăng dần
+        try:
+            event = _entry_event(entry)
+        except Exception as e:
+            unparsable.append(entry["_id"])
+            print(f"Entry {entry['_id']} vẫn không parse được: {e}")
+            continue
+        previous = latest.get(event.payload.jobId)
+        if previous is not None:
+            superseded.append(previous[0]["_id"])
+        latest[event.payload.jobId] = (entry, event)
+    if not dry_run:
+        dead_letter_sink.mark(superseded, SUPERSEDED)
+        if unparsable:
+            dead_letter_sink.record_failure(unparsable, "Không parse được JobEvent")
+    print(f"{len(latest)} job cần replay, {len(superseded)} entry cũ bị thay thế, "
+          f"{len(unparsable)} entry không parse được.")
+    return latest
+
+
+def replay_batch(batch: List[tuple]) -> int:
+    """
+    Replay một batch; nếu lỗi do dữ liệu thì replay từng entry. Trả về số entry thành
+    công. Lỗi tạm thời (rate limit, MongoDB mất kết nối) được raise để dừng lần chạy.
+    """
+    entry_ids = [entry["_id"] for entry, _ in batch]
+    try:
+        event_retry_policy.call(lambda: apply_event_batch([event for _, event in batch]),
+                                f"Replay {len(batch)} sự kiện")
+        dead_letter_sink.mark(entry_ids, REPLAYED)
+        return len(batch)
+    except Exception as e:
+        if is_transient_error(e):
+            raise
+        print(f"Replay batch {len(batch)} sự kiện lỗi: {e}. Replay từng sự kiện.")
+    replayed = 0
+    for entry, event in batch:
+        try:
+            isolation_retry_policy.call(lambda: apply_event_batch([event]), f"Job {event.payload.jobId}")
+            dead_letter_sink.mark([entry["_id"]], REPLAYED)
+            replayed += 1
+        except Exception as e:
+            if is_transient_error(e):
+                raise
+            print(f"  - Job {event.payload.jobId} vẫn lỗi: {e}")
+            dead_letter_sink.record_failure([entry["_id"]], e)
+    return replayed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay các sự kiện job trong dead-letter queue.")
+    parser.add_argument("--batch-size", type=int, default=settings.KAFKA_BATCH_MAX_RECORDS)
+    parser.add_argument("--limit", type=int, default=0, help="Số entry tối đa đọc từ DLQ (0 = tất cả).")
+    parser.add_argument("--stage", choices=["parse", "apply"], help="Chỉ replay entry lỗi ở bước này.")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ thống kê, không ghi gì.")
+    args = parser.parse_args()
+
+    entries = dead_letter_sink.pending(limit=args.limit, stage=args.stage)
+    print(f"Đọc {len(entries)} entry pending từ dead-letter queue.")
+    latest = list(_latest_per_job(entries, args.dry_run).values())
+    if args.dry_run or not latest:
+        return
+
+    replayed = 0
+    for start in range(0, len(latest), args.batch_size):
+        try:
+            replayed += replay_batch(latest[start:start + args.batch_size])
+        except Exception as e:
+            print(f"Dừng replay do lỗi tạm thời: {e}. Entry còn lại vẫn pending, chạy lại sau.")
+            break
+    print(f"Hoàn tất: replay thành công {replayed}/{len(latest)} sự kiện.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# FILE: services/condense.py
+
+import re
+from typing import List
+
+from core.text_utils import estimate_tokens, normalize_text, strip_accents
+from schemas.common import ChatMessage
+
+# Đại từ/từ chỉ định cho thấy câu hỏi phụ thuộc vào các lượt trước.
+# Chỉ so khớp bản có dấu vì bản không dấu ("do", "no", "the"...) dễ trùng từ khác.
+REFERENCE_TERMS: List[str] = [
+    "đó", "này", "kia", "ấy", "nó", "chúng", "họ",
+    "ở trên", "bên trên", "vừa rồi", "lúc nãy", "trước đó", "tương tự", "cái thứ",
+    "công ty đó", "công việc đó", "vị trí đó", "job đó",
+    "that", "those", "them", "they",
+]
+
+# Cụm không dấu đủ đặc trưng để không nhầm với từ khác
+UNACCENTED_REFERENCE_TERMS: List[str] = [
+    "cai do", "cong ty do", "cong viec do", "vi tri do", "job do",
+    "vua roi", "luc nay", "truoc do", "tuong tu", "cai thu",
+]
+
+# Từ mở đầu câu hỏi nối tiếp, ví dụ "Còn ở Đà Nẵng thì sao?"
+FOLLOW_UP_PREFIXES: List[str] = [
+    "còn", "thế còn", "vậy còn", "vậy", "thế", "và", "rồi",
+    "con", "the con", "vay con",
+]
+
+FOLLOW_UP_SUFFIXES: List[str] = ["thì sao", "thi sao", "nữa", "nua", "nữa không", "nua khong"]
+
+
+def _terms_pattern(terms: List[str]) -> "re.Pattern[str]":
+    alternatives = "|".join(re.escape(normalize_text(t))
+                            for t in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+
+
+_REFERENCE_RE = _terms_pattern(REFERENCE_TERMS)
+_UNACCENTED_REFERENCE_RE = _terms_pattern(UNACCENTED_REFERENCE_TERMS)
+_PREFIX_RE = re.compile(
+    rf"^(?:{'|'.join(re.escape(p) for p in sorted(FOLLOW_UP_PREFIXES, key=len, reverse=True))})(?!\w)")
+_SUFFIX_RE = re.compile(
+    rf"(?<!\w)(?:{'|'.join(re.escape(s) for s in sorted(FOLLOW_UP_SUFFIXES, key=len, reverse=True))})\W*$")
+
+
+def needs_condense(query: str, short_query_words: int) -> bool:
+    """
+    Bộ phân loại heuristic: câu hỏi có cần viết lại thành câu độc lập hay không.
+    Cần khi câu quá ngắn, chứa đại từ/từ chỉ định hoặc có dạng câu hỏi nối tiếp.
+    """
+    text = normalize_text(query)
+    if not text:
+        return False
+    if len(text.split()) <= short_query_words:
+        return True
+    if _PREFIX_RE.search(text) or _SUFFIX_RE.search(text):
+        return True
+    if _REFERENCE_RE.search(text):
+        return True
+    return bool(_UNACCENTED_REFERENCE_RE.search(strip_accents(text)))
+
+
+def trim_history(history: List[ChatMessage], max_messages: int, max_tokens: int) -> List[ChatMessage]:
+    """
+    Giữ tối đa `max_messages` tin nhắn gần nhất trong ngân sách `max_tokens`.
+    Tin nhắn mới nhất luôn được giữ (cắt bớt nếu quá dài).
+    """
+    trimmed: List[ChatMessage] = []
+    budget = max_tokens
+    for msg in reversed(history[-max_messages:] if max_messages > 0 else []):
+        cost = estimate_tokens(msg.content)
+        if cost > budget:
+            if not trimmed and budget > 0:
+                # Giữ phần cuối của tin nhắn vì thường chứa nội dung được nhắc tới
+                trimmed.append(ChatMessage(
+                    role=msg.role, content=msg.content[-budget * 4:]))
+            break
+        trimmed.append(msg)
+        budget -= cost
+    trimmed.reverse()
+    return trimmed
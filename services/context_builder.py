@@ -0,0 +1,158 @@
+# FILE: services/context_builder.py
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from langchain_core.documents import Document
+
+from core.text_utils import estimate_tokens, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Độ dài overlap tối thiểu (ký tự) để coi hai chunk là liền kề.
+# Splitter dùng chunk_overlap=200 nên tìm overlap trong tối đa 400 ký tự cuối.
+MIN_OVERLAP_CHARS = 30
+MAX_OVERLAP_CHARS = 400
+
+# Ngân sách còn lại tối thiểu (token) để chèn phần đầu của một đoạn quá dài
+MIN_PARTIAL_TOKENS = 100
+
+# Số từ mỗi shingle khi so sánh gần trùng lặp
+SHINGLE_SIZE = 5
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class _Segment:
+    group: str
+    text: str
+    score: float
+    # Thứ tự xuất hiện đầu tiên trong kết quả truy xuất, dùng để sắp xếp khi render
+    position: int
+    shingles: Set[int] = field(default_factory=set)
+
+
+def _group_key(doc: Document) -> str:
+    metadata = doc.metadata
+    for key in ("job_id", "source"):
+        if metadata.get(key):
+            return f"{key}:{metadata[key]}"
+    return f"id:{doc.id or metadata.get('_id') or id(doc)}"
+
+
+def _doc_score(doc: Document, rank: int) -> float:
+    metadata = doc.metadata
+    for key in ("rrf_score", "score"):
+        if isinstance(metadata.get(key), (int, float)):
+            return float(metadata[key])
+    return 1.0 / (rank + 1)
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """Độ dài đoạn cuối của `left` trùng với đoạn đầu của `right` (0 nếu không có)."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(left) - MAX_OVERLAP_CHARS)
+    idx = left.find(probe, start)
+    while idx != -1:
+        if right.startswith(left[idx:]):
+            return len(left) - idx
+        idx = left.find(probe, idx + 1)
+    return 0
+
+
+def _merge_group(segments: List[_Segment]) -> List[_Segment]:
+    """Gộp các chunk chồng lấn/chứa nhau trong cùng một job hoặc tài liệu."""
+    merged = list(segments)
+    changed = True
+    while changed and len(merged) > 1:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(len(merged)):
+                if i == j:
+                    continue
+                a, b = merged[i], merged[j]
+                if b.text in a.text:
+                    text = a.text
+                else:
+                    overlap = _overlap_length(a.text, b.text)
+                    if not overlap:
+                        continue
+                    text = a.text + b.text[overlap:]
+                merged[i] = _Segment(a.group, text, max(a.score, b.score), min(a.position, b.position))
+                del merged[j]
+                changed = True
+                break
+            if changed:
+                break
+    return merged
+
+
+def _shingles(text: str) -> Set[int]:
+    words = _WORD_RE.findall(normalize_text(text))
+    if len(words) <= SHINGLE_SIZE:
+        return {hash(" ".join(words))}
+    return {hash(" ".join(words[i:i + SHINGLE_SIZE]))
+            for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _containment(a: Set[int], b: Set[int]) -> float:
+    # Dùng min thay vì hợp (Jaccard) để chunk nằm gọn trong một đoạn đã gộp cũng bị coi là trùng
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def build_context(docs: List[Document], max_tokens: int, dedup_threshold: float,
+                  separator: str = "\n\n") -> str:
+    """
+    Dựng ngữ cảnh cho QA prompt từ các document đã truy xuất:
+    gom chunk theo job/tài liệu, gộp chunk chồng lấn, bỏ đoạn gần trùng lặp
+    (tỉ lệ shingle chung >= `dedup_threshold`) rồi chọn các đoạn điểm cao nhất
+    cho vừa `max_tokens`.
+    """
+    groups: Dict[str, List[_Segment]] = {}
+    for rank, doc in enumerate(docs):
+        key = _group_key(doc)
+        groups.setdefault(key, []).append(
+            _Segment(key, doc.page_content, _doc_score(doc, rank), rank))
+
+    segments = [segment for group in groups.values() for segment in _merge_group(group)]
+
+    # Đoạn điểm cao được giữ trước, đoạn gần trùng với nó bị bỏ
+    segments.sort(key=lambda s: (-s.score, s.position))
+    kept: List[_Segment] = []
+    for segment in segments:
+        segment.shingles = _shingles(segment.text)
+        if any(_containment(segment.shingles, other.shingles) >= dedup_threshold for other in kept):
+            continue
+        kept.append(segment)
+
+    selected: List[_Segment] = []
+    budget = max_tokens
+    for segment in kept:
+        cost = estimate_tokens(segment.text)
+        if cost <= budget:
+            selected.append(segment)
+            budget -= cost
+        elif budget >= MIN_PARTIAL_TOKENS:
+            # Đoạn gộp dài hơn phần ngân sách còn lại: giữ phần đầu, cắt ở ranh giới từ
+            text = segment.text[:budget * 4].rsplit(" ", 1)[0]
+            selected.append(_Segment(segment.group, text, segment.score, segment.position))
+            budget -= estimate_tokens(text)
+
+    # Render theo nhóm, nhóm có đoạn xuất hiện sớm nhất đứng trước
+    group_order: Dict[str, int] = {}
+    for segment in sorted(selected, key=lambda s: s.position):
+        group_order.setdefault(segment.group, segment.position)
+    selected.sort(key=lambda s: (group_order[s.group], s.position))
+
+    logger.info(
+        f"Context built from {len(docs)} chunks: {len(segments)} after merge, "
+        f"{len(kept)} after dedup, {len(selected)} packed "
+        f"(~{max_tokens - budget}/{max_tokens} tokens)")
+    return separator.join(segment.text for segment in selected)
@@ -0,0 +1,172 @@
+# FILE: services/fast_router.py
+
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from core.text_utils import has_diacritics, keyword_pattern, normalize_text, strip_accents
+from core.vector_utils import cosine_similarity, mean_vector
+
+logger = logging.getLogger(__name__)
+
+
+# Từ khóa đặc trưng cho từng nguồn. Dạng bỏ dấu chỉ dùng khi câu hỏi gõ không dấu.
+ROUTE_KEYWORDS: Dict[str, List[str]] = {
+    "recruitment": [
+        "tuyển", "việc làm", "công việc", "ứng tuyển", "ứng viên", "lương",
+        "thực tập", "intern", "fresher", "junior", "senior", "kỹ sư",
+        "developer", "lập trình", "full time", "part time", "remote",
+        "kinh nghiệm", "cv",
+    ],
+    "company_policies": [
+        "chính sách", "bảo mật", "điều khoản", "quy định", "quyền riêng tư",
+        "dữ liệu cá nhân", "khiếu nại", "hoàn tiền", "vi phạm", "tài khoản",
+        "cookie",
+    ],
+}
+
+# Câu hỏi mẫu dùng để tính centroid embedding cho từng nguồn
+ROUTE_SAMPLE_QUERIES: Dict[str, List[str]] = {
+    "recruitment": [
+        "Có việc Java ở TP. Hồ Chí Minh không?",
+        "Tìm việc làm lập trình viên ReactJS remote",
+        "Công việc nào lương trên 2000 USD?",
+        "Có vị trí thực tập marketing ở Hà Nội không?",
+        "Tôi có 3 năm kinh nghiệm backend, nên ứng tuyển job nào?",
+    ],
+    "company_policies": [
+        "Chính sách bảo mật dữ liệu cá nhân của CareerZone là gì?",
+        "Quy định đăng tin tuyển dụng trên website như thế nào?",
+        "Điều khoản sử dụng dịch vụ có những gì?",
+        "Làm sao để khiếu nại về một nhà tuyển dụng?",
+        "Tài khoản của tôi bị khóa vì vi phạm quy định nào?",
+    ],
+}
+
+
+# Ghi log tỉ lệ theo tầng sau mỗi N lần định tuyến
+STATS_LOG_EVERY = 100
+
+
+class RouteDecision(NamedTuple):
+    destination: Optional[str]
+    tier: str
+    confidence: float
+
+
+class FastRouter:
+    """
+    Router cục bộ chạy trước LLM router.
+    Tầng 1: từ khóa. Tầng 2: so sánh embedding câu hỏi với centroid của từng nguồn.
+    Chỉ khi độ chênh lệch độ tương đồng nhỏ hơn `margin` mới trả về None để gọi LLM.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        descriptions: Dict[str, str],
+        margin: float,
+        keywords: Optional[Dict[str, List[str]]] = None,
+        sample_queries: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.embeddings = embeddings
+        self.margin = margin
+        keywords = keywords if keywords is not None else ROUTE_KEYWORDS
+        self._keyword_patterns = {name: keyword_pattern(words)
+                                  for name, words in keywords.items()}
+        self._folded_keyword_patterns = {name: keyword_pattern(strip_accents(word) for word in words)
+                                         for name, words in keywords.items()}
+        self._sample_queries = sample_queries if sample_queries is not None else ROUTE_SAMPLE_QUERIES
+        self._descriptions = descriptions
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    def _centroid_texts(self) -> Dict[str, List[str]]:
+        return {
+            name: [description] + self._sample_queries.get(name, [])
+            for name, description in self._descriptions.items()
+        }
+
+    def _set_centroids(self, texts: Dict[str, List[str]], vectors: List[List[float]]) -> None:
+        centroids = {}
+        offset = 0
+        for name, route_texts in texts.items():
+            centroids[name] = mean_vector(
+                vectors[offset:offset + len(route_texts)])
+            offset += len(route_texts)
+        self._centroids = centroids
+
+    def warm_up(self) -> None:
+        """Tính trước centroid embedding (một lần gọi embed_documents)."""
+        with self._lock:
+            if self._centroids is not None:
+                return
+            texts = self._centroid_texts()
+            flat = [text for route_texts in texts.values()
+                    for text in route_texts]
+            self._set_centroids(texts, self.embeddings.embed_documents(flat))
+
+    async def _awarm_up(self) -> None:
+        if self._centroids is not None:
+            return
+        texts = self._centroid_texts()
+        flat = [text for route_texts in texts.values() for text in route_texts]
+        self._set_centroids(texts, await self.embeddings.aembed_documents(flat))
+
+    def _route_by_keywords(self, query: str) -> Optional[RouteDecision]:
+        normalized = normalize_text(query)
+        # Câu hỏi có dấu chỉ so với từ khóa có dấu: bỏ dấu thì "số lượng" khớp "lương",
+        # "tuyến xe" khớp "tuyển". Dạng bỏ dấu chỉ dùng khi người dùng gõ không dấu.
+        patterns = self._keyword_patterns if has_diacritics(normalized) else self._folded_keyword_patterns
+        matched = [
+            name for name, pattern in patterns.items()
+            if pattern.search(normalized)
+        ]
+        # Chỉ quyết định khi đúng một nguồn khớp, còn lại để tầng sau xử lý
+        if len(matched) == 1:
+            return RouteDecision(matched[0], "keyword", 1.0)
+        return None
+
+    def _route_by_embedding(self, query_vector: List[float]) -> RouteDecision:
+        scores = sorted(
+            ((cosine_similarity(query_vector, centroid), name)
+             for name, centroid in self._centroids.items()),
+            reverse=True,
+        )
+        best_score, best_name = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else -1.0
+        confidence = best_score - runner_up
+        if confidence >= self.margin:
+            return RouteDecision(best_name, "embedding", float(confidence))
+        return RouteDecision(None, "embedding", float(confidence))
+
+    def route(self, query: str) -> RouteDecision:
+        decision = self._route_by_keywords(query)
+        if decision:
+            return decision
+        self.warm_up()
+        return self._route_by_embedding(self.embeddings.embed_query(query))
+
+    async def aroute(self, query: str) -> RouteDecision:
+        decision = self._route_by_keywords(query)
+        if decision:
+            return decision
+        await self._awarm_up()
+        return self._route_by_embedding(await self.embeddings.aembed_query(query))
+
+    def record(self, tier: str) -> None:
+        self.stats[tier] += 1
+        total = sum(self.stats.values())
+        if total % STATS_LOG_EVERY == 0:
+            logger.info(f"Router tier hit rates after {total} queries: {self.hit_rates()}")
+
+    def hit_rates(self) -> Dict[str, float]:
+        """Tỉ lệ request được quyết định ở mỗi tầng (keyword, embedding, llm, fallback)."""
+        total = sum(self.stats.values())
+        if total == 0:
+            return {}
+        return {tier: count / total for tier, count in self.stats.items()}
@@ -0,0 +1,288 @@
+# FILE: services/filter_extractor.py
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.text_utils import keyword_pattern, normalize_text, strip_accents
+from schemas.job_filters import JobFilters
+
+logger = logging.getLogger(__name__)
+
+# Gazetteer: (các giá trị lưu trong metadata, các cách người dùng gọi tên).
+# Giá trị lưu trong dữ liệu không đồng nhất ("Quận Cầu Giấy" và "Cầu Giấy") nên liệt kê đủ biến thể.
+Gazetteer = List[Tuple[Sequence[str], Sequence[str]]]
+
+CITY_GAZETTEER: Gazetteer = [
+    (["TP. Hồ Chí Minh"], ["hồ chí minh", "tp hcm", "tphcm", "hcm", "sài gòn", "saigon"]),
+    (["Hà Nội"], ["hà nội", "hanoi", "hn"]),
+    (["Đà Nẵng"], ["đà nẵng", "danang"]),
+    (["Hải Phòng"], ["hải phòng"]),
+    (["Cần Thơ"], ["cần thơ"]),
+]
+
+NAMED_DISTRICTS = [
+    # Hà Nội
+    "Ba Đình", "Cầu Giấy", "Hoàn Kiếm", "Đống Đa", "Hai Bà Trưng", "Thanh Xuân",
+    "Nam Từ Liêm", "Bắc Từ Liêm", "Hà Đông", "Tây Hồ", "Long Biên", "Hoàng Mai",
+    # TP. Hồ Chí Minh
+    "Bình Thạnh", "Phú Nhuận", "Tân Bình", "Tân Phú", "Gò Vấp", "Bình Tân",
+]
+
+DISTRICT_GAZETTEER: Gazetteer = [
+    ([f"Quận {name}", name], [f"quận {name}", name]) for name in NAMED_DISTRICTS
+] + [
+    (["Thành phố Thủ Đức", "TP. Thủ Đức", "Quận 2 (nay là TP. Thủ Đức)", "Quận 9 (nay là TP. Thủ Đức)"],
+     ["thủ đức"]),
+    (["Huyện Bình Chánh"], ["bình chánh"]),
+    (["Huyện Củ Chi"], ["củ chi"]),
+]
+
+# Quận số ở TP. Hồ Chí Minh: "quận 1", "q1", "q.7"
+_NUMBERED_DISTRICT_RE = re.compile(r"(?<!\w)(?:quan|q\.?)\s*(\d{1,2})(?!\d)")
+_MERGED_DISTRICTS = {2: "Quận 2 (nay là TP. Thủ Đức)", 9: "Quận 9 (nay là TP. Thủ Đức)"}
+
+EXPERIENCE_GAZETTEER: Gazetteer = [
+    (["INTERN"], ["intern", "thực tập", "thực tập sinh"]),
+    (["FRESHER"], ["fresher", "mới tốt nghiệp", "mới ra trường"]),
+    (["NO_EXPERIENCE", "FRESHER", "INTERN"], ["không yêu cầu kinh nghiệm", "chưa có kinh nghiệm", "không cần kinh nghiệm"]),
+    (["ENTRY_LEVEL"], ["junior", "entry level", "entry"]),
+    (["MID_LEVEL"], ["middle", "mid level", "mid"]),
+    (["SENIOR_LEVEL"], ["senior", "sr"]),
+    (["EXECUTIVE"], ["lead", "team lead", "trưởng nhóm", "manager", "quản lý", "giám đốc", "executive"]),
+]
+
+# Số năm kinh nghiệm -> cấp bậc tương ứng (ngưỡng trên, các cấp bậc)
+EXPERIENCE_BY_YEARS: List[Tuple[float, List[str]]] = [
+    (1, ["NO_EXPERIENCE", "FRESHER", "INTERN"]),
+    (3, ["ENTRY_LEVEL", "FRESHER"]),
+    (5, ["MID_LEVEL", "ENTRY_LEVEL"]),
+    (float("inf"), ["SENIOR_LEVEL", "MID_LEVEL"]),
+]
+_YEARS_RE = re.compile(
+    r"(\d+(?:[.,]\d+)?)\s*\+?\s*nam\s*(?:kinh nghiem|kn)|kinh nghiem\s*(\d+(?:[.,]\d+)?)\s*\+?\s*nam")
+
+WORK_TYPE_GAZETTEER: Gazetteer = [
+    (["REMOTE"], ["remote", "từ xa", "làm tại nhà", "wfh", "work from home"]),
+    (["HYBRID"], ["hybrid", "kết hợp"]),
+    (["ON_SITE"], ["onsite", "on site", "tại văn phòng", "ở văn phòng"]),
+]
+
+JOB_TYPE_GAZETTEER: Gazetteer = [
+    (["FULL_TIME"], ["full time", "fulltime", "toàn thời gian"]),
+    (["PART_TIME"], ["part time", "parttime", "bán thời gian"]),
+    (["FREELANCE"], ["freelance", "freelancer"]),
+    (["CONTRACT"], ["contract", "hợp đồng ngắn hạn", "theo hợp đồng"]),
+    (["VOLUNTEER"], ["volunteer", "tình nguyện"]),
+    (["INTERNSHIP"], ["internship"]),
+]
+
+_IT_CATEGORIES = ["IT", "SOFTWARE_DEVELOPMENT", "WEB_DEVELOPMENT", "DATA_SCIENCE", "MACHINE_LEARNING"]
+
+CATEGORY_GAZETTEER: Gazetteer = [
+    (["DATA_SCIENCE", "MACHINE_LEARNING"], ["data science", "data scientist", "khoa học dữ liệu", "phân tích dữ liệu", "data analyst"]),
+    (["MACHINE_LEARNING", "DATA_SCIENCE"], ["machine learning", "học máy", "ai engineer", "trí tuệ nhân tạo"]),
+    (["WEB_DEVELOPMENT", "SOFTWARE_DEVELOPMENT", "IT"], ["web", "frontend", "front end", "backend", "back end", "fullstack", "full stack"]),
+    (_IT_CATEGORIES, ["it", "lập trình", "lập trình viên", "developer", "kỹ sư phần mềm", "software"]),
+    (["MARKETING"], ["marketing"]),
+    (["ACCOUNTING"], ["kế toán", "accounting", "accountant"]),
+    (["FINANCE"], ["tài chính", "finance"]),
+    (["HUMAN_RESOURCES"], ["nhân sự", "hr", "tuyển dụng viên"]),
+    (["LOGISTICS"], ["logistics", "kho vận", "chuỗi cung ứng"]),
+    (["GRAPHIC_DESIGN"], ["thiết kế đồ họa", "graphic design", "designer"]),
+    (["LAW"], ["luật", "pháp lý", "pháp chế"]),
+    (["REAL_ESTATE"], ["bất động sản"]),
+    (["SALES"], ["sales", "bán hàng", "kinh doanh"]),
+    (["CUSTOMER_SERVICE"], ["chăm sóc khách hàng", "customer service"]),
+    (["MEDICAL"], ["y tế", "bác sĩ", "điều dưỡng"]),
+    (["TEACHING"], ["giáo viên", "giảng dạy", "gia sư"]),
+    (["HOSPITALITY"], ["nhà hàng", "khách sạn"]),
+    (["ADMINISTRATION"], ["hành chính"]),
+    (["PRODUCTION"], ["sản xuất"]),
+    (["CONTENT_WRITING"], ["content writer", "viết nội dung", "copywriter"]),
+]
+
+# Lương: so khớp trên văn bản không dấu
+_NUMBER = r"(\d+(?:[.,]\d+)*)"
+_UNIT = r"\s*(trieu|tr|m|k|usd|\$|do)?(?!\w)"
+_SALARY_RANGE_RE = re.compile(
+    rf"\$?{_NUMBER}{_UNIT}\s*(?:-|–|den|toi)\s*\$?{_NUMBER}{_UNIT}")
+_SALARY_MIN_RE = re.compile(
+    rf"(?:tren|tu|hon|it nhat|toi thieu|>=?)\s*\$?{_NUMBER}{_UNIT}")
+_SALARY_MAX_RE = re.compile(
+    rf"(?:duoi|toi da|khong qua|<=?)\s*\$?{_NUMBER}{_UNIT}")
+_SALARY_CONTEXT_RE = re.compile(r"(?<!\w)(?:luong|salary|thu nhap)(?!\w)")
+# "m" (mét) và "do" (đó, độ khi bỏ dấu) chưa đủ để coi con số là lương nếu câu không nhắc tới lương
+_WEAK_SALARY_UNITS = {"m", "do"}
+
+# Alias trùng với từ tiếng Việt gõ không dấu ("it" và "ít"): chỉ nhận khi viết hoa
+# trong câu hỏi gốc ("IT") hoặc đứng sau từ chỉ ngành ("ngành it")
+_AMBIGUOUS_ALIASES = {"it"}
+_ALIAS_CONTEXT = r"(?:ngành|nganh|lĩnh vực|linh vuc)\s+"
+
+# (giá trị, pattern trên văn bản có dấu, pattern trên văn bản bỏ dấu, pattern alias mơ hồ)
+Matcher = Tuple[Sequence[str], Optional["re.Pattern[str]"], Optional["re.Pattern[str]"],
+                Optional[Tuple["re.Pattern[str]", "re.Pattern[str]"]]]
+
+
+def _compile(gazetteer: Gazetteer) -> List[Matcher]:
+    """
+    Alias không dấu ("hn", "sr", "web") chỉ so khớp trên văn bản có dấu: văn bản bỏ dấu
+    biến nhiều từ tiếng Việt thành chúng ("ít nhất" -> "it nhat"). Văn bản bỏ dấu chỉ
+    dùng cho alias có dấu mà người dùng gõ thiếu hoặc sai dấu ("ha noi").
+    """
+    matchers = []
+    for values, keywords in gazetteer:
+        keywords = [normalize_text(keyword) for keyword in keywords]
+        plain = [k for k in keywords if k not in _AMBIGUOUS_ALIASES]
+        accented = [k for k in plain if strip_accents(k) != k]
+        ambiguous = [k for k in keywords if k in _AMBIGUOUS_ALIASES]
+        matchers.append((
+            values,
+            keyword_pattern(plain) if plain else None,
+            keyword_pattern(strip_accents(k) for k in accented) if accented else None,
+            (re.compile(rf"(?<!\w)(?:{'|'.join(re.escape(k.upper()) for k in ambiguous)})(?!\w)"),
+             re.compile(rf"(?<!\w){_ALIAS_CONTEXT}(?:{'|'.join(re.escape(k) for k in ambiguous)})(?!\w)"))
+            if ambiguous else None,
+        ))
+    return matchers
+
+
+_CITY_PATTERNS = _compile(CITY_GAZETTEER)
+_DISTRICT_PATTERNS = _compile(DISTRICT_GAZETTEER)
+_EXPERIENCE_PATTERNS = _compile(EXPERIENCE_GAZETTEER)
+_WORK_TYPE_PATTERNS = _compile(WORK_TYPE_GAZETTEER)
+_JOB_TYPE_PATTERNS = _compile(JOB_TYPE_GAZETTEER)
+_CATEGORY_PATTERNS = _compile(CATEGORY_GAZETTEER)
+
+
+def _matches(matcher: Matcher, query: str, normalized: str, unaccented: str) -> bool:
+    _, accented, folded, ambiguous = matcher
+    if accented is not None and accented.search(normalized):
+        return True
+    if folded is not None and folded.search(unaccented):
+        return True
+    if ambiguous is not None:
+        upper, in_context = ambiguous
+        return bool(upper.search(query) or in_context.search(normalized))
+    return False
+
+
+def _lookup(matchers: List[Matcher], query: str, normalized: str, unaccented: str) -> Optional[List[str]]:
+    values: List[str] = []
+    for matcher in matchers:
+        if _matches(matcher, query, normalized, unaccented):
+            values.extend(v for v in matcher[0] if v not in values)
+    return values or None
+
+
+def _parse_number(raw: str) -> float:
+    # "1.500" / "1,500" là phân cách hàng nghìn, "1.5" / "1,5" là số thập phân
+    parts = re.split(r"[.,]", raw)
+    if len(parts) > 1 and all(len(part) == 3 for part in parts[1:]):
+        return float("".join(parts))
+    return float(raw.replace(",", "."))
+
+
+def _to_salary_unit(raw: str, unit: Optional[str], vnd_per_unit: float) -> float:
+    """Quy đổi về đơn vị lương lưu trong dữ liệu job (mặc định USD)."""
+    amount = _parse_number(raw)
+    if unit in ("trieu", "tr", "m"):
+        return amount * 1_000_000 / vnd_per_unit
+    if unit == "k":
+        return amount * 1000
+    if unit is None and amount >= 100_000:
+        # Số lớn không kèm đơn vị được hiểu là VND
+        return amount / vnd_per_unit
+    return amount
+
+
+def _is_salary(unaccented: str, *units: Optional[str]) -> bool:
+    """Con số là lương nếu có đơn vị tiền rõ ràng hoặc câu hỏi nhắc tới lương."""
+    if any(unit and unit not in _WEAK_SALARY_UNITS for unit in units):
+        return True
+    return bool(_SALARY_CONTEXT_RE.search(unaccented))
+
+
+def _extract_salary(unaccented: str, vnd_per_unit: float) -> Tuple[Optional[float], Optional[float]]:
+    match = _SALARY_RANGE_RE.search(unaccented)
+    if match:
+        low_raw, low_unit, high_raw, high_unit = match.groups()
+        if _is_salary(unaccented, low_unit, high_unit):
+            # "15-20 triệu": đơn vị của số sau áp dụng cho cả số trước
+            low = _to_salary_unit(low_raw, low_unit or high_unit, vnd_per_unit)
+            high = _to_salary_unit(high_raw, high_unit or low_unit, vnd_per_unit)
+            return min(low, high), max(low, high)
+
+    min_salary = max_salary = None
+    match = _SALARY_MIN_RE.search(unaccented)
+    if match and _is_salary(unaccented, match.group(2)):
+        min_salary = _to_salary_unit(match.group(1), match.group(2), vnd_per_unit)
+    match = _SALARY_MAX_RE.search(unaccented)
+    if match and _is_salary(unaccented, match.group(2)):
+        max_salary = _to_salary_unit(match.group(1), match.group(2), vnd_per_unit)
+    return min_salary, max_salary
+
+
+def _extract_districts(query: str, normalized: str, unaccented: str) -> Optional[List[str]]:
+    districts = _lookup(_DISTRICT_PATTERNS, query, normalized, unaccented) or []
+    for match in _NUMBERED_DISTRICT_RE.finditer(unaccented):
+        number = int(match.group(1))
+        if 1 <= number <= 12:
+            for value in (f"Quận {number}", _MERGED_DISTRICTS.get(number)):
+                if value and value not in districts:
+                    districts.append(value)
+    return districts or None
+
+
+def _extract_experience(query: str, normalized: str, unaccented: str) -> Optional[List[str]]:
+    levels = _lookup(_EXPERIENCE_PATTERNS, query, normalized, unaccented) or []
+    match = _YEARS_RE.search(unaccented)
+    if match:
+        years = _parse_number(match.group(1) or match.group(2))
+        for upper, candidates in EXPERIENCE_BY_YEARS:
+            if years < upper:
+                levels.extend(v for v in candidates if v not in levels)
+                break
+    # Người dùng có thể gõ thẳng giá trị enum, ví dụ "SENIOR_LEVEL"
+    for token in re.findall(r"[a-z]+_level", normalized):
+        if token.upper() not in levels:
+            levels.append(token.upper())
+    return levels or None
+
+
+def extract_filters(query: str, vnd_per_unit: float) -> JobFilters:
+    """
+    Trích bộ lọc job từ câu hỏi bằng gazetteer và regex, không gọi LLM.
+    Chỉ trả về giá trị khi khớp rõ ràng; câu hỏi mơ hồ cho bộ lọc rỗng.
+    """
+    normalized = normalize_text(query)
+    unaccented = strip_accents(normalized)
+    min_salary, max_salary = _extract_salary(unaccented, vnd_per_unit)
+    return JobFilters(
+        city=_lookup(_CITY_PATTERNS, query, normalized, unaccented),
+        district=_extract_districts(query, normalized, unaccented),
+        experience=_extract_experience(query, normalized, unaccented),
+        workType=_lookup(_WORK_TYPE_PATTERNS, query, normalized, unaccented),
+        type=_lookup(_JOB_TYPE_PATTERNS, query, normalized, unaccented),
+        category=_lookup(_CATEGORY_PATTERNS, query, normalized, unaccented),
+        minSalary=min_salary,
+        maxSalary=max_salary,
+    )
+
+
+def build_filter_clauses(job_filters: Optional[JobFilters]) -> List[Dict[str, Any]]:
+    """Chuyển JobFilters thành các mệnh đề pre_filter cho $vectorSearch (ghép bằng $and)."""
+    if job_filters is None:
+        return []
+    clauses = []
+    for field in ("city", "district", "experience", "workType", "type", "category"):
+        values = getattr(job_filters, field)
+        if values:
+            clauses.append({field: {"$in": values}})
+    # Khoảng lương mong muốn phải giao với khoảng lương của job
+    if job_filters.minSalary is not None:
+        clauses.append({"maxSalary": {"$gte": job_filters.minSalary}})
+    if job_filters.maxSalary is not None:
+        clauses.append({"minSalary": {"$lte": job_filters.maxSalary}})
+    return clauses
@@ -0,0 +1,417 @@
+# FILE: services/ingestion.py
+"""
+Pipeline nạp dữ liệu hàng loạt vào vector store.
+Embed theo batch với số worker giới hạn, backoff khi gặp rate limit,
+ghi bằng insert_many không thứ tự và lưu checkpoint để chạy tiếp khi bị dừng.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pymongo import DeleteMany, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, WTimeoutError
+from tqdm import tqdm
+
+# Tên trường mặc định mà MongoDBAtlasVectorSearch dùng
+TEXT_KEY = "text"
+EMBEDDING_KEY = "embedding"
+# Hash nội dung (page_content + tên model embedding) lưu cạnh vector
+CONTENT_HASH_KEY = "content_hash"
+
+_DUPLICATE_KEY_ERROR = 11000
+
+
+def iter_json_array(path: str, read_size: int = 1 << 16) -> Iterator[Any]:
+    """Đọc lần lượt từng phần tử của một mảng JSON mà không nạp cả file vào bộ nhớ."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        started = False
+        eof = False
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    if eof:
+                        return
+                    chunk = f.read(read_size)
+                    eof = not chunk
+                    buffer += chunk
+                    continue
+                if buffer[0] != "[":
+                    raise ValueError(f"{path} không phải là một mảng JSON.")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def content_hash(text: str, model_name: str) -> str:
+    return hashlib.sha256(f"{model_name}\n{text}".encode("utf-8")).hexdigest()
+
+
+def assign_chunk_identity(doc: Document, prefix: str, model_name: str) -> Document:
+    """
+    Gắn content_hash và _id ổn định cho chunk. _id phụ thuộc nội dung nên chunk
+    không đổi giữ nguyên _id qua các lần nạp, chunk đổi nội dung sẽ có _id mới.
+    """
+    digest = content_hash(doc.page_content, model_name)
+    doc.metadata[CONTENT_HASH_KEY] = digest
+    doc.id = f"{prefix}:{digest[:24]}"
+    return doc
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    current: Optional[BaseException] = error
+    while current is not None:
+        message = str(current).lower()
+        if type(current).__name__ in ("ResourceExhausted", "TooManyRequests") \
+                or "429" in message or "resource exhausted" in message \
+                or "rate limit" in message or "quota" in message:
+            return True
+        current = current.__cause__
+    return False
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Lỗi do sự cố tạm thời của hạ tầng (rate limit, mất kết nối hoặc timeout MongoDB/mạng),
+    không phải do dữ liệu: thử lại cùng dữ liệu sau một lúc sẽ thành công.
+    """
+    if is_rate_limit_error(error):
+        return True
+    current: Optional[BaseException] = error
+    while current is not None:
+        if isinstance(current, (ConnectionFailure, ExecutionTimeout, WTimeoutError, TimeoutError, ConnectionError)):
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class RetryPolicy:
+    """
+    Exponential backoff có jitter. Khi một worker gặp rate limit, mọi worker
+    dùng chung policy sẽ cùng tạm dừng cho đến hết thời gian chờ.
+    """
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_for_pause(self) -> None:
+        with self._lock:
+            delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int, rate_limited: bool) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if rate_limited:
+            delay = min(self.max_delay, delay * 2)
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(self, fn: Callable[[], Any], description: str = "") -> Any:
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                rate_limited = is_rate_limit_error(e)
+                delay = self._backoff(attempt, rate_limited)
+                if rate_limited:
+                    with self._lock:
+                        self._pause_until = max(
+                            self._pause_until, time.monotonic() + delay)
+                tqdm.write(
+                    f"  - {description} lỗi ({'rate limit' if rate_limited else e}), thử lại sau {delay:.1f}s "
+                    f"(lần {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+
+def to_vector_records(documents: List[Document], vectors: List[List[float]]) -> List[Dict[str, Any]]:
+    """Chuyển Document + embedding sang định dạng MongoDBAtlasVectorSearch lưu trữ."""
+    records = []
+    for doc, vector in zip(documents, vectors):
+        record = {TEXT_KEY: doc.page_content, EMBEDDING_KEY: vector, **doc.metadata}
+        if doc.id:
+            record["_id"] = doc.id
+        records.append(record)
+    return records
+
+
+def insert_records(collection: Collection, records: List[Dict[str, Any]]) -> int:
+    """insert_many không thứ tự; bỏ qua lỗi trùng _id (batch đã được ghi trước khi crash)."""
+    if not records:
+        return 0
+    try:
+        return len(collection.insert_many(records, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != _DUPLICATE_KEY_ERROR for err in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+class Checkpoint:
+    """Lưu số bản ghi nguồn đã được ghi liên tục từ đầu (watermark)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed = 0
+        if path.exists():
+            self.completed = json.loads(path.read_text(encoding="utf-8")).get("completed", 0)
+
+    def save(self, completed: int) -> None:
+        self.completed = completed
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"completed": completed}), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def clear(self) -> None:
+        self.completed = 0
+        if self.path.exists():
+            self.path.unlink()
+
+
+class BulkLoader:
+    """
+    Nạp các Document theo batch. Mỗi phần tử đầu vào là (số thứ tự bản ghi nguồn,
+    danh sách Document của bản ghi đó); checkpoint ghi lại bản ghi nguồn cuối cùng
+    mà mọi batch trước nó đều đã được ghi xong.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        embeddings: Embeddings,
+        checkpoint: Checkpoint,
+        batch_size: int,
+        concurrency: int,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def _process_batch(self, documents: List[Document]) -> int:
+        texts = [doc.page_content for doc in documents]
+        vectors = self.retry_policy.call(
+            lambda: self.embeddings.embed_documents(texts), "Embedding batch")
+        records = to_vector_records(documents, vectors)
+        return self.retry_policy.call(
+            lambda: insert_records(self.collection, records), "Ghi batch")
+
+    def _batches(self, items: Iterable[Tuple[int, List[Document]]]) -> Iterator[Tuple[int, List[Document]]]:
+        batch: List[Document] = []
+        last_index = -1
+        for index, documents in items:
+            if index < self.checkpoint.completed:
+                continue
+            batch.extend(documents)
+            last_index = index
+            if len(batch) >= self.batch_size:
+                yield last_index, batch
+                batch = []
+        if batch:
+            yield last_index, batch
+
+    def run(self, items: Iterable[Tuple[int, List[Document]]], total: Optional[int] = None) -> int:
+        """Trả về số chunk đã ghi."""
+        if self.checkpoint.completed:
+            print(f"Tiếp tục từ checkpoint: đã xong {self.checkpoint.completed} bản ghi.")
+        inserted = 0
+        pending: Dict[Future, int] = {}
+        # Thứ tự các batch đã gửi, để đẩy watermark theo đúng thứ tự bản ghi
+        submitted: List[int] = []
+        finished = set()
+
+        progress = tqdm(total=total, initial=self.checkpoint.completed, unit="record")
+
+        def drain(return_when) -> None:
+            nonlocal inserted
+            done, _ = wait(list(pending), return_when=return_when)
+            for future in done:
+                last_index = pending.pop(future)
+                inserted += future.result()
+                finished.add(last_index)
+            while submitted and submitted[0] in finished:
+                last_index = submitted.pop(0)
+                finished.discard(last_index)
+                progress.update(last_index + 1 - self.checkpoint.completed)
+                self.checkpoint.save(last_index + 1)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for last_index, batch in self._batches(items):
+                    # Giới hạn số batch đang chờ để không nạp quá nhiều vào bộ nhớ
+                    if len(pending) >= self.concurrency * 2:
+                        drain(FIRST_COMPLETED)
+                    pending[executor.submit(self._process_batch, batch)] = last_index
+                    submitted.append(last_index)
+                while pending:
+                    drain(FIRST_COMPLETED)
+        finally:
+            progress.close()
+        return inserted
+
+
+@dataclass
+class SyncStats:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    # _id của các chunk đã bị thêm/sửa/xóa, để vô hiệu hóa cache liên quan
+    changed_records: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def add_counts(self, other: "SyncStats") -> None:
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.deleted += other.deleted
+        self.unchanged += other.unchanged
+
+
+def _sync_scope(
+    collection: Collection,
+    documents: Iterable[Document],
+    embeddings: Embeddings,
+    batch_size: int,
+    retry_policy: RetryPolicy,
+    scope_filter: Dict[str, Any],
+) -> SyncStats:
+    """Đồng bộ các chunk khớp `scope_filter` với `documents`; chunk ngoài phạm vi không bị động tới."""
+    stats = SyncStats()
+    desired = {doc.id: doc for doc in documents}
+    existing = {
+        record["_id"]: record
+        for record in collection.find(scope_filter, {TEXT_KEY: 0, EMBEDDING_KEY: 0})
+    }
+
+    operations = []
+    for doc_id, record in existing.items():
+        doc = desired.get(doc_id)
+        if doc is None:
+            stats.deleted += 1
+            stats.changed_records.append(record)
+            continue
+        changes = {key: value for key, value in doc.metadata.items()
+                   if record.get(key) != value}
+        removed = {key: "" for key in record
+                   if key != "_id" and key not in doc.metadata}
+        if changes or removed:
+            update: Dict[str, Any] = {}
+            if changes:
+                update["$set"] = changes
+            if removed:
+                update["$unset"] = removed
+            operations.append(UpdateOne({"_id": doc_id}, update))
+            stats.updated += 1
+            stats.changed_records.append(record)
+        else:
+            stats.unchanged += 1
+
+    stale_ids = [record["_id"] for record in stats.changed_records
+                 if record["_id"] not in desired]
+    if stale_ids:
+        operations.append(DeleteMany({"_id": {"$in": stale_ids}}))
+    if operations:
+        retry_policy.call(lambda: collection.bulk_write(
+            operations, ordered=False), "Cập nhật/xóa chunk")
+
+    new_docs = [doc for doc_id, doc in desired.items()
+                if doc_id not in existing]
+    for start in range(0, len(new_docs), batch_size):
+        batch = new_docs[start:start + batch_size]
+        texts = [doc.page_content for doc in batch]
+        vectors = retry_policy.call(
+            lambda: embeddings.embed_documents(texts), "Embedding batch")
+        records = to_vector_records(batch, vectors)
+        stats.inserted += retry_policy.call(
+            lambda: insert_records(collection, records), "Ghi batch")
+        stats.changed_records.extend(
+            {"_id": doc.id, **doc.metadata} for doc in batch)
+    return stats
+
+
+def sync_documents(
+    collection: Collection,
+    documents: Iterable[Document],
+    embeddings: Embeddings,
+    batch_size: int,
+    retry_policy: Optional[RetryPolicy] = None,
+    scope_filter: Optional[Dict[str, Any]] = None,
+) -> SyncStats:
+    """
+    Đồng bộ tăng dần: chỉ embed chunk có _id (theo content_hash) chưa tồn tại,
+    cập nhật metadata tại chỗ cho chunk không đổi nội dung, và xóa chunk trong
+    `scope_filter` (mặc định cả collection) không còn trong nguồn. `documents`
+    phải đã được gắn định danh bằng assign_chunk_identity.
+    """
+    return _sync_scope(collection, documents, embeddings, batch_size,
+                       retry_policy or RetryPolicy(), scope_filter or {})
+
+
+def sync_document_groups(
+    collection: Collection,
+    groups: Iterable[Tuple[str, List[Document]]],
+    group_key: str,
+    embeddings: Embeddings,
+    batch_size: int,
+    retry_policy: Optional[RetryPolicy] = None,
+) -> Iterator[SyncStats]:
+    """
+    Đồng bộ tăng dần theo nhóm (ví dụ mọi chunk của một job): nguồn được đọc dần
+    thành batch khoảng `batch_size` chunk, mỗi batch chỉ so sánh với các chunk có
+    `group_key` thuộc batch đó. Nhóm không có trong nguồn (ví dụ job do Kafka
+    consumer nạp) không bị xóa. Trả về SyncStats của từng batch.
+    """
+    retry_policy = retry_policy or RetryPolicy()
+    batch: Dict[str, List[Document]] = {}
+    size = 0
+    for key, documents in groups:
+        batch[key] = documents
+        size += len(documents)
+        if size >= batch_size:
+            yield _sync_scope(collection, [doc for docs in batch.values() for doc in docs],
+                              embeddings, batch_size, retry_policy, {group_key: {"$in": list(batch)}})
+            batch, size = {}, 0
+    if batch:
+        yield _sync_scope(collection, [doc for docs in batch.values() for doc in docs],
+                          embeddings, batch_size, retry_policy, {group_key: {"$in": list(batch)}})
@@ -0,0 +1,153 @@
+# services/job_documents.py
+"""
+Lược đồ chung của chunk job trong `jobs_vector`.
+
+Initial load (data/jobs.json), Kafka consumer và nguồn sự kiện từ file đều dựng
+Document qua build_job_documents, nên mọi chunk có cùng nội dung và metadata:
+`job_id`, `city`, `district`, `deadline` (BSON date)... Xóa/cập nhật theo
+`job_id` và pre_filter vì vậy hoạt động giống nhau bất kể job được nạp từ đâu.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+
+from config import settings
+from services.ingestion import assign_chunk_identity
+
+JOB_SOURCE = "job_posting"
+
+
+class JobPayload(BaseModel):
+    jobId: str
+    description: str
+    title: str
+    requirements: Optional[str] = None
+    benefits: Optional[str] = None
+    skills: Optional[List[str]] = Field(default_factory=list)
+    category: Optional[str] = None
+    area: Optional[str] = None
+    minSalary: Optional[int] = None
+    maxSalary: Optional[int] = None
+    companyName: Optional[str] = None
+    location: Optional[dict] = Field(
+        default_factory=dict)  # {city, district, address}
+    type: Optional[str] = None  # e.g., FULL_TIME, PART_TIME
+    workType: Optional[str] = None  # e.g., ON_SITE, REMOTE
+    experience: Optional[str] = None  # e.g., '1-2 Năm'
+    # Dùng datetime để dễ dàng so sánh và query
+    deadline: Optional[datetime] = None
+
+
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=1000, chunk_overlap=200)
+
+
+def _get_value(data, key, sub_key=None):
+    """Lấy giá trị từ bản ghi Extended JSON (ví dụ {"$oid": ...}, {"$date": ...})."""
+    value = data.get(key)
+    if isinstance(value, dict) and sub_key:
+        return value.get(sub_key)
+    return value
+
+
+def _salary(job_data: dict, key: str) -> Optional[int]:
+    value = _get_value(job_data, key, "$numberDecimal")
+    return int(float(value)) if value is not None else None
+
+
+def _to_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def payload_from_raw_job(job_data: dict) -> Optional[JobPayload]:
+    """Chuyển một bản ghi job xuất từ MongoDB (data/jobs.json) thành JobPayload; None nếu thiếu _id."""
+    job_id = _get_value(job_data, "_id", "$oid")
+    if not job_id:
+        return None
+    deadline = _get_value(job_data, "deadline", "$date")
+    return JobPayload(
+        jobId=str(job_id),
+        title=job_data.get("title") or "",
+        description=job_data.get("description") or "",
+        requirements=job_data.get("requirements"),
+        benefits=job_data.get("benefits"),
+        skills=job_data.get("skills") or [],
+        category=job_data.get("category"),
+        area=job_data.get("area"),
+        minSalary=_salary(job_data, "minSalary"),
+        maxSalary=_salary(job_data, "maxSalary"),
+        companyName=job_data.get("companyName"),
+        location=job_data.get("location") or {},
+        type=job_data.get("type"),
+        workType=job_data.get("workType"),
+        experience=job_data.get("experience"),
+        deadline=datetime.fromisoformat(deadline.replace("Z", "+00:00")) if deadline else None,
+    )
+
+
+def job_content(job: JobPayload) -> str:
+    """
+    Văn bản dùng để embedding của một job.
+    Làm giàu nội dung để RAG tìm kiếm tốt hơn.
+    """
+    # Ghép các trường văn bản quan trọng để tạo ngữ cảnh đầy đủ
+    content_parts = [
+        f"Công ty: {job.companyName if job.companyName else 'Chưa cập nhật'}",
+        f"Tiêu đề công việc: {job.title}",
+        f"Mô tả: {job.description}"
+    ]
+    if job.requirements:
+        content_parts.append(f"Yêu cầu: {job.requirements}")
+    if job.benefits:
+        content_parts.append(f"Phúc lợi: {job.benefits}")
+    if job.type or job.workType:
+        content_parts.append(
+            f"Loại công việc: {job.type if job.type else 'N/A'}, Hình thức làm việc: {job.workType if job.workType else 'N/A'}")
+    if job.experience:
+        content_parts.append(f"Yêu cầu kinh nghiệm: {job.experience}")
+    if job.location:
+        content_parts.append(
+            f"Địa điểm: {job.location.get('city', 'N/A')}, {job.location.get('district', 'N/A')}")
+    if job.skills:
+        content_parts.append(f"Kỹ năng: {', '.join(job.skills)}")
+    if job.minSalary is not None and job.maxSalary is not None:
+        content_parts.append(f"Mức lương: {job.minSalary} - {job.maxSalary}")
+    return "\n".join(content_parts)
+
+
+def job_metadata(job: JobPayload) -> dict:
+    """
+    Metadata chung cho mọi chunk của job. Giữ cả field rỗng (None) để khi cập nhật
+    metadata bằng $set, giá trị cũ của field bị bỏ trống cũng được ghi đè.
+    """
+    return {
+        "source": JOB_SOURCE,
+        "job_id": job.jobId,
+        "title": job.title,
+        "companyName": job.companyName,
+        "city": job.location.get('city') if job.location else None,
+        "district": job.location.get('district') if job.location else None,
+        "category": job.category,
+        "experience": job.experience,
+        "workType": job.workType,
+        "type": job.type,
+        "area": job.area,
+        "minSalary": job.minSalary,
+        "maxSalary": job.maxSalary,
+        # Lưu dạng BSON date để lọc/xóa theo index thay vì so sánh chuỗi
+        "deadline": _to_utc(job.deadline) if job.deadline else None
+    }
+
+
+def build_job_documents(job: JobPayload) -> List[Document]:
+    """
+    Chia job thành các chunk (cùng metadata) và gắn _id/content_hash ổn định.
+    """
+    doc = Document(page_content=job_content(job), metadata=job_metadata(job))
+    documents = [assign_chunk_identity(chunk, job.jobId, settings.EMBEDDING_MODEL)
+                 for chunk in text_splitter.split_documents([doc])]
+    # Chunk trùng nội dung trong cùng một job có cùng _id, chỉ giữ một bản
+    return list({doc.id: doc for doc in documents}.values())
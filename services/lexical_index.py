@@ -0,0 +1,254 @@
+# FILE: services/lexical_index.py
+
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from core.db import db
+from core.invalidation import WILDCARD, subscribe
+from core.mongo_filter import matches_filter
+from core.text_utils import normalize_text, strip_accents
+from services.ingestion import EMBEDDING_KEY
+from services.vector_retriever import MongoVectorSearchRetriever
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Nguồn của MultiSourceRetriever -> collection chứa chunk
+LEXICAL_SOURCES = {
+    "recruitment": "jobs_vector",
+    "company_policies": "policies_vector",
+}
+
+# Metadata được đánh chỉ mục cùng nội dung để mọi chunk của job đều khớp
+# các thuật ngữ chính xác như "SENIOR_LEVEL", "REMOTE" hay tên thành phố
+INDEXED_METADATA_FIELDS = ("title", "companyName", "city", "category", "experience", "workType", "type")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tách từ cho BM25. Mỗi từ có dấu được đánh chỉ mục thêm bản không dấu, nên
+    "Quận 1" khớp cả "quận 1" lẫn "quan 1"; "SENIOR_LEVEL" khớp cả "senior", "level".
+    """
+    tokens = []
+    for word in _TOKEN_RE.findall(normalize_text(text)):
+        tokens.append(word)
+        folded = strip_accents(word)
+        if folded != word:
+            tokens.append(folded)
+        if "_" in folded:
+            tokens.extend(part for part in folded.split("_") if part)
+    return tokens
+
+
+def _group_id(metadata: Dict[str, Any]) -> Optional[str]:
+    group = metadata.get("job_id")
+    return str(group) if group else None
+
+
+@dataclass
+class _Entry:
+    document: Document
+    term_freqs: Counter
+    length: int
+
+
+class BM25Index:
+    """Chỉ mục ngược BM25 trong bộ nhớ, cập nhật được theo từng chunk hoặc từng job."""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._entries: Dict[str, _Entry] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._groups: Dict[str, Set[str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _document_text(document: Document) -> str:
+        extra = [str(document.metadata[field]) for field in INDEXED_METADATA_FIELDS
+                 if document.metadata.get(field)]
+        return "\n".join([document.page_content, *extra])
+
+    def _add_one(self, document: Document) -> None:
+        doc_id = document.id or str(document.metadata.get("_id"))
+        self._remove_one(doc_id)
+        term_freqs = Counter(tokenize(self._document_text(document)))
+        length = sum(term_freqs.values())
+        self._entries[doc_id] = _Entry(document, term_freqs, length)
+        self._total_length += length
+        for term, freq in term_freqs.items():
+            self._postings.setdefault(term, {})[doc_id] = freq
+        group = _group_id(document.metadata)
+        if group:
+            self._groups.setdefault(group, set()).add(doc_id)
+
+    def _remove_one(self, doc_id: str) -> None:
+        entry = self._entries.pop(doc_id, None)
+        if entry is None:
+            return
+        self._total_length -= entry.length
+        for term in entry.term_freqs:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        group = _group_id(entry.document.metadata)
+        if group and group in self._groups:
+            self._groups[group].discard(doc_id)
+            if not self._groups[group]:
+                del self._groups[group]
+
+    def add(self, documents: Iterable[Document]) -> None:
+        with self._lock:
+            for document in documents:
+                self._add_one(document)
+
+    def remove_groups(self, group_ids: Iterable[str]) -> None:
+        """Xóa toàn bộ chunk của các job (theo job_id)."""
+        with self._lock:
+            for group in group_ids:
+                for doc_id in list(self._groups.get(group, ())):
+                    self._remove_one(doc_id)
+
+    def replace_groups(self, group_ids: Iterable[str], documents: Iterable[Document]) -> None:
+        """Thay toàn bộ chunk của các job bằng `documents` trong một lần khóa."""
+        with self._lock:
+            self.remove_groups(group_ids)
+            self.add(documents)
+
+    def replace_all(self, documents: Iterable[Document]) -> None:
+        # Dựng chỉ mục mới ngoài khóa rồi hoán đổi, để truy vấn không phải chờ
+        fresh = BM25Index(self.k1, self.b)
+        fresh.add(documents)
+        with self._lock:
+            self._entries = fresh._entries
+            self._postings = fresh._postings
+            self._groups = fresh._groups
+            self._total_length = fresh._total_length
+
+    def search(self, query: str, k: int, pre_filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        terms = set(tokenize(query))
+        with self._lock:
+            total_docs = len(self._entries)
+            if not total_docs or not terms:
+                return []
+            avg_length = self._total_length / total_docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, freq in postings.items():
+                    length = self._entries[doc_id].length
+                    norm = freq + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / norm
+
+            results = []
+            for doc_id in sorted(scores, key=scores.get, reverse=True):
+                document = self._entries[doc_id].document
+                if pre_filter and not matches_filter(document.metadata, pre_filter):
+                    continue
+                # Trả về bản sao vì các bước sau ghi thêm metadata (rrf_score, source_retriever)
+                results.append(Document(
+                    page_content=document.page_content,
+                    metadata={**document.metadata, "bm25_score": scores[doc_id]},
+                    id=doc_id,
+                ))
+                if len(results) >= k:
+                    break
+            return results
+
+
+def _load_documents(collection_name: str, query: Optional[Dict[str, Any]] = None) -> List[Document]:
+    cursor = db[collection_name].find(query or {}, {EMBEDDING_KEY: 0})
+    return [doc for doc in map(MongoVectorSearchRetriever._to_document, cursor) if doc]
+
+
+class LexicalIndexManager:
+    """
+    Giữ một BM25Index cho mỗi nguồn. Chỉ mục được dựng ở nền khi khởi động và
+    cập nhật theo thông báo vô hiệu hóa cache: job thay đổi/xóa được nạp lại từ
+    Mongo, WILDCARD (nạp lại dữ liệu) thì dựng lại toàn bộ.
+    """
+
+    def __init__(self, sources: Dict[str, str]):
+        self.sources = sources
+        self.indexes = {name: BM25Index() for name in sources}
+        # Chỉ cập nhật theo thông báo khi process thực sự dùng BM25
+        self._started = False
+        # Một worker để các lần cập nhật được áp dụng tuần tự
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lexical-index")
+
+    def get(self, name: str) -> BM25Index:
+        return self.indexes[name]
+
+    def rebuild(self) -> None:
+        for name, collection_name in self.sources.items():
+            documents = _load_documents(collection_name)
+            self.indexes[name].replace_all(documents)
+            logger.info(f"Lexical index '{name}': {len(documents)} chunks from {collection_name}.")
+
+    def refresh_jobs(self, job_ids: List[str]) -> None:
+        index = self.indexes["recruitment"]
+        documents = _load_documents(self.sources["recruitment"], {"job_id": {"$in": job_ids}})
+        index.replace_groups(job_ids, documents)
+        logger.info(f"Lexical index 'recruitment': refreshed {len(job_ids)} jobs ({len(documents)} chunks).")
+
+    def _run(self, fn, *args) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Lexical index update failed: {e}", exc_info=True)
+
+    def start(self) -> Future:
+        self._started = True
+        return self._executor.submit(self._run, self.rebuild)
+
+    def on_invalidation(self, job_ids: List[str]) -> None:
+        if not self._started:
+            return
+        if WILDCARD in job_ids:
+            self._executor.submit(self._run, self.rebuild)
+        else:
+            self._executor.submit(self._run, self.refresh_jobs, list(job_ids))
+
+
+class LexicalRetriever(BaseRetriever):
+    """Retriever BM25 trên chỉ mục trong bộ nhớ, áp dụng cùng pre_filter với $vectorSearch."""
+    index: BM25Index
+    k: int = 4
+    pre_filter: Optional[Dict[str, Any]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.index.search(query, self.k, self.pre_filter)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        # Tìm kiếm trong bộ nhớ đủ nhanh để chạy trực tiếp trên event loop
+        return self.index.search(query, self.k, self.pre_filter)
+
+
+lexical_indexes = LexicalIndexManager(LEXICAL_SOURCES)
+subscribe(lexical_indexes.on_invalidation)
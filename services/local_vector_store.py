@@ -0,0 +1,568 @@
+# FILE: services/local_vector_store.py
+"""
+Vector store cục bộ thay cho Atlas $vectorSearch.
+
+Embedding của mỗi nguồn nằm trong một ma trận float32 liền nhau (đã chuẩn hóa),
+tìm top-k bằng tích vô hướng theo batch, chính xác hoặc IVF. Filter metadata được
+đánh giá bằng mảng NumPy theo cột. Khi có snapshot trên đĩa, ma trận gốc được
+memory-map nên khởi động nhanh và các worker uvicorn dùng chung page; các thay đổi
+sau đó nằm trong một segment nhỏ trong bộ nhớ.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import ObjectId
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_mongodb.utils import make_serializable
+
+from config import settings
+from core.db import db
+from core.invalidation import WILDCARD, subscribe
+from core.metrics import span
+from core.mongo_filter import matches_filter
+from services.ingestion import EMBEDDING_KEY, TEXT_KEY
+
+logger = logging.getLogger(__name__)
+
+# Kiểu cột dùng khi đánh giá filter; field khác được so khớp từng dòng bằng matches_filter
+DATE_FIELDS = {"deadline", "createdAt", "updatedAt"}
+NUMERIC_FIELDS = {"minSalary", "maxSalary"}
+CATEGORICAL_FIELDS = {
+    "job_id", "source", "city", "district",
+    "experience", "workType", "type", "category",
+}
+
+# Gộp segment delta vào segment gốc khi vượt ngưỡng này
+COMPACT_MIN_ROWS = 2000
+COMPACT_RATIO = 0.2
+
+KMEANS_ITERATIONS = 10
+
+
+def _to_timestamp(value: Any) -> float:
+    if isinstance(value, Mapping) and "$date" in value:
+        value = value["$date"]
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return math.nan
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp()
+    return math.nan
+
+
+def _to_number(value: Any) -> float:
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class _Vocabulary:
+    """Mã hóa giá trị chuỗi thành số nguyên để so sánh $in/$eq trên mảng."""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def encode(self, value: Any) -> int:
+        if value is None:
+            return -1
+        key = str(value)
+        with self._lock:
+            return self._codes.setdefault(key, len(self._codes))
+
+    def lookup(self, value: Any) -> int:
+        # -2 không bao giờ xuất hiện trong cột nên không khớp
+        return self._codes.get(str(value), -2) if value is not None else -1
+
+
+class _IVF:
+    """Inverted file: k-means trên vector, chỉ quét các cụm gần query nhất."""
+
+    def __init__(self, matrix: np.ndarray, n_lists: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n_lists = min(n_lists, len(matrix))
+        centroids = np.array(matrix[rng.choice(len(matrix), n_lists, replace=False)], dtype=np.float32)
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = np.argmax(matrix @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = matrix[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+        self.centroids = centroids
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assignments == c) for c in range(n_lists)]
+
+    def candidates(self, queries: np.ndarray, n_probes: int) -> np.ndarray:
+        scores = queries @ self.centroids.T
+        n_probes = min(n_probes, len(self.lists))
+        probed = np.unique(np.argpartition(-scores, n_probes - 1, axis=1)[:, :n_probes])
+        return np.concatenate([self.lists[c] for c in probed]) if len(probed) else np.empty(0, dtype=np.int64)
+
+
+class _Segment:
+    """Một khối vector liền nhau cùng text/metadata tương ứng."""
+
+    def __init__(self, matrix: np.ndarray, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        self.matrix = matrix
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.ivf: Optional[_IVF] = None
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, field: str, vocabulary: _Vocabulary) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            values = [metadata.get(field) for metadata in self.metadatas]
+            if field in DATE_FIELDS:
+                column = np.fromiter(map(_to_timestamp, values), dtype=np.float64, count=len(values))
+            elif field in NUMERIC_FIELDS:
+                column = np.fromiter(map(_to_number, values), dtype=np.float64, count=len(values))
+            else:
+                column = np.fromiter(map(vocabulary.encode, values), dtype=np.int64, count=len(values))
+            self._columns[field] = column
+        return column
+
+    def reset_columns(self) -> None:
+        self._columns = {}
+
+
+_NUMERIC_OPS = {
+    "$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal,
+    "$eq": np.equal, "$ne": np.not_equal,
+}
+
+
+class LocalVectorIndex:
+    """Chỉ mục vector trong bộ nhớ cho một nguồn (jobs hoặc policies)."""
+
+    def __init__(self, search_mode: str = "exact", ivf_lists: int = 64, ivf_probes: int = 8):
+        self.search_mode = search_mode
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self._vocabulary = _Vocabulary()
+        self._base: Optional[_Segment] = None
+        self._delta: Optional[_Segment] = None
+        self._positions: Dict[str, Tuple[str, int]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(int(segment.alive.sum()) for segment in self._segments())
+
+    def _segments(self) -> List[_Segment]:
+        return [segment for segment in (self._base, self._delta) if segment is not None and len(segment)]
+
+    @staticmethod
+    def _build_segment(rows: Sequence[Tuple[str, str, Sequence[float], Dict[str, Any]]]) -> _Segment:
+        ids = [row[0] for row in rows]
+        texts = [row[1] for row in rows]
+        matrix = _normalize_rows(np.asarray([row[2] for row in rows], dtype=np.float32))
+        metadatas = [row[3] for row in rows]
+        return _Segment(matrix, ids, texts, metadatas)
+
+    def _maybe_train_ivf(self, segment: _Segment) -> None:
+        if self.search_mode == "ivf" and len(segment) >= self.ivf_lists * 10:
+            segment.ivf = _IVF(np.asarray(segment.matrix), self.ivf_lists)
+
+    def _reindex_positions(self) -> None:
+        self._positions = {}
+        for name, segment in (("base", self._base), ("delta", self._delta)):
+            if segment is None:
+                continue
+            for position, doc_id in enumerate(segment.ids):
+                if segment.alive[position]:
+                    self._positions[doc_id] = (name, position)
+
+    def _kill(self, doc_ids: Iterable[str]) -> None:
+        by_segment: Dict[str, List[int]] = {}
+        for doc_id in doc_ids:
+            location = self._positions.pop(doc_id, None)
+            if location:
+                by_segment.setdefault(location[0], []).append(location[1])
+        for name, positions in by_segment.items():
+            segment = self._base if name == "base" else self._delta
+            # Copy-on-write để các truy vấn đang chạy vẫn thấy mask cũ nhất quán
+            alive = segment.alive.copy()
+            alive[positions] = False
+            segment.alive = alive
+
+    def replace_all(self, rows: Sequence[Tuple[str, str, Sequence[float], Dict[str, Any]]]) -> None:
+        base = self._build_segment(rows) if rows else None
+        if base is not None:
+            self._maybe_train_ivf(base)
+        with self._lock:
+            self._base, self._delta = base, None
+            self._reindex_positions()
+
+    def load_base(self, segment: _Segment) -> None:
+        self._maybe_train_ivf(segment)
+        with self._lock:
+            self._base, self._delta = segment, None
+            self._reindex_positions()
+
+    def upsert(self, rows: Sequence[Tuple[str, str, Sequence[float], Dict[str, Any]]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            self._kill(row[0] for row in rows)
+            delta_rows = []
+            if self._delta is not None:
+                delta_rows = [
+                    (doc_id, self._delta.texts[i], self._delta.matrix[i], self._delta.metadatas[i])
+                    for i, doc_id in enumerate(self._delta.ids) if self._delta.alive[i]]
+            self._delta = self._build_segment(delta_rows + list(rows))
+            self._reindex_positions()
+            base_size = len(self._base) if self._base is not None else 0
+            if len(self._delta) > max(COMPACT_MIN_ROWS, base_size * COMPACT_RATIO):
+                self._compact()
+
+    def update_metadata(self, doc_id: str, text: str, metadata: Dict[str, Any]) -> None:
+        with self._lock:
+            location = self._positions.get(doc_id)
+            if location is None:
+                return
+            segment = self._base if location[0] == "base" else self._delta
+            segment.texts[location[1]] = text
+            segment.metadatas[location[1]] = metadata
+            segment.reset_columns()
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._kill(doc_ids)
+
+    def remove_groups(self, group_ids: Iterable[str]) -> None:
+        """Xóa toàn bộ chunk của các job (theo job_id)."""
+        groups = set(group_ids)
+        with self._lock:
+            doomed = [
+                segment.ids[i]
+                for segment in self._segments()
+                for i in np.flatnonzero(segment.alive)
+                if str(segment.metadatas[i].get("job_id")) in groups
+            ]
+            self._kill(doomed)
+
+    def replace_groups(self, group_ids: Iterable[str],
+                       rows: Sequence[Tuple[str, str, Sequence[float], Dict[str, Any]]]) -> None:
+        """Thay toàn bộ chunk của các job bằng `rows` trong một lần khóa."""
+        with self._lock:
+            self.remove_groups(group_ids)
+            self.upsert(rows)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._positions)
+
+    def _compact(self) -> None:
+        rows = self.rows()
+        self._base = self._build_segment(rows) if rows else None
+        self._delta = None
+        if self._base is not None:
+            self._maybe_train_ivf(self._base)
+        self._reindex_positions()
+
+    def rows(self) -> List[Tuple[str, str, np.ndarray, Dict[str, Any]]]:
+        with self._lock:
+            return [
+                (segment.ids[i], segment.texts[i], segment.matrix[i], segment.metadatas[i])
+                for segment in self._segments()
+                for i in np.flatnonzero(segment.alive)
+            ]
+
+    def _field_mask(self, segment: _Segment, field: str, condition: Any) -> np.ndarray:
+        if not (isinstance(condition, Mapping) and condition and all(str(k).startswith("$") for k in condition)):
+            condition = {"$eq": condition}
+
+        if field in DATE_FIELDS or field in NUMERIC_FIELDS:
+            convert = _to_timestamp if field in DATE_FIELDS else _to_number
+            column = segment.column(field, self._vocabulary)
+            mask = np.ones(len(segment), dtype=bool)
+            for op, operand in condition.items():
+                if op in _NUMERIC_OPS:
+                    mask &= _NUMERIC_OPS[op](column, convert(operand))
+                elif op in ("$in", "$nin"):
+                    hits = np.isin(column, [convert(v) for v in operand])
+                    mask &= hits if op == "$in" else ~hits
+                elif op == "$exists":
+                    mask &= ~np.isnan(column) if operand else np.isnan(column)
+                else:
+                    return self._row_mask(segment, {field: condition})
+            return mask
+
+        if field in CATEGORICAL_FIELDS:
+            column = segment.column(field, self._vocabulary)
+            mask = np.ones(len(segment), dtype=bool)
+            for op, operand in condition.items():
+                if op == "$eq":
+                    mask &= column == self._vocabulary.lookup(operand)
+                elif op == "$ne":
+                    mask &= column != self._vocabulary.lookup(operand)
+                elif op in ("$in", "$nin"):
+                    hits = np.isin(column, [self._vocabulary.lookup(v) for v in operand])
+                    mask &= hits if op == "$in" else ~hits
+                elif op == "$exists":
+                    mask &= (column >= 0) if operand else (column < 0)
+                else:
+                    return self._row_mask(segment, {field: condition})
+            return mask
+
+        return self._row_mask(segment, {field: condition})
+
+    @staticmethod
+    def _row_mask(segment: _Segment, mongo_filter: Dict[str, Any]) -> np.ndarray:
+        return np.fromiter((matches_filter(metadata, mongo_filter) for metadata in segment.metadatas),
+                           dtype=bool, count=len(segment))
+
+    def _filter_mask(self, segment: _Segment, mongo_filter: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(len(segment), dtype=bool)
+        for key, condition in mongo_filter.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(segment, sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(segment), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._filter_mask(segment, sub)
+                mask &= any_mask
+            else:
+                mask &= self._field_mask(segment, key, condition)
+        return mask
+
+    def search_batch(self, query_vectors: Sequence[Sequence[float]], k: int,
+                     pre_filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """Top-k cho nhiều query cùng lúc (một phép nhân ma trận cho mỗi segment)."""
+        queries = _normalize_rows(np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1))
+        with self._lock:
+            segments = self._segments()
+            masks = [segment.alive & self._filter_mask(segment, pre_filter) if pre_filter else segment.alive
+                     for segment in segments]
+
+        per_query: List[List[Tuple[float, _Segment, int]]] = [[] for _ in range(len(queries))]
+        for segment, mask in zip(segments, masks):
+            if segment.ivf is not None:
+                rows = segment.ivf.candidates(queries, self.ivf_probes)
+                rows = rows[mask[rows]]
+            else:
+                rows = np.flatnonzero(mask)
+            if not len(rows):
+                continue
+            matrix = segment.matrix if len(rows) == len(segment) else segment.matrix[rows]
+            scores = queries @ np.asarray(matrix).T
+            top = min(k, len(rows))
+            best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            for qi in range(len(queries)):
+                for col in best[qi]:
+                    per_query[qi].append((float(scores[qi, col]), segment, int(rows[col])))
+
+        results = []
+        for hits in per_query:
+            hits.sort(key=lambda hit: hit[0], reverse=True)
+            results.append([
+                Document(page_content=segment.texts[row],
+                         metadata={**segment.metadatas[row], "score": score},
+                         id=segment.ids[row])
+                for score, segment, row in hits[:k]
+            ])
+        return results
+
+    def search(self, query_vector: Sequence[float], k: int,
+               pre_filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return self.search_batch([query_vector], k, pre_filter)[0]
+
+    def save(self, path_prefix: Path) -> None:
+        """Ghi snapshot (.npy cho ma trận, .json cho text/metadata), thay file một cách nguyên tử."""
+        rows = self.rows()
+        path_prefix.parent.mkdir(parents=True, exist_ok=True)
+        matrix_tmp = path_prefix.with_name(f"{path_prefix.name}.{os.getpid()}.tmp.npy")
+        meta_tmp = path_prefix.with_name(f"{path_prefix.name}.{os.getpid()}.tmp.json")
+        dim = len(rows[0][2]) if rows else 0
+        np.save(matrix_tmp, np.asarray([row[2] for row in rows], dtype=np.float32).reshape(len(rows), dim))
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": [r[0] for r in rows], "texts": [r[1] for r in rows],
+                       "metadatas": [r[3] for r in rows]}, f, ensure_ascii=False)
+        os.replace(matrix_tmp, f"{path_prefix}.npy")
+        os.replace(meta_tmp, f"{path_prefix}.json")
+
+    def load(self, path_prefix: Path) -> bool:
+        matrix_path, meta_path = Path(f"{path_prefix}.npy"), Path(f"{path_prefix}.json")
+        if not matrix_path.exists() or not meta_path.exists():
+            return False
+        # mmap_mode="r": các worker cùng đọc một file dùng chung page cache
+        matrix = np.load(matrix_path, mmap_mode="r")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if len(meta["ids"]) != len(matrix):
+            logger.warning(f"Snapshot {path_prefix} is inconsistent, ignoring it.")
+            return False
+        self.load_base(_Segment(matrix, meta["ids"], meta["texts"], meta["metadatas"]))
+        return True
+
+
+def _split_record(record: Dict[str, Any]) -> Optional[Tuple[str, str, List[float], Dict[str, Any]]]:
+    if TEXT_KEY not in record or EMBEDDING_KEY not in record:
+        return None
+    text = record.pop(TEXT_KEY)
+    vector = record.pop(EMBEDDING_KEY)
+    make_serializable(record)
+    return str(record["_id"]), text, vector, record
+
+
+def _load_rows(collection_name: str, query: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str, List[float], Dict[str, Any]]]:
+    return [row for row in map(_split_record, db[collection_name].find(query or {})) if row]
+
+
+class LocalVectorStoreManager:
+    """
+    Giữ một LocalVectorIndex cho mỗi nguồn và đồng bộ với Mongo.
+    Khởi động: nạp snapshot (nếu có) rồi chỉ tải các chunk mới/đã đổi; sau đó
+    cập nhật theo thông báo vô hiệu hóa cache do Kafka consumer/cleanup job phát ra.
+    """
+
+    def __init__(self, sources: Dict[str, str], search_mode: str, ivf_lists: int, ivf_probes: int,
+                 snapshot_dir: Optional[str] = None):
+        self.sources = sources
+        self.indexes = {name: LocalVectorIndex(search_mode, ivf_lists, ivf_probes) for name in sources}
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        # Chỉ đồng bộ theo thông báo khi process thực sự dùng backend cục bộ
+        self._started = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-vector-store")
+
+    def get(self, name: str) -> LocalVectorIndex:
+        return self.indexes[name]
+
+    def _snapshot_path(self, name: str) -> Optional[Path]:
+        return self.snapshot_dir / name if self.snapshot_dir else None
+
+    def _save(self, name: str) -> None:
+        path = self._snapshot_path(name)
+        if path is not None:
+            self.indexes[name].save(path)
+
+    def _sync_source(self, name: str) -> None:
+        collection_name = self.sources[name]
+        index = self.indexes[name]
+        path = self._snapshot_path(name)
+        if path is None or not index.load(path):
+            index.replace_all(_load_rows(collection_name))
+            self._save(name)
+            logger.info(f"Local vector store '{name}': loaded {len(index)} chunks from {collection_name}.")
+            return
+
+        # _id của chunk sinh từ hash nội dung nên chỉ cần tải embedding cho _id chưa có
+        known = set(index.ids())
+        current = {}
+        for record in db[collection_name].find({}, {EMBEDDING_KEY: 0}):
+            if TEXT_KEY in record:
+                text = record.pop(TEXT_KEY)
+                make_serializable(record)
+                current[str(record["_id"])] = (text, record)
+        index.remove(known - current.keys())
+        for doc_id in known & current.keys():
+            index.update_metadata(doc_id, *current[doc_id])
+        missing = [doc_id for doc_id in current if doc_id not in known]
+        if missing:
+            # _id là chuỗi do pipeline nạp sinh ra; bản ghi cũ có thể dùng ObjectId
+            keys = missing + [ObjectId(doc_id) for doc_id in missing if ObjectId.is_valid(doc_id)]
+            index.upsert(_load_rows(collection_name, {"_id": {"$in": keys}}))
+        if missing or known - current.keys():
+            self._save(name)
+        logger.info(
+            f"Local vector store '{name}': snapshot with {len(known)} chunks, "
+            f"{len(missing)} added, {len(known - current.keys())} removed.")
+
+    def rebuild(self) -> None:
+        for name in self.sources:
+            self._sync_source(name)
+
+    def refresh_jobs(self, job_ids: List[str]) -> None:
+        index = self.indexes["recruitment"]
+        rows = _load_rows(self.sources["recruitment"], {"job_id": {"$in": job_ids}})
+        index.replace_groups(job_ids, rows)
+        logger.info(f"Local vector store 'recruitment': refreshed {len(job_ids)} jobs ({len(rows)} chunks).")
+
+    def _run(self, fn, *args) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Local vector store update failed: {e}", exc_info=True)
+
+    def start(self) -> Future:
+        self._started = True
+        return self._executor.submit(self._run, self.rebuild)
+
+    def on_invalidation(self, job_ids: List[str]) -> None:
+        if not self._started:
+            return
+        if WILDCARD in job_ids:
+            self._executor.submit(self._run, self._reload_all)
+        else:
+            self._executor.submit(self._run, self.refresh_jobs, list(job_ids))
+
+    def _reload_all(self) -> None:
+        for name, collection_name in self.sources.items():
+            self.indexes[name].replace_all(_load_rows(collection_name))
+            self._save(name)
+
+
+class LocalVectorRetriever(BaseRetriever):
+    """Retriever trên LocalVectorIndex, cùng giao diện (k, pre_filter) với MongoVectorSearchRetriever."""
+    index: LocalVectorIndex
+    embeddings: Embeddings
+    k: int = 4
+    pre_filter: Optional[Dict[str, Any]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with span("embedding"):
+            query_vector = self.embeddings.embed_query(query)
+        return self.index.search(query_vector, self.k, self.pre_filter)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        with span("embedding"):
+            query_vector = await self.embeddings.aembed_query(query)
+        # Tìm kiếm trong bộ nhớ đủ nhanh để chạy trực tiếp trên event loop
+        return self.index.search(query_vector, self.k, self.pre_filter)
+
+
+local_vector_stores = LocalVectorStoreManager(
+    {"recruitment": "jobs_vector", "company_policies": "policies_vector"},
+    search_mode=settings.LOCAL_VECTOR_SEARCH_MODE,
+    ivf_lists=settings.LOCAL_VECTOR_IVF_LISTS,
+    ivf_probes=settings.LOCAL_VECTOR_IVF_PROBES,
+    snapshot_dir=settings.LOCAL_VECTOR_SNAPSHOT_DIR or None,
+)
+subscribe(local_vector_stores.on_invalidation)
@@ -1,31 +1,32 @@
 # FILE: services/rag_service.py
 
+import asyncio
 import json
 import logging
 import sys
-from datetime import datetime, timezone
+import time
 from operator import itemgetter
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import AsyncGenerator, Awaitable, List, Optional, Set, Tuple, TypeVar
 
-from langchain.chains.router.llm_router import RouterOutputParser
-from langchain.chains.router.multi_prompt_prompt import MULTI_PROMPT_ROUTER_TEMPLATE
 from langchain.prompts import PromptTemplate
-from langchain.schema import AIMessage, HumanMessage
-from langchain.schema.runnable import Runnable
-from langchain_core.callbacks.manager import (
-    AsyncCallbackManagerForRetrieverRun,
-    CallbackManagerForRetrieverRun,
-)
-from langchain_core.documents import Document
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.retrievers import BaseRetriever
-from langchain_core.runnables import RunnablePassthrough
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from pydantic import BaseModel, Field
 
-from core.db import db
+from config import settings
 from core.llm import embedding_model, llm
+from core.metrics import IN_FLIGHT, REQUESTS, observe_stage, record_tokens, set_attribute, span, start_trace
+from core.text_utils import estimate_tokens
+from core.vector_utils import cosine_similarity
 from schemas.common import ChatMessage
+from schemas.job_filters import JobFilters
+from services.condense import needs_condense, trim_history
+from services.context_builder import build_context
+from services.filter_extractor import extract_filters
+from services.retriever_registry import retriever_registry
+from services.semantic_cache import document_cache_id, filter_scope, semantic_cache
+from services.session_store import Session, session_store
+
+T = TypeVar("T")
 
 # Setup logging for RAG service
 logger = logging.getLogger(__name__)
@@ -38,211 +39,295 @@ logging.basicConfig(
 )
 
 
-# 1. ĐỊNH NGHĨA PYDANTIC MODEL CHO FILTERS (Không đổi)
-class JobFilters(BaseModel):
-    """Cấu trúc chỉ chứa bộ lọc keywords"""
-    keywords: Optional[List[str]] = Field(
-        None, description="Các từ khóa chung hoặc thuật ngữ nghiệp vụ chữ thường, ví dụ: ['backend', 'api', 'python']."
-    )
-
-
-AVAILABLE_LEVELS = ["Intern", "Junior", "Senior", "Lead", "Manager"]
-
-
-# CẬP NHẬT: Gắn thẻ nguồn vào metadata của document để biết nó đến từ đâu
-class MultiSourceRetriever(BaseRetriever):
+# 2. XÂY DỰNG GET_RETRIEVER
+def get_retriever(job_filters: Optional[JobFilters] = None):
     """
-    Retriever sử dụng router để chọn retriever phù hợp.
-    CẬP NHẬT: Gắn thẻ nguồn (tên retriever) vào metadata của mỗi document.
+    Lấy retriever cho một request từ registry dùng chung của process.
+    pre_filter gồm `deadline` theo thời gian hiện tại và các bộ lọc trích từ câu hỏi.
     """
-    retrievers: Dict[str, BaseRetriever]
-    router: Runnable
-
-    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
-        result = self.router.invoke({"input": query}, config={
-                                    "callbacks": run_manager.get_child()})
-        destination = result.get('destination')
-
-        if destination and destination in self.retrievers:
-            logger.info(f"Router chose (sync): {destination}")
-            chosen_retriever = self.retrievers[destination]
-            docs = chosen_retriever.get_relevant_documents(
-                query, callbacks=run_manager.get_child())
-            for doc in docs:
-                doc.metadata["source_retriever"] = destination
-            return docs
-
-        logger.warning(
-            "Router could not choose a destination (sync). Querying all retrievers.")
-        all_docs = []
-        for name, retriever in self.retrievers.items():
-            docs = retriever.get_relevant_documents(
-                query, callbacks=run_manager.get_child())
-            for doc in docs:
-                doc.metadata["source_retriever"] = name
-            all_docs.extend(docs)
-        return all_docs
-
-    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
-        result = await self.router.ainvoke({"input": query}, config={"callbacks": run_manager.get_child()})
-        destination = result.get('destination')
-
-        if destination and destination in self.retrievers:
-            logger.info(f"Router chose (async): {destination}")
-            chosen_retriever = self.retrievers[destination]
-            docs = await chosen_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
-            for doc in docs:
-                doc.metadata["source_retriever"] = destination
-            return docs
-
-        logger.warning(
-            "Router could not choose a destination (async). Querying all retrievers.")
-        all_docs = []
-        for name, retriever in self.retrievers.items():
-            docs = await retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
-            for doc in docs:
-                doc.metadata["source_retriever"] = name
-            all_docs.extend(docs)
-        return all_docs
-
-
-# 2. XÂY DỰNG GET_RETRIEVER (Không đổi)
-def get_retriever(job_filters: Optional[JobFilters] = None):
-    logger.info(f"get_retriever() called with filters: {job_filters}")
+    with span("retriever_build"):
+        return retriever_registry.build_retriever(job_filters)
 
-    # Lấy thời gian hiện tại để lọc các job hết hạn
-    current_time_iso = datetime.now(timezone.utc).isoformat()
 
-    # Xây dựng pre_filter cho MongoDB
-    # Điều kiện mặc định: job phải còn hạn
-    mongo_filter = {"deadline": {"$gte": current_time_iso}}
+def _format_chat_history(chat_history: List[ChatMessage]):
+    buffer = []
+    for msg in chat_history:
+        if msg.role == "user":
+            buffer.append(HumanMessage(content=msg.content))
+        elif msg.role == "assistant":
+            buffer.append(AIMessage(content=msg.content))
+        elif msg.role == "system":
+            buffer.append(SystemMessage(content=msg.content))
+    return buffer
 
-    vs_jobs = MongoDBAtlasVectorSearch(
-        collection=db["jobs_vector"],
-        embedding=embedding_model,
-        index_name="jobs_vector_index"  # Sửa lại index name cho đúng
-    )
 
-    # Chỉ định pre_filter khi tạo retriever
-    # Retriever sẽ chỉ tìm kiếm trên các document thỏa mãn điều kiện này
-    jobs_retriever = vs_jobs.as_retriever(
-        search_kwargs={
-            'k': 10,
-            'pre_filter': mongo_filter
-        }
-    )
+# Prompt và chain được dựng một lần khi import, dùng lại cho mọi request
+_template = """Với lịch sử trò chuyện sau đây và một câu hỏi theo sau, hãy diễn đạt lại câu hỏi đó thành một câu hỏi độc lập.
+    Lịch sử trò chuyện: {chat_history}
+    Câu hỏi theo sau: {question}
+    Câu hỏi độc lập:"""
+CONDENSE_QUESTION_PROMPT = PromptTemplate.from_template(_template)
+standalone_question_chain = (
+    {"question": itemgetter(
+        "question"), "chat_history": lambda x: _format_chat_history(x["chat_history"])}
+    | CONDENSE_QUESTION_PROMPT
+    | llm
+    | StrOutputParser()
+)
 
-    logger.info(f"Applying real-time filter for active jobs: {mongo_filter}")
-    logger.info(f"Current time used for filtering: {current_time_iso}")
+qa_template = """Bạn là "CareerZone AI", một trợ lý tuyển dụng ảo thông minh.
+    Sử dụng ngữ cảnh sau để trả lời câu hỏi. Nếu không biết, hãy nói bạn không biết.
+    NGỮ CẢNH: --- {context} ---
+    CÂU HỎI: {question}
+    TRẢ LỜI:"""
+QA_PROMPT = PromptTemplate.from_template(qa_template)
+qa_chain = QA_PROMPT | llm | StrOutputParser()
+
+summary_template = """Cập nhật bản tóm tắt ngắn gọn của cuộc hội thoại bằng các tin nhắn cũ dưới đây.
+    Giữ lại các tiêu chí tìm việc (vị trí, địa điểm, mức lương, kinh nghiệm) và công ty/công việc đã được nhắc tới.
+    TÓM TẮT HIỆN TẠI: {summary}
+    TIN NHẮN: {messages}
+    TÓM TẮT MỚI:"""
+SUMMARY_PROMPT = PromptTemplate.from_template(summary_template)
+summary_chain = SUMMARY_PROMPT | llm | StrOutputParser()
+
+# Giữ tham chiếu tới các task nền để không bị garbage collect giữa chừng
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _speculative_query(query: str, history: List[ChatMessage], session: Optional[Session] = None) -> str:
+    """Câu hỏi thô kèm lượt hỏi gần nhất của người dùng, dùng để truy xuất trước khi condense xong."""
+    # Câu hỏi độc lập của lượt trước đã đủ ngữ cảnh hơn câu hỏi thô
+    last_user_turn = session.last_standalone_question if session else None
+    if not last_user_turn:
+        last_user_turn = next(
+            (msg.content for msg in reversed(history) if msg.role == "user"), "")
+    return f"{last_user_turn}\n{query}" if last_user_turn else query
+
+
+async def _summarize_evicted(session_id: str, summary: str, evicted: List[ChatMessage]) -> None:
+    try:
+        new_summary = await summary_chain.ainvoke({
+            "summary": summary or "(chưa có)",
+            "messages": "\n".join(f"{msg.role}: {msg.content}" for msg in evicted),
+        })
+        await session_store.set_summary(session_id, new_summary.strip())
+    except Exception as e:
+        logger.warning(f"Could not update summary for session {session_id}: {e}")
+
+
+async def _remember_turn(session: Optional[Session], query: str, answer: str, standalone_question: str) -> None:
+    """Lưu lượt hỏi/đáp vào session; các tin nhắn bị đẩy ra được gộp vào tóm tắt ở nền."""
+    if session is None:
+        return
+    evicted = await session_store.append_turn(
+        session.session_id,
+        [ChatMessage(role="user", content=query),
+         ChatMessage(role="assistant", content=answer)],
+        standalone_question,
+    )
+    if evicted and settings.SESSION_SUMMARY_ENABLED:
+        task = asyncio.create_task(_summarize_evicted(session.session_id, session.summary, evicted))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
-    # Force flush để đảm bảo log hiển thị ngay
-    sys.stdout.flush()
 
-    # Phần còn lại của hàm giữ nguyên...
-    vs_policies = MongoDBAtlasVectorSearch(
-        # Sửa index name
-        collection=db["policies_vector"], embedding=embedding_model, index_name="policies_vector_index"
-    )
-    policies_retriever = vs_policies.as_retriever(search_kwargs={'k': 3})
+def _extract_job_filters(text: str) -> Optional[JobFilters]:
+    if not settings.FILTER_EXTRACTION_ENABLED:
+        return None
+    with span("filter_extraction"):
+        job_filters = extract_filters(text, settings.SALARY_VND_PER_UNIT)
+    if job_filters.is_empty():
+        return None
+    logger.info(f"Extracted job filters: {job_filters.model_dump(exclude_none=True)}")
+    return job_filters
 
-    retriever_infos = [
-        {"name": "recruitment", "description": "Hữu ích cho các câu hỏi về tuyển dụng, tìm kiếm công việc, ứng viên và hồ sơ.",
-         "retriever": jobs_retriever},
-        {"name": "company_policies", "description": "Hữu ích cho các câu hỏi về quy định, điều khoản dịch vụ, chính sách bảo mật của công ty.",
-         "retriever": policies_retriever}
-    ]
-    router_template = MULTI_PROMPT_ROUTER_TEMPLATE.format(destinations="\n".join(
-        [f'{r["name"]}: {r["description"]}' for r in retriever_infos]))
-    router_prompt = PromptTemplate.from_template(router_template)
-    lcel_router = router_prompt | llm | RouterOutputParser()
 
-    return MultiSourceRetriever(retrievers={info["name"]: info["retriever"] for info in retriever_infos}, router=lcel_router)
+async def _timed(awaitable: Awaitable[T]) -> Tuple[T, float]:
+    start = time.perf_counter()
+    result = await awaitable
+    return result, time.perf_counter() - start
 
 
-def format_docs(docs: List[Document]) -> str:
-    return "\n\n".join(doc.page_content for doc in docs)
+def _sse(packet_type: str, data) -> str:
+    return f"data: {json.dumps({'type': packet_type, 'data': data}, ensure_ascii=False)}\n\n"
 
 
-def _format_chat_history(chat_history: List[ChatMessage]):
-    buffer = []
-    for msg in chat_history:
-        if msg.role == "user":
-            buffer.append(HumanMessage(content=msg.content))
-        elif msg.role == "assistant":
-            buffer.append(AIMessage(content=msg.content))
-    return buffer
+async def process_query_stream(query: str, history: List[ChatMessage], session: Optional[Session] = None,
+                               include_timings: bool = False) -> AsyncGenerator[str, None]:
+    """
+    Stream câu trả lời và ghi thời gian từng bước vào metrics (/metrics).
+    Nếu `include_timings`, gửi thêm gói "timings" chứa các span của request ở cuối stream.
+    """
+    trace = start_trace()
+    IN_FLIGHT.inc()
+    outcome = "error"
+    first_chunk = True
+    try:
+        async for packet in _answer_stream(query, history, session):
+            if first_chunk:
+                first_chunk = False
+                observe_stage("ttft", time.perf_counter() - trace.started)
+            yield packet
+        outcome = trace.attributes.get("outcome", "answered")
+    except (GeneratorExit, asyncio.CancelledError):
+        # Client ngắt kết nối giữa chừng
+        outcome = "cancelled"
+        raise
+    finally:
+        IN_FLIGHT.dec()
+        REQUESTS.inc(outcome=outcome)
+        observe_stage("stream", time.perf_counter() - trace.started)
+    if include_timings or settings.SSE_TIMINGS_ENABLED:
+        yield _sse("timings", trace.to_dict())
 
 
 # CẬP NHẬT: Luồng xử lý chính được cấu trúc lại để trả về jobId
-async def process_query_stream(query: str, history: List[ChatMessage]) -> AsyncGenerator[str, None]:
+async def _answer_stream(query: str, history: List[ChatMessage],
+                         session: Optional[Session] = None) -> AsyncGenerator[str, None]:
     """
     Xử lý câu hỏi, bao gồm trích xuất filter, RAG, và trả về cả câu trả lời lẫn danh sách job ID.
+    Nếu có `session`, lịch sử được lấy từ server thay vì từ request.
     """
+    summary = ""
+    if session is not None:
+        history = session.messages
+        summary = session.summary
     logger.info(f"process_query_stream() called with query: '{query}'")
     logger.info(f"History length: {len(history)}")
 
-    # Force flush logs
-    sys.stdout.flush()
-
-    # # 1. Trích xuất filter từ câu hỏi (không đổi)
-    # filter_extraction_prompt = PromptTemplate.from_template(
-    #     """Dựa vào câu hỏi của người dùng, hãy trích xuất các tiêu chí lọc cho việc làm.
-    #     Nếu không có thông tin, hãy để trống. Câu hỏi người dùng: {query}"""
-    # )
-    # filter_extraction_chain = (
-    #     filter_extraction_prompt | llm.with_structured_output(JobFilters)
-    # )
-    # extracted_filters = await filter_extraction_chain.ainvoke({"query": query})
-    # print(f"Extracted job filters: {extracted_filters}")
-
-    # retriever = get_retriever(job_filters=extracted_filters)
-    logger.info("Creating retriever...")
-    retriever = get_retriever()
-    logger.info("Retriever created successfully")
-
-    # Force flush logs
-    sys.stdout.flush()
-
-    # 2. Xác định câu hỏi độc lập nếu có lịch sử trò chuyện
-    _template = """Với lịch sử trò chuyện sau đây và một câu hỏi theo sau, hãy diễn đạt lại câu hỏi đó thành một câu hỏi độc lập.
-    Lịch sử trò chuyện: {chat_history}
-    Câu hỏi theo sau: {question}
-    Câu hỏi độc lập:"""
-    CONDENSE_QUESTION_PROMPT = PromptTemplate.from_template(_template)
-
-    input_query = query
-    if history:
-        logger.info("History found, creating standalone question.")
-        standalone_question_chain = (
-            {"question": itemgetter(
-                "question"), "chat_history": lambda x: _format_chat_history(x["chat_history"])}
-            | CONDENSE_QUESTION_PROMPT
-            | llm
-            | StrOutputParser()
+    # 1. Trích xuất filter từ câu hỏi bằng gazetteer cục bộ (không gọi LLM)
+    job_filters = _extract_job_filters(query)
+    retriever = get_retriever(job_filters)
+
+    # 2. Xác định câu hỏi độc lập nếu có lịch sử trò chuyện.
+    # Chế độ speculative: truy xuất trên câu hỏi thô (kèm lượt hỏi trước) song song
+    # với bước condense, rồi giữ kết quả nếu câu hỏi độc lập đủ gần.
+    should_condense = bool(history)
+    if should_condense and settings.CONDENSE_CLASSIFIER_ENABLED:
+        should_condense = needs_condense(query, settings.CONDENSE_SHORT_QUERY_WORDS)
+        if not should_condense:
+            logger.info("Query is self-contained, skipping condense step.")
+
+    speculative_task: Optional[asyncio.Task] = None
+    speculative_query = None
+    if should_condense and settings.SPECULATIVE_RETRIEVAL_ENABLED:
+        speculative_query = _speculative_query(query, history, session)
+        speculative_filters = _extract_job_filters(speculative_query)
+        speculative_retriever = retriever if speculative_filters == job_filters else get_retriever(
+            speculative_filters)
+        speculative_task = asyncio.create_task(
+            _timed(speculative_retriever.ainvoke(speculative_query)))
+
+    try:
+        input_query = query
+        if should_condense:
+            condense_history = trim_history(
+                history, settings.CONDENSE_MAX_MESSAGES, settings.CONDENSE_MAX_HISTORY_TOKENS)
+            if summary:
+                condense_history = [ChatMessage(
+                    role="system", content=f"Tóm tắt hội thoại trước đó: {summary}")] + condense_history
+            logger.info(
+                f"History found, creating standalone question from {len(condense_history)}/{len(history)} messages.")
+            input_query, condense_seconds = await _timed(
+                standalone_question_chain.ainvoke({"question": query, "chat_history": condense_history}))
+            observe_stage("condense", condense_seconds)
+            logger.info(
+                f"Standalone question: {input_query} (condense {condense_seconds * 1000:.0f} ms)")
+            standalone_filters = _extract_job_filters(input_query)
+            if standalone_filters != job_filters:
+                job_filters = standalone_filters
+                retriever = get_retriever(job_filters)
+
+        # 3. Tra semantic cache theo embedding của câu hỏi độc lập
+        query_embedding = None
+        if settings.SEMANTIC_CACHE_ENABLED or speculative_task is not None:
+            with span("embedding"):
+                query_embedding = await embedding_model.aembed_query(input_query)
+        if settings.SEMANTIC_CACHE_ENABLED:
+            with span("cache_lookup"):
+                cached = semantic_cache.lookup(query_embedding, filter_scope(job_filters))
+            if cached is not None:
+                logger.info(f"Semantic cache hit for: '{input_query}' (cached: '{cached.question}')")
+                set_attribute("outcome", "cache_hit")
+                for chunk in cached.chunks:
+                    yield _sse("answer_chunk", chunk)
+                await _remember_turn(session, query, "".join(cached.chunks), input_query)
+                return
+
+        # 4. Lấy tài liệu (jobs, policies, etc.) MỘT LẦN DUY NHẤT
+        retrieved_docs = None
+        if speculative_task is not None:
+            # Embedding của câu hỏi speculative đã được retriever tính và nằm trong cache
+            speculative_embedding = await embedding_model.aembed_query(speculative_query)
+            similarity = cosine_similarity(query_embedding, speculative_embedding)
+            set_attribute("speculative_similarity", round(similarity, 4))
+            if speculative_filters != job_filters:
+                speculative_task.cancel()
+                logger.info("Speculative retrieval discarded (filters changed), retrieving again.")
+            elif similarity >= settings.SPECULATIVE_SIMILARITY_THRESHOLD:
+                wait_start = time.perf_counter()
+                try:
+                    retrieved_docs, speculative_seconds = await speculative_task
+                    observe_stage("retrieval", speculative_seconds, mode="speculative")
+                    logger.info(
+                        f"Speculative retrieval kept (similarity {similarity:.3f}, "
+                        f"retrieval {speculative_seconds * 1000:.0f} ms, "
+                        f"waited {(time.perf_counter() - wait_start) * 1000:.0f} ms after condense)")
+                except Exception as e:
+                    logger.warning(f"Speculative retrieval failed, retrieving again: {e}")
+            else:
+                speculative_task.cancel()
+                logger.info(
+                    f"Speculative retrieval discarded (similarity {similarity:.3f} < "
+                    f"{settings.SPECULATIVE_SIMILARITY_THRESHOLD}), retrieving again.")
+
+        if retrieved_docs is None:
+            logger.info("Retrieving documents...")
+            retrieved_docs, retrieval_seconds = await _timed(retriever.ainvoke(input_query))
+            observe_stage("retrieval", retrieval_seconds, mode="direct")
+            logger.info(
+                f"Retrieved {len(retrieved_docs)} documents ({retrieval_seconds * 1000:.0f} ms)")
+        else:
+            logger.info(f"Retrieved {len(retrieved_docs)} documents (speculative)")
+
+        # Bộ lọc quá chặt thì truy xuất lại không lọc thay vì trả lời không có ngữ cảnh
+        if not retrieved_docs and job_filters is not None:
+            logger.info("No documents matched the extracted filters, retrying without filters.")
+            retrieved_docs, retry_seconds = await _timed(get_retriever().ainvoke(input_query))
+            observe_stage("retrieval", retry_seconds, mode="unfiltered_retry")
+    finally:
+        if speculative_task is not None and not speculative_task.done():
+            speculative_task.cancel()
+
+    with span("context_build"):
+        context_str = build_context(
+            retrieved_docs,
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD,
         )
-        input_query = await standalone_question_chain.ainvoke({"question": query, "chat_history": history})
-        logger.info(f"Standalone question: {input_query}")
-
-    # 3. Lấy tài liệu (jobs, policies, etc.) MỘT LẦN DUY NHẤT
-    logger.info("Retrieving documents...")
-    retrieved_docs = await retriever.ainvoke(input_query)
-    logger.info(f"Retrieved {len(retrieved_docs)} documents")
-    context_str = format_docs(retrieved_docs)
-
-    # 4. Tạo và stream câu trả lời từ LLM
-    qa_template = """Bạn là "CareerZone AI", một trợ lý tuyển dụng ảo thông minh.
-    Sử dụng ngữ cảnh sau để trả lời câu hỏi. Nếu không biết, hãy nói bạn không biết.
-    NGỮ CẢNH: --- {context} ---
-    CÂU HỎI: {question}
-    TRẢ LỜI:"""
-    QA_PROMPT = PromptTemplate.from_template(qa_template)
-    qa_chain = QA_PROMPT | llm | StrOutputParser()
+    record_tokens("context", estimate_tokens(context_str))
+    record_tokens("prompt", estimate_tokens(QA_PROMPT.format(context=context_str, question=input_query)))
 
+    # 5. Tạo và stream câu trả lời từ LLM
+    answer_chunks = []
     async for chunk in qa_chain.astream({"context": context_str, "question": input_query}):
-        response_packet = {"type": "answer_chunk", "data": chunk}
-        yield f"data: {json.dumps(response_packet, ensure_ascii=False)}\n\n"
+        answer_chunks.append(chunk)
+        yield _sse("answer_chunk", chunk)
+    record_tokens("answer", estimate_tokens("".join(answer_chunks)))
+
+    # Chỉ lưu cache khi stream hoàn tất và câu trả lời có dựa trên tài liệu
+    if query_embedding is not None and retrieved_docs:
+        semantic_cache.store(
+            input_query,
+            query_embedding,
+            answer_chunks,
+            [document_cache_id(doc) for doc in retrieved_docs],
+            filter_scope(job_filters),
+        )
+    await _remember_turn(session, query, "".join(answer_chunks), input_query)
 
-    # # 5. Lọc và gửi danh sách các jobId đã tìm được
+    # # 6. Lọc và gửi danh sách các jobId đã tìm được
     # job_ids = []
     # job_docs = [doc for doc in retrieved_docs if doc.metadata.get("source_retriever") == "recruitment"]
 
@@ -0,0 +1,236 @@
+# FILE: services/retriever_registry.py
+
+import importlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain.chains.router.llm_router import RouterOutputParser
+from langchain.chains.router.multi_prompt_prompt import MULTI_PROMPT_ROUTER_TEMPLATE
+from langchain.prompts import PromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
+
+from config import settings
+from core.llm import embedding_model, llm
+from schemas.job_filters import JobFilters
+from services.fast_router import FastRouter
+from services.filter_extractor import build_filter_clauses
+from services.lexical_index import LexicalRetriever, lexical_indexes
+from services.local_vector_store import LocalVectorRetriever, local_vector_stores
+from services.retrievers import RETRIEVER_DESCRIPTIONS, MultiSourceRetriever
+from services.vector_retriever import MongoVectorSearchRetriever
+
+logger = logging.getLogger(__name__)
+
+ENV_FILE = Path(__file__).resolve().parent.parent / ".env"
+
+
+@dataclass
+class RetrieverGraph:
+    """Các thành phần dùng chung giữa mọi request, chỉ dựng lại khi cấu hình đổi."""
+    # Retriever mẫu cho jobs (Atlas hoặc cục bộ), mỗi request sao chép với pre_filter riêng
+    jobs_retriever: BaseRetriever
+    policies_retriever: BaseRetriever
+    router: Runnable
+    fast_router: Optional[FastRouter]
+    # Retriever BM25 (None khi tắt LEXICAL_SEARCH_ENABLED)
+    jobs_lexical_retriever: Optional[LexicalRetriever]
+    policies_lexical_retriever: Optional[LexicalRetriever]
+    fingerprint: Tuple[Any, ...]
+
+
+def _config_fingerprint() -> Tuple[Any, ...]:
+    return (
+        settings.DB_NAME,
+        settings.JOBS_VECTOR_INDEX,
+        settings.POLICIES_VECTOR_INDEX,
+        settings.JOBS_RETRIEVER_K,
+        settings.POLICIES_RETRIEVER_K,
+        settings.FAST_ROUTER_ENABLED,
+        settings.FAST_ROUTER_MARGIN,
+        settings.LEXICAL_SEARCH_ENABLED,
+        settings.VECTOR_BACKEND,
+    )
+
+
+def _build_vector_retrievers() -> Tuple[BaseRetriever, BaseRetriever]:
+    if settings.VECTOR_BACKEND == "local":
+        return (
+            LocalVectorRetriever(
+                index=local_vector_stores.get("recruitment"),
+                embeddings=embedding_model,
+                k=settings.JOBS_RETRIEVER_K,
+            ),
+            LocalVectorRetriever(
+                index=local_vector_stores.get("company_policies"),
+                embeddings=embedding_model,
+                k=settings.POLICIES_RETRIEVER_K,
+            ),
+        )
+    return (
+        MongoVectorSearchRetriever(
+            collection_name="jobs_vector",
+            index_name=settings.JOBS_VECTOR_INDEX,
+            embeddings=embedding_model,
+            k=settings.JOBS_RETRIEVER_K,
+        ),
+        MongoVectorSearchRetriever(
+            collection_name="policies_vector",
+            index_name=settings.POLICIES_VECTOR_INDEX,
+            embeddings=embedding_model,
+            k=settings.POLICIES_RETRIEVER_K,
+        ),
+    )
+
+
+def _build_graph() -> RetrieverGraph:
+    logger.info(f"Building retriever graph (vector backend: {settings.VECTOR_BACKEND})...")
+    # Lấy trước khi dựng: nếu cấu hình đổi trong lúc dựng, graph sẽ được dựng lại lần nữa
+    fingerprint = _config_fingerprint()
+    # Retriever policies không phụ thuộc thời gian nên dùng lại được cho mọi request
+    jobs_retriever, policies_retriever = _build_vector_retrievers()
+
+    router_template = MULTI_PROMPT_ROUTER_TEMPLATE.format(destinations="\n".join(
+        [f'{name}: {description}' for name, description in RETRIEVER_DESCRIPTIONS.items()]))
+    router_prompt = PromptTemplate.from_template(router_template)
+    lcel_router = router_prompt | llm | RouterOutputParser()
+
+    fast_router = None
+    if settings.FAST_ROUTER_ENABLED:
+        fast_router = FastRouter(
+            embedding_model, RETRIEVER_DESCRIPTIONS, margin=settings.FAST_ROUTER_MARGIN)
+        try:
+            fast_router.warm_up()
+        except Exception as e:
+            # Centroid sẽ được tính lại ở request đầu tiên
+            logger.warning(f"Could not precompute router centroids: {e}")
+
+    jobs_lexical_retriever = policies_lexical_retriever = None
+    if settings.LEXICAL_SEARCH_ENABLED:
+        jobs_lexical_retriever = LexicalRetriever(
+            index=lexical_indexes.get("recruitment"), k=settings.JOBS_RETRIEVER_K)
+        policies_lexical_retriever = LexicalRetriever(
+            index=lexical_indexes.get("company_policies"), k=settings.POLICIES_RETRIEVER_K)
+
+    return RetrieverGraph(
+        jobs_retriever=jobs_retriever,
+        policies_retriever=policies_retriever,
+        router=lcel_router,
+        fast_router=fast_router,
+        jobs_lexical_retriever=jobs_lexical_retriever,
+        policies_lexical_retriever=policies_lexical_retriever,
+        fingerprint=fingerprint,
+    )
+
+
+class RetrieverRegistry:
+    """
+    Giữ retriever graph sống suốt vòng đời process.
+    Vector store, prompt router và LCEL chain được dựng một lần; mỗi request chỉ
+    tạo retriever jobs với pre_filter `deadline` theo thời gian hiện tại.
+    Khi file .env thay đổi, cấu hình được nạp lại và graph được dựng lại ở thread
+    nền (warm_up của fast router gọi embedding API): trong lúc đó request vẫn dùng
+    graph cũ, graph mới thay thế bằng một phép gán tham chiếu khi dựng xong.
+    """
+
+    def __init__(self, env_file: Path = ENV_FILE, check_interval: Optional[float] = None):
+        self._env_file = env_file
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._graph: Optional[RetrieverGraph] = None
+        self._rebuilding = False
+        self._env_mtime = self._read_env_mtime()
+        self._last_check = time.monotonic()
+
+    def _read_env_mtime(self) -> Optional[float]:
+        try:
+            return self._env_file.stat().st_mtime
+        except OSError:
+            return None
+
+    def _maybe_reload_config(self) -> None:
+        interval = self._check_interval
+        if interval is None:
+            interval = settings.RETRIEVER_RELOAD_CHECK_SECONDS
+        now = time.monotonic()
+        if now - self._last_check < interval:
+            return
+        self._last_check = now
+
+        mtime = self._read_env_mtime()
+        if mtime == self._env_mtime:
+            return
+        self._env_mtime = mtime
+        logger.info(f"Detected change in {self._env_file}, reloading settings.")
+        load_dotenv(self._env_file, override=True)
+        importlib.reload(settings)
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            self._graph = _build_graph()
+            logger.info("Retriever graph rebuilt.")
+        except Exception as e:
+            logger.error(f"Rebuilding retriever graph failed, keeping the previous one: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def get(self) -> RetrieverGraph:
+        graph = self._graph
+        if graph is None:
+            # Lần đầu (lúc khởi động API) chưa có graph cũ để dùng tạm nên dựng đồng bộ
+            with self._lock:
+                if self._graph is None:
+                    self._graph = _build_graph()
+                return self._graph
+        with self._lock:
+            self._maybe_reload_config()
+            if self._rebuilding or graph.fingerprint == _config_fingerprint():
+                return graph
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, name="retriever-graph-rebuild", daemon=True).start()
+        return graph
+
+    def reload(self) -> RetrieverGraph:
+        """Buộc dựng lại graph (ví dụ sau khi đổi index trên Atlas)."""
+        with self._lock:
+            self._graph = _build_graph()
+            return self._graph
+
+    def build_retriever(self, job_filters: Optional[JobFilters] = None) -> MultiSourceRetriever:
+        graph = self.get()
+
+        # Điều kiện mặc định: job phải còn hạn (deadline lưu dạng BSON date).
+        # Job hết hạn được xóa liên tục bởi cleanup job, điều kiện này chỉ che khoảng trễ giữa hai lần chạy
+        mongo_filter: Dict[str, Any] = {"deadline": {"$gte": datetime.now(timezone.utc)}}
+        clauses = build_filter_clauses(job_filters)
+        if clauses:
+            mongo_filter = {"$and": [mongo_filter, *clauses]}
+
+        jobs_retriever = graph.jobs_retriever.model_copy(
+            update={"pre_filter": mongo_filter})
+        lexical_retrievers = {}
+        if graph.jobs_lexical_retriever is not None:
+            lexical_retrievers["recruitment"] = graph.jobs_lexical_retriever.model_copy(
+                update={"pre_filter": mongo_filter})
+        if graph.policies_lexical_retriever is not None:
+            lexical_retrievers["company_policies"] = graph.policies_lexical_retriever
+        return MultiSourceRetriever(
+            retrievers={"recruitment": jobs_retriever,
+                        "company_policies": graph.policies_retriever},
+            router=graph.router,
+            fast_router=graph.fast_router,
+            source_timeout=settings.RETRIEVER_SOURCE_TIMEOUT_SECONDS,
+            max_fallback_docs=settings.FALLBACK_MAX_DOCS,
+            max_fallback_chars=settings.FALLBACK_MAX_CONTEXT_CHARS,
+            lexical_retrievers=lexical_retrievers,
+        )
+
+
+retriever_registry = RetrieverRegistry()
@@ -0,0 +1,292 @@
+# FILE: services/retrievers.py
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
+from pydantic import Field
+
+from config import settings
+from core.metrics import record_route, span
+from services.fast_router import FastRouter
+
+logger = logging.getLogger(__name__)
+
+
+# Mô tả các nguồn dữ liệu, dùng để dựng prompt cho router
+RETRIEVER_DESCRIPTIONS = {
+    "recruitment": "Hữu ích cho các câu hỏi về tuyển dụng, tìm kiếm công việc, ứng viên và hồ sơ.",
+    "company_policies": "Hữu ích cho các câu hỏi về quy định, điều khoản dịch vụ, chính sách bảo mật của công ty.",
+}
+
+
+class SourceExecutor:
+    """
+    Thread pool riêng của một nguồn cho đường sync. Lần gọi quá timeout không dừng
+    được và vẫn giữ thread; khi mọi thread của nguồn đang bận, lần gọi mới bị từ chối
+    ngay thay vì xếp hàng, nên một nguồn chậm không làm nghẽn nguồn khác hay các
+    request sau.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"retriever-{name}")
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def submit(self, fn: Callable[[], List[Document]]) -> Optional[Future]:
+        if not self._slots.acquire(blocking=False):
+            return None
+
+        def run() -> List[Document]:
+            try:
+                return fn()
+            finally:
+                self._slots.release()
+
+        return self._executor.submit(run)
+
+
+_source_executors: Dict[str, SourceExecutor] = {}
+_source_executors_lock = threading.Lock()
+
+
+def _source_executor(name: str) -> SourceExecutor:
+    with _source_executors_lock:
+        if name not in _source_executors:
+            _source_executors[name] = SourceExecutor(name, settings.RETRIEVER_SOURCE_MAX_WORKERS)
+        return _source_executors[name]
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or f"{doc.metadata.get('source_retriever')}:{doc.page_content}"
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Document]], k: int = 60) -> List[Document]:
+    """
+    Gộp nhiều danh sách đã xếp hạng: score(d) = sum(1 / (k + rank)).
+    Score được ghi vào metadata["rrf_score"].
+    """
+    scores: Dict[str, float] = {}
+    docs_by_key: Dict[str, Document] = {}
+    for docs in ranked_lists:
+        for rank, doc in enumerate(docs, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs_by_key.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    fused = []
+    for key in ordered:
+        doc = docs_by_key[key]
+        doc.metadata["rrf_score"] = scores[key]
+        fused.append(doc)
+    return fused
+
+
+def cap_documents(docs: List[Document], max_docs: int, max_chars: Optional[int] = None) -> List[Document]:
+    """Giữ các document đầu danh sách trong giới hạn số lượng và tổng số ký tự."""
+    capped = []
+    total_chars = 0
+    for doc in docs[:max_docs]:
+        if max_chars is not None and capped and total_chars + len(doc.page_content) > max_chars:
+            break
+        capped.append(doc)
+        total_chars += len(doc.page_content)
+    return capped
+
+
+# CẬP NHẬT: Gắn thẻ nguồn vào metadata của document để biết nó đến từ đâu
+class MultiSourceRetriever(BaseRetriever):
+    """
+    Retriever sử dụng router để chọn retriever phù hợp.
+    CẬP NHẬT: Gắn thẻ nguồn (tên retriever) vào metadata của mỗi document.
+    """
+    retrievers: Dict[str, BaseRetriever]
+    router: Runnable
+    # Router cục bộ (từ khóa/embedding), LLM router chỉ được gọi khi nó không chắc chắn
+    fast_router: Optional[FastRouter] = None
+    # Khi không chọn được nguồn: truy vấn song song mọi nguồn với timeout riêng,
+    # gộp bằng reciprocal-rank fusion và giới hạn kích thước ngữ cảnh
+    source_timeout: float = 5.0
+    max_fallback_docs: int = 10
+    max_fallback_chars: Optional[int] = None
+    # Retriever từ khóa (BM25) theo từng nguồn, kết quả được gộp với vector search bằng RRF
+    lexical_retrievers: Dict[str, BaseRetriever] = Field(default_factory=dict)
+
+    @staticmethod
+    def _hybrid(vector_docs: List[Document], lexical_docs: List[Document]) -> List[Document]:
+        if not lexical_docs:
+            return vector_docs
+        if not vector_docs:
+            return lexical_docs
+        # Giữ nguyên số lượng document để kích thước ngữ cảnh không tăng
+        fused = reciprocal_rank_fusion([vector_docs, lexical_docs])
+        return fused[:max(len(vector_docs), len(lexical_docs))]
+
+    def _search_source(self, name: str, query: str, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with span("vector_search", source=name):
+            docs = self.retrievers[name].get_relevant_documents(
+                query, callbacks=run_manager.get_child())
+        lexical = self.lexical_retrievers.get(name)
+        if lexical is None:
+            return docs
+        try:
+            with span("lexical_search", source=name):
+                lexical_docs = lexical.get_relevant_documents(query)
+        except Exception as e:
+            logger.error(f"Lexical retriever '{name}' failed (sync): {e}")
+            return docs
+        return self._hybrid(docs, lexical_docs)
+
+    async def _asearch_source(self, name: str, query: str, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        async def vector_search() -> List[Document]:
+            with span("vector_search", source=name):
+                return await self.retrievers[name].ainvoke(
+                    query, config={"callbacks": run_manager.get_child()})
+
+        async def lexical_search(lexical: BaseRetriever) -> List[Document]:
+            with span("lexical_search", source=name):
+                return await lexical.ainvoke(query)
+
+        lexical = self.lexical_retrievers.get(name)
+        if lexical is None:
+            return await vector_search()
+        docs, lexical_docs = await asyncio.gather(
+            vector_search(), lexical_search(lexical), return_exceptions=True)
+        if isinstance(docs, BaseException):
+            raise docs
+        if isinstance(lexical_docs, BaseException):
+            logger.error(f"Lexical retriever '{name}' failed (async): {lexical_docs}")
+            return docs
+        return self._hybrid(docs, lexical_docs)
+
+    def _record_llm_decision(self, destination: Optional[str]) -> None:
+        tier = "llm" if destination in self.retrievers else "fallback"
+        record_route(tier, destination if tier == "llm" else None)
+        if self.fast_router is not None:
+            self.fast_router.record(tier)
+
+    def _route(self, query: str, run_manager: CallbackManagerForRetrieverRun) -> Optional[str]:
+        with span("route"):
+            return self._pick_destination(query, run_manager)
+
+    def _pick_destination(self, query: str, run_manager: CallbackManagerForRetrieverRun) -> Optional[str]:
+        if self.fast_router is not None:
+            try:
+                decision = self.fast_router.route(query)
+            except Exception as e:
+                logger.warning(f"Fast router failed, using LLM router: {e}")
+            else:
+                if decision.destination in self.retrievers:
+                    self.fast_router.record(decision.tier)
+                    record_route(decision.tier, decision.destination)
+                    logger.info(
+                        f"Fast router chose ({decision.tier}, confidence={decision.confidence:.3f}): {decision.destination}")
+                    return decision.destination
+
+        result = self.router.invoke({"input": query}, config={
+                                    "callbacks": run_manager.get_child()})
+        destination = result.get('destination')
+        self._record_llm_decision(destination)
+        return destination
+
+    async def _aroute(self, query: str, run_manager: AsyncCallbackManagerForRetrieverRun) -> Optional[str]:
+        with span("route"):
+            return await self._apick_destination(query, run_manager)
+
+    async def _apick_destination(self, query: str, run_manager: AsyncCallbackManagerForRetrieverRun) -> Optional[str]:
+        if self.fast_router is not None:
+            try:
+                decision = await self.fast_router.aroute(query)
+            except Exception as e:
+                logger.warning(f"Fast router failed, using LLM router: {e}")
+            else:
+                if decision.destination in self.retrievers:
+                    self.fast_router.record(decision.tier)
+                    record_route(decision.tier, decision.destination)
+                    logger.info(
+                        f"Fast router chose ({decision.tier}, confidence={decision.confidence:.3f}): {decision.destination}")
+                    return decision.destination
+
+        result = await self.router.ainvoke({"input": query}, config={"callbacks": run_manager.get_child()})
+        destination = result.get('destination')
+        self._record_llm_decision(destination)
+        return destination
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        destination = self._route(query, run_manager)
+
+        if destination and destination in self.retrievers:
+            logger.info(f"Router chose (sync): {destination}")
+            docs = self._search_source(destination, query, run_manager)
+            for doc in docs:
+                doc.metadata["source_retriever"] = destination
+            return docs
+
+        logger.warning(
+            "Router could not choose a destination (sync). Querying all retrievers.")
+        futures = {}
+        for name in self.retrievers:
+            future = _source_executor(name).submit(
+                lambda name=name: self._search_source(name, query, run_manager))
+            if future is None:
+                logger.warning(f"Retriever '{name}' skipped: all its workers are still busy (sync).")
+            else:
+                futures[future] = name
+        done, not_done = wait(futures, timeout=self.source_timeout)
+        for future in not_done:
+            logger.warning(
+                f"Retriever '{futures[future]}' timed out after {self.source_timeout}s (sync).")
+        ranked_lists = {}
+        for future in done:
+            name = futures[future]
+            try:
+                ranked_lists[name] = future.result()
+            except Exception as e:
+                logger.error(f"Retriever '{name}' failed (sync): {e}")
+        return self._fuse(ranked_lists)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        destination = await self._aroute(query, run_manager)
+
+        if destination and destination in self.retrievers:
+            logger.info(f"Router chose (async): {destination}")
+            docs = await self._asearch_source(destination, query, run_manager)
+            for doc in docs:
+                doc.metadata["source_retriever"] = destination
+            return docs
+
+        logger.warning(
+            "Router could not choose a destination (async). Querying all retrievers.")
+
+        async def search(name: str) -> List[Document]:
+            try:
+                return await asyncio.wait_for(
+                    self._asearch_source(name, query, run_manager),
+                    timeout=self.source_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Retriever '{name}' timed out after {self.source_timeout}s (async).")
+            except Exception as e:
+                logger.error(f"Retriever '{name}' failed (async): {e}")
+            return []
+
+        names = list(self.retrievers)
+        results = await asyncio.gather(
+            *(search(name) for name in names))
+        return self._fuse(dict(zip(names, results)))
+
+    def _fuse(self, ranked_lists: Dict[str, List[Document]]) -> List[Document]:
+        for name, docs in ranked_lists.items():
+            for doc in docs:
+                doc.metadata["source_retriever"] = name
+        fused = reciprocal_rank_fusion(list(ranked_lists.values()))
+        return cap_documents(fused, self.max_fallback_docs, self.max_fallback_chars)
@@ -0,0 +1,167 @@
+# FILE: services/semantic_cache.py
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import settings
+from core.invalidation import WILDCARD, subscribe
+from core.metrics import registry
+from schemas.job_filters import JobFilters
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    scope: str
+    chunks: List[str]
+    doc_ids: Set[str]
+    created_at: float
+
+
+def document_cache_id(doc: Document) -> Optional[str]:
+    """Định danh dùng để vô hiệu hóa cache: job_id cho job, _id cho chunk khác."""
+    metadata = doc.metadata
+    doc_id = metadata.get("job_id") or metadata.get("_id")
+    return str(doc_id) if doc_id else None
+
+
+def filter_scope(job_filters: Optional[JobFilters]) -> str:
+    """
+    Khóa phạm vi cache theo bộ lọc đã trích: hai câu hỏi gần giống nhau nhưng khác
+    thành phố, cấp bậc hay mức lương ("Java ở HCM" và "Java ở Hà Nội") không dùng
+    chung câu trả lời.
+    """
+    if job_filters is None or job_filters.is_empty():
+        return ""
+    canonical = {
+        name: sorted(value) if isinstance(value, list) else value
+        for name, value in job_filters.model_dump(exclude_none=True).items()
+        if value not in (None, [])
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    Cache câu trả lời theo embedding của câu hỏi độc lập (đã gộp ngữ cảnh hội thoại
+    ở bước condense), chia theo `scope` (filter_scope của bộ lọc đã dùng).
+    Trả về entry gần nhất cùng scope có cosine >= threshold, có TTL và loại bỏ
+    theo LRU. Entry bị xóa khi một document mà nó trích dẫn thay đổi.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._vectors: dict = {}
+        # scope -> (ma trận vector, key tương ứng), dựng lại khi scope thay đổi
+        self._matrices: Dict[str, Tuple[np.ndarray, List[int]]] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: int) -> None:
+        entry = self._entries.pop(key, None)
+        self._vectors.pop(key, None)
+        if entry is not None:
+            self._matrices.pop(entry.scope, None)
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items()
+                   if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            self._remove(key)
+
+    def _scope_matrix(self, scope: str) -> Optional[Tuple[np.ndarray, List[int]]]:
+        if scope not in self._matrices:
+            keys = [key for key, entry in self._entries.items() if entry.scope == scope]
+            if not keys:
+                return None
+            self._matrices[scope] = (np.vstack([self._vectors[key] for key in keys]), keys)
+        return self._matrices[scope]
+
+    def lookup(self, embedding: Sequence[float], scope: str = "") -> Optional[CacheEntry]:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        query = query / norm
+        with self._lock:
+            self._purge_expired(time.time())
+            scoped = self._scope_matrix(scope)
+            if scoped is None:
+                return None
+            matrix, keys = scoped
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            key = keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def store(self, question: str, embedding: Sequence[float], chunks: List[str], doc_ids: Iterable[str],
+              scope: str = "") -> None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = CacheEntry(
+                question=question,
+                scope=scope,
+                chunks=list(chunks),
+                doc_ids={doc_id for doc_id in doc_ids if doc_id},
+                created_at=time.time(),
+            )
+            self._vectors[key] = vector / norm
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_documents(self, doc_ids: List[str]) -> None:
+        with self._lock:
+            if WILDCARD in doc_ids:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._vectors.clear()
+                self._matrices.clear()
+            else:
+                changed = set(doc_ids)
+                keys = [key for key, entry in self._entries.items()
+                        if entry.doc_ids & changed]
+                for key in keys:
+                    self._remove(key)
+                removed = len(keys)
+        if removed:
+            logger.info(f"Semantic cache: invalidated {removed} entries.")
+
+    def clear(self) -> None:
+        self.invalidate_documents([WILDCARD])
+
+
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+)
+subscribe(semantic_cache.invalidate_documents)
+registry.gauge("rag_semantic_cache_entries", "Số entry trong semantic cache.").set_function(
+    lambda: len(semantic_cache))
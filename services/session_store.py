@@ -0,0 +1,196 @@
+# FILE: services/session_store.py
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from config import settings
+from core.async_db import get_async_db
+from core.db import db
+from schemas.common import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_COLLECTION = "chat_sessions"
+
+
+@dataclass
+class Session:
+    session_id: str
+    messages: List[ChatMessage] = field(default_factory=list)
+    # Tóm tắt các lượt đã bị đẩy ra khỏi ring buffer
+    summary: str = ""
+    last_standalone_question: Optional[str] = None
+
+
+@dataclass
+class _MemorySession:
+    messages: Deque[ChatMessage]
+    summary: str = ""
+    last_standalone_question: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def snapshot(self, session_id: str) -> Session:
+        return Session(session_id, list(self.messages), self.summary, self.last_standalone_question)
+
+
+class InMemorySessionStore:
+    """
+    Lưu session trong bộ nhớ process: mỗi session là một ring buffer `max_messages`
+    tin nhắn, hết hạn sau `ttl_seconds` không hoạt động và bị loại theo LRU.
+    """
+
+    def __init__(self, max_messages: int, ttl_seconds: float, max_sessions: int):
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _MemorySession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_live(self, session_id: str) -> Optional[_MemorySession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.time() - session.updated_at > self.ttl_seconds:
+            self._sessions.pop(session_id, None)
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def create(self) -> Session:
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = _MemorySession(
+                messages=deque(maxlen=self.max_messages))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return Session(session_id)
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._get_live(session_id)
+            return session.snapshot(session_id) if session else None
+
+    async def append_turn(self, session_id: str, messages: List[ChatMessage],
+                          standalone_question: Optional[str]) -> List[ChatMessage]:
+        """Thêm tin nhắn vào ring buffer, trả về các tin nhắn cũ bị đẩy ra."""
+        with self._lock:
+            session = self._get_live(session_id)
+            if session is None:
+                return []
+            overflow = len(session.messages) + len(messages) - self.max_messages
+            evicted = list(session.messages)[:max(overflow, 0)]
+            session.messages.extend(messages)
+            if standalone_question:
+                session.last_standalone_question = standalone_question
+            session.updated_at = time.time()
+            return evicted
+
+    async def set_summary(self, session_id: str, summary: str) -> None:
+        with self._lock:
+            session = self._get_live(session_id)
+            if session is not None:
+                session.summary = summary
+
+    async def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def ensure_indexes(self) -> None:
+        pass
+
+
+class MongoSessionStore:
+    """
+    Lưu session trong collection `chat_sessions` để dùng chung giữa nhiều worker.
+    Ring buffer dùng `$push` với `$slice`, TTL index trên `updatedAt` xóa session cũ.
+    """
+
+    def __init__(self, max_messages: int, ttl_seconds: float, collection_name: str = SESSIONS_COLLECTION):
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.collection_name = collection_name
+
+    def _collection(self):
+        return get_async_db()[self.collection_name]
+
+    @staticmethod
+    def _to_session(record: dict) -> Session:
+        return Session(
+            session_id=record["_id"],
+            messages=[ChatMessage(**msg) for msg in record.get("messages", [])],
+            summary=record.get("summary", ""),
+            last_standalone_question=record.get("lastStandaloneQuestion"),
+        )
+
+    async def create(self) -> Session:
+        session_id = uuid.uuid4().hex
+        await self._collection().insert_one({
+            "_id": session_id,
+            "messages": [],
+            "summary": "",
+            "updatedAt": datetime.now(timezone.utc),
+        })
+        return Session(session_id)
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        record = await self._collection().find_one({"_id": session_id})
+        return self._to_session(record) if record else None
+
+    async def append_turn(self, session_id: str, messages: List[ChatMessage],
+                          standalone_question: Optional[str]) -> List[ChatMessage]:
+        update = {
+            "$push": {"messages": {
+                "$each": [msg.model_dump() for msg in messages],
+                "$slice": -self.max_messages,
+            }},
+            "$set": {"updatedAt": datetime.now(timezone.utc)},
+        }
+        if standalone_question:
+            update["$set"]["lastStandaloneQuestion"] = standalone_question
+        before = await self._collection().find_one_and_update(
+            {"_id": session_id}, update,
+            projection={"messages": 1}, return_document=ReturnDocument.BEFORE)
+        if before is None:
+            return []
+        previous = before.get("messages", [])
+        overflow = len(previous) + len(messages) - self.max_messages
+        return [ChatMessage(**msg) for msg in previous[:max(overflow, 0)]]
+
+    async def set_summary(self, session_id: str, summary: str) -> None:
+        await self._collection().update_one({"_id": session_id}, {"$set": {"summary": summary}})
+
+    async def delete(self, session_id: str) -> bool:
+        result = await self._collection().delete_one({"_id": session_id})
+        return result.deleted_count > 0
+
+    def ensure_indexes(self) -> None:
+        try:
+            db[self.collection_name].create_index(
+                "updatedAt", expireAfterSeconds=int(self.ttl_seconds))
+        except PyMongoError as e:
+            logger.warning(f"Could not create {self.collection_name} TTL index: {e}")
+
+
+def _build_session_store():
+    if settings.SESSION_BACKEND == "mongo":
+        return MongoSessionStore(
+            max_messages=settings.SESSION_MAX_MESSAGES,
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+        )
+    return InMemorySessionStore(
+        max_messages=settings.SESSION_MAX_MESSAGES,
+        ttl_seconds=settings.SESSION_TTL_SECONDS,
+        max_sessions=settings.SESSION_MAX_IN_MEMORY,
+    )
+
+
+session_store = _build_session_store()
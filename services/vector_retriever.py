@@ -0,0 +1,74 @@
+# FILE: services/vector_retriever.py
+
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_mongodb.utils import make_serializable
+
+from core.async_db import get_async_db
+from core.db import db
+from core.metrics import span
+from services.ingestion import EMBEDDING_KEY, TEXT_KEY
+
+
+class MongoVectorSearchRetriever(BaseRetriever):
+    """
+    Retriever chạy $vectorSearch trên Atlas.
+    Đường async dùng AsyncMongoClient và aembed_query nên không chặn event loop,
+    khác với MongoDBAtlasVectorSearch vốn chỉ có đường sync.
+    Kết quả có cùng định dạng với MongoDBAtlasVectorSearch (score trong metadata).
+    """
+    collection_name: str
+    index_name: str
+    embeddings: Embeddings
+    k: int = 4
+    pre_filter: Optional[Dict[str, Any]] = None
+    oversampling_factor: int = 10
+
+    def _pipeline(self, query_vector: List[float]) -> List[Dict[str, Any]]:
+        stage: Dict[str, Any] = {
+            "index": self.index_name,
+            "path": EMBEDDING_KEY,
+            "queryVector": query_vector,
+            "numCandidates": self.k * self.oversampling_factor,
+            "limit": self.k,
+        }
+        if self.pre_filter:
+            stage["filter"] = self.pre_filter
+        return [
+            {"$vectorSearch": stage},
+            {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+            {"$project": {EMBEDDING_KEY: 0}},
+        ]
+
+    @staticmethod
+    def _to_document(record: Dict[str, Any]) -> Optional[Document]:
+        if TEXT_KEY not in record:
+            return None
+        text = record.pop(TEXT_KEY)
+        make_serializable(record)
+        return Document(page_content=text, metadata=record, id=str(record["_id"]))
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with span("embedding"):
+            query_vector = self.embeddings.embed_query(query)
+        cursor = db[self.collection_name].aggregate(self._pipeline(query_vector))
+        return [doc for doc in map(self._to_document, cursor) if doc]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        with span("embedding"):
+            query_vector = await self.embeddings.aembed_query(query)
+        collection = get_async_db()[self.collection_name]
+        cursor = await collection.aggregate(self._pipeline(query_vector))
+        docs = []
+        async for record in cursor:
+            doc = self._to_document(record)
+            if doc:
+                docs.append(doc)
+        return docs
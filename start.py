@@ -38,17 +38,20 @@ def run_scheduler():
     try:
         import schedule
 
-        from scripts.cleanup_expired_jobs import run_cleanup
+        from config import settings
+        from core.indexes import ensure_job_indexes
+        from scripts.cleanup_scheduler import scheduled_cleanup
 
-        # Schedule cleanup - có thể thay đổi thời gian ở đây
-        schedule.every().day.at("02:00").do(run_cleanup)  # 2:00 AM hàng ngày
-        # schedule.every(30).minutes.do(run_cleanup)  # Uncomment để test mỗi 30 phút
+        ensure_job_indexes()
+        # Xóa job hết hạn liên tục theo batch nhỏ (EXPIRY_INTERVAL_SECONDS); lỗi của
+        # một lần chạy được scheduled_cleanup in ra để scheduler không dừng
+        schedule.every(settings.EXPIRY_INTERVAL_SECONDS).seconds.do(scheduled_cleanup)
 
         print(f"📅 Next cleanup: {schedule.next_run()}")
 
         while True:
             schedule.run_pending()
-            time.sleep(60)
+            time.sleep(1)
     except Exception as e:
         print(f"❌ Scheduler error: {e}")
 
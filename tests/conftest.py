@@ -0,0 +1,10 @@
+# tests/conftest.py
+# Chạy test offline: provider giả lập và DLQ dạng file, đặt trước khi import config.settings
+import os
+import tempfile
+
+os.environ.setdefault("PROVIDER_MODE", "local")
+os.environ.setdefault("DB_NAME", "careerzone_test")
+os.environ.setdefault("KAFKA_JOB_EVENTS_TOPIC", "job_events")
+os.environ.setdefault("KAFKA_DLQ_BACKEND", "file")
+os.environ.setdefault("KAFKA_DLQ_FILE", os.path.join(tempfile.mkdtemp(), "job_events_dlq.jsonl"))
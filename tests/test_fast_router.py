@@ -0,0 +1,28 @@
+# tests/test_fast_router.py
+from core.local_providers import HashEmbeddings
+from services.fast_router import FastRouter
+from services.retrievers import RETRIEVER_DESCRIPTIONS
+
+
+def _router() -> FastRouter:
+    return FastRouter(HashEmbeddings(dim=64), RETRIEVER_DESCRIPTIONS, margin=0.05)
+
+
+def test_luong_keyword_does_not_match_so_luong():
+    decision = _router().route("Phí đăng tin có giới hạn số lượng không?")
+    assert decision.tier != "keyword"
+
+
+def test_tuyen_keyword_does_not_match_tuyen_xe():
+    decision = _router().route("tuyến xe buýt gần văn phòng")
+    assert decision.tier != "keyword"
+
+
+def test_accented_keywords_route_by_keyword():
+    assert _router().route("Mức lương của vị trí này là bao nhiêu?") == ("recruitment", "keyword", 1.0)
+    assert _router().route("Chính sách hoàn tiền thế nào?") == ("company_policies", "keyword", 1.0)
+
+
+def test_unaccented_query_matches_folded_keywords():
+    assert _router().route("tim viec lam java o ha noi") == ("recruitment", "keyword", 1.0)
+    assert _router().route("chinh sach bao mat") == ("company_policies", "keyword", 1.0)
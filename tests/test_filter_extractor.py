@@ -0,0 +1,45 @@
+# tests/test_filter_extractor.py
+from services.filter_extractor import build_filter_clauses, extract_filters
+
+VND_PER_USD = 25_000
+
+
+def _filters(query: str):
+    return extract_filters(query, VND_PER_USD)
+
+
+def test_it_word_does_not_match_it_category():
+    assert _filters("Công việc nào ít áp lực ở Hà Nội?").category is None
+    assert _filters("cong viec nao it ap luc").category is None
+
+
+def test_it_nhat_is_salary_not_category():
+    filters = _filters("lương ít nhất 20 triệu")
+    assert filters.category is None
+    assert filters.minSalary == 20_000_000 / VND_PER_USD
+
+
+def test_it_category_needs_uppercase_or_context():
+    assert "IT" in _filters("Việc làm IT ở HCM").category
+    assert "IT" in _filters("tìm việc ngành it").category
+    assert "IT" in _filters("tim viec nganh it").category
+
+
+def test_ascii_aliases_only_match_literally():
+    # Văn bản bỏ dấu của các câu này chứa "do", "hn", "mid"... nhưng người dùng không gõ chúng
+    filters = _filters("Công ty đó có môi trường thế nào?")
+    assert filters.is_empty()
+    assert _filters("việc ở hn").city == ["Hà Nội"]
+    assert _filters("senior hoặc sr").experience == ["SENIOR_LEVEL"]
+    assert _filters("ha noi").city == ["Hà Nội"]
+
+
+def test_weak_salary_units_need_salary_context():
+    assert _filters("văn phòng cách nhà dưới 500m").maxSalary is None
+    assert _filters("nhiệt độ trên 30 độ").minSalary is None
+    assert _filters("lương trên 1000 đô").minSalary == 1000
+    assert _filters("trên 15 triệu").minSalary == 15_000_000 / VND_PER_USD
+
+
+def test_no_filter_clauses_for_plain_question():
+    assert build_filter_clauses(_filters("Công việc nào ít áp lực?")) == []
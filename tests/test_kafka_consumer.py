@@ -0,0 +1,72 @@
+# tests/test_kafka_consumer.py
+import json
+from collections import namedtuple
+
+import pytest
+from kafka.structs import TopicPartition
+
+import workers.kafka_consumer as kafka_consumer
+from workers.dead_letter import FileDeadLetterSink
+
+Message = namedtuple("Message", "topic partition offset value")
+
+PARTITION = TopicPartition("job_events", 0)
+BATCH = [
+    Message("job_events", 0, 0, b"not json"),
+    Message("job_events", 0, 1, json.dumps({
+        "eventType": "JOB_DELETED",
+        "timestamp": "2024-01-01T00:00:00Z",
+        "payload": {"jobId": "job-1", "title": "Backend Developer", "description": "Python"},
+    }).encode("utf-8")),
+]
+
+
+class _Stop(Exception):
+    pass
+
+
+class FakeConsumer:
+    """Trả về cùng một batch cho mỗi lần poll, dừng sau `polls` lần."""
+
+    def __init__(self, polls: int):
+        self.polls = polls
+        self.seeks = []
+        self.commits = 0
+
+    def poll(self, **kwargs):
+        if self.polls == 0:
+            raise _Stop
+        self.polls -= 1
+        return {PARTITION: BATCH}
+
+    def seek(self, partition, offset):
+        self.seeks.append((partition, offset))
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_rewound_batch_dead_letters_bad_message_once(tmp_path, monkeypatch):
+    sink = FileDeadLetterSink(str(tmp_path / "dlq.jsonl"))
+    consumer = FakeConsumer(polls=2)
+    attempts = []
+
+    def apply_once_transient(events):
+        attempts.append(events)
+        if len(attempts) == 1:
+            raise ConnectionError("MongoDB mất kết nối")
+
+    monkeypatch.setattr(kafka_consumer, "dead_letter_sink", sink)
+    monkeypatch.setattr(kafka_consumer, "apply_with_dead_letter", apply_once_transient)
+    monkeypatch.setattr(kafka_consumer, "KafkaConsumer", lambda *args, **kwargs: consumer)
+    monkeypatch.setattr(kafka_consumer, "_consumer_config", lambda **overrides: overrides)
+    monkeypatch.setattr(kafka_consumer.time, "sleep", lambda seconds: None)
+
+    with pytest.raises(_Stop):
+        kafka_consumer.start_batch_consumer()
+
+    assert consumer.seeks == [(PARTITION, 0)]
+    assert consumer.commits == 1
+    assert [[event.payload.jobId for event in events] for events in attempts] == [["job-1"], ["job-1"]]
+    entries = sink.pending()
+    assert [entry["_id"] for entry in entries] == ["job_events:0:0"]
@@ -0,0 +1,191 @@
+# FILE: workers/dead_letter.py
+"""
+Dead-letter queue cho sự kiện job không xử lý được.
+
+Message không parse được, hoặc vẫn lỗi sau khi đã retry với backoff, được ghi vào
+sink (collection `job_events_dlq` hoặc file JSONL khi KAFKA_DLQ_BACKEND=file) thay
+vì bị bỏ qua. Mỗi entry có trạng thái:
+- pending: chờ replay bằng `python -m scripts.replay_dlq`
+- replayed: đã replay thành công
+- superseded: một sự kiện mới hơn của cùng job đã được xử lý thành công, replay
+  entry này sẽ ghi đè dữ liệu mới bằng dữ liệu cũ nên được bỏ qua
+"""
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from config import settings
+from core.db import db
+
+PENDING = "pending"
+REPLAYED = "replayed"
+SUPERSEDED = "superseded"
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def dead_letter_entry(error: Any, stage: str, event=None, raw: Any = None, **source: Any) -> Dict[str, Any]:
+    """
+    `stage` là "parse" (message không hợp lệ, lưu `raw`) hoặc "apply" (lưu sự kiện đã parse).
+    `source` là vị trí của message (topic, partition, offset) nếu có.
+
+    Entry "parse" có _id theo vị trí message, để batch bị đọc lại sau lỗi tạm thời
+    không tạo thêm entry trùng cho cùng message.
+    """
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    if stage == "parse" and {"topic", "partition", "offset"} <= source.keys():
+        entry_id = f"{source['topic']}:{source['partition']}:{source['offset']}"
+    else:
+        entry_id = uuid.uuid4().hex
+    return {
+        "_id": entry_id,
+        "status": PENDING,
+        "stage": stage,
+        "jobId": event.payload.jobId if event is not None else None,
+        "eventType": event.eventType if event is not None else None,
+        "event": event.model_dump(mode="json") if event is not None else None,
+        "raw": raw if event is None else None,
+        "error": str(error),
+        "source": source,
+        "attempts": 1,
+        "failedAt": datetime.now(timezone.utc),
+    }
+
+
+class MongoDeadLetterSink:
+    def __init__(self, collection_name: str):
+        self.collection = db[collection_name]
+
+    def ensure_indexes(self) -> None:
+        try:
+            # resolve() chạy sau mỗi batch nên cần index theo jobId
+            self.collection.create_index([("jobId", ASCENDING), ("status", ASCENDING)])
+            self.collection.create_index([("status", ASCENDING), ("failedAt", ASCENDING)])
+        except PyMongoError as e:
+            print(f"Không tạo được index cho {self.collection.name}: {e}")
+
+    def send(self, entry: Dict[str, Any]) -> None:
+        self.collection.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+
+    def resolve(self, job_ids: Iterable[str]) -> None:
+        ids = list(job_ids)
+        if ids:
+            self.collection.update_many(
+                {"jobId": {"$in": ids}, "status": PENDING},
+                {"$set": {"status": SUPERSEDED, "resolvedAt": datetime.now(timezone.utc)}})
+
+    def pending(self, limit: int = 0, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"status": PENDING}
+        if stage:
+            query["stage"] = stage
+        return list(self.collection.find(query).sort("failedAt", ASCENDING).limit(limit))
+
+    def mark(self, entry_ids: List[str], status: str) -> None:
+        if entry_ids:
+            self.collection.update_many(
+                {"_id": {"$in": entry_ids}},
+                {"$set": {"status": status, "resolvedAt": datetime.now(timezone.utc)}})
+
+    def record_failure(self, entry_ids: List[str], error: Any) -> None:
+        if entry_ids:
+            self.collection.update_many(
+                {"_id": {"$in": entry_ids}},
+                {"$set": {"error": str(error), "failedAt": datetime.now(timezone.utc)}, "$inc": {"attempts": 1}})
+
+
+class FileDeadLetterSink:
+    """
+    Sink JSONL cho chạy offline. File được ghi lại toàn bộ khi trạng thái entry thay
+    đổi, nên chỉ phù hợp với DLQ nhỏ và một process ghi.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # jobId của các entry pending, để resolve() không phải đọc file sau mỗi batch
+        self._pending_job_ids = {entry["jobId"] for entry in self._read()
+                                 if entry["status"] == PENDING and entry.get("jobId")}
+
+    def ensure_indexes(self) -> None:
+        pass
+
+    def _read(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=_json_default) + "\n")
+        tmp_path.replace(self.path)
+
+    def _update(self, entry_ids: Iterable[str], changes: Dict[str, Any], inc_attempts: bool = False) -> None:
+        ids = set(entry_ids)
+        if not ids:
+            return
+        with self._lock:
+            entries = self._read()
+            for entry in entries:
+                if entry["_id"] in ids:
+                    entry.update(changes)
+                    if inc_attempts:
+                        entry["attempts"] = entry.get("attempts", 1) + 1
+            self._write(entries)
+            self._pending_job_ids = {entry["jobId"] for entry in entries
+                                     if entry["status"] == PENDING and entry.get("jobId")}
+
+    def send(self, entry: Dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            entries = self._read()
+            if any(existing["_id"] == entry["_id"] for existing in entries):
+                self._write([entry if existing["_id"] == entry["_id"] else existing
+                             for existing in entries])
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=_json_default) + "\n")
+            if entry.get("jobId"):
+                self._pending_job_ids.add(entry["jobId"])
+
+    def resolve(self, job_ids: Iterable[str]) -> None:
+        with self._lock:
+            ids = self._pending_job_ids.intersection(job_ids)
+        if not ids:
+            return
+        entry_ids = [entry["_id"] for entry in self._read()
+                     if entry["status"] == PENDING and entry.get("jobId") in ids]
+        self._update(entry_ids, {"status": SUPERSEDED, "resolvedAt": datetime.now(timezone.utc).isoformat()})
+
+    def pending(self, limit: int = 0, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+        entries = [entry for entry in self._read()
+                   if entry["status"] == PENDING and (not stage or entry["stage"] == stage)]
+        entries.sort(key=lambda entry: entry["failedAt"])
+        return entries[:limit] if limit else entries
+
+    def mark(self, entry_ids: List[str], status: str) -> None:
+        self._update(entry_ids, {"status": status, "resolvedAt": datetime.now(timezone.utc).isoformat()})
+
+    def record_failure(self, entry_ids: List[str], error: Any) -> None:
+        self._update(entry_ids, {"error": str(error), "failedAt": datetime.now(timezone.utc).isoformat()},
+                     inc_attempts=True)
+
+
+def _build_dead_letter_sink():
+    if settings.KAFKA_DLQ_BACKEND == "file":
+        return FileDeadLetterSink(settings.KAFKA_DLQ_FILE)
+    return MongoDeadLetterSink(settings.KAFKA_DLQ_COLLECTION)
+
+
+dead_letter_sink = _build_dead_letter_sink()
@@ -0,0 +1,137 @@
+# FILE: workers/file_event_source.py
+"""
+Nguồn sự kiện job đọc từ file JSONL, mỗi dòng là một JobEvent giống message Kafka.
+
+- PROVIDER_MODE=local: API gọi seed_local_stores() khi khởi động để nạp chính
+  sách và trạng thái cuối của các job vào vector store/BM25 trong bộ nhớ.
+- Chạy như worker: phát lại file theo batch qua apply_event_batch (ghi MongoDB),
+  thay cho Kafka khi cần tái hiện một luồng sự kiện cố định.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
+
+from config import settings
+from core.invalidation import publish_invalidation
+from core.llm import embedding_model
+from services.ingestion import assign_chunk_identity, to_vector_records
+from services.job_documents import build_job_documents
+from services.lexical_index import lexical_indexes
+from services.local_vector_store import _split_record, local_vector_stores
+from workers.kafka_consumer import (
+    JobEvent,
+    _parse_event,
+    apply_event_batch,
+    collapse_events,
+)
+
+
+def iter_job_events(path: str) -> Iterator[JobEvent]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = _parse_event(line.encode("utf-8"))
+            if event is not None:
+                yield event
+
+
+def replay_job_events(path: str, apply_batch: Callable[[List[JobEvent]], None],
+                      batch_size: int, events_per_second: float = 0) -> int:
+    """Phát lại file theo batch; events_per_second > 0 để giới hạn tốc độ như luồng thật."""
+    started = time.monotonic()
+    batch: List[JobEvent] = []
+    replayed = 0
+    for event in iter_job_events(path):
+        batch.append(event)
+        if len(batch) >= batch_size:
+            apply_batch(batch)
+            replayed += len(batch)
+            batch = []
+            if events_per_second > 0:
+                time.sleep(max(0.0, started + replayed / events_per_second - time.monotonic()))
+    if batch:
+        apply_batch(batch)
+        replayed += len(batch)
+    return replayed
+
+
+def _index_rows(documents: List[Document]) -> list:
+    """Embed và chuyển sang dạng (id, text, vector, metadata) như bản ghi đọc từ Mongo."""
+    vectors = embedding_model.embed_documents([doc.page_content for doc in documents]) if documents else []
+    return [_split_record(record) for record in to_vector_records(documents, vectors)]
+
+
+def _lexical_documents(rows: list) -> List[Document]:
+    return [Document(page_content=text, metadata=metadata, id=doc_id)
+            for doc_id, text, _, metadata in rows]
+
+
+def _job_rows(events: List[JobEvent]) -> tuple:
+    latest = collapse_events(events)
+    documents: List[Document] = []
+    for event in latest.values():
+        if event.eventType.upper() in ["JOB_CREATED", "JOB_UPDATED"]:
+            documents.extend(build_job_documents(event.payload))
+    return list(latest), _index_rows(documents)
+
+
+def apply_local_event_batch(events: List[JobEvent]) -> None:
+    """Tương đương apply_event_batch nhưng cập nhật các chỉ mục trong bộ nhớ của process."""
+    touched_job_ids, rows = _job_rows(events)
+    if not touched_job_ids:
+        return
+    local_vector_stores.get("recruitment").replace_groups(touched_job_ids, rows)
+    lexical_indexes.get("recruitment").replace_groups(touched_job_ids, _lexical_documents(rows))
+    print(f"Đã áp dụng batch {len(events)} sự kiện ({len(touched_job_ids)} job) vào chỉ mục trong bộ nhớ.")
+    publish_invalidation(touched_job_ids, reason="JOB_BATCH")
+
+
+def load_local_policies(path: str) -> int:
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(
+        TextLoader(path, encoding="utf-8").load())
+    documents = [assign_chunk_identity(chunk, "policies", settings.EMBEDDING_MODEL) for chunk in chunks]
+    rows = _index_rows(list({doc.id: doc for doc in documents}.values()))
+    local_vector_stores.get("company_policies").replace_all(rows)
+    lexical_indexes.get("company_policies").replace_all(_lexical_documents(rows))
+    return len(rows)
+
+
+def seed_local_stores() -> None:
+    """Nạp chính sách và trạng thái cuối của các job trong file sự kiện vào chỉ mục trong bộ nhớ."""
+    print(f"Đã nạp {load_local_policies(settings.LOCAL_POLICIES_FILE)} chunk chính sách.")
+    if not Path(settings.LOCAL_JOB_EVENTS_FILE).exists():
+        print(f"Không tìm thấy {settings.LOCAL_JOB_EVENTS_FILE}, bỏ qua dữ liệu job "
+              f"(tạo bằng: python -m scripts.export_job_events).")
+        return
+    touched_job_ids, rows = _job_rows(list(iter_job_events(settings.LOCAL_JOB_EVENTS_FILE)))
+    local_vector_stores.get("recruitment").replace_all(rows)
+    lexical_indexes.get("recruitment").replace_all(_lexical_documents(rows))
+    print(f"Đã nạp {len(rows)} chunk của {len(touched_job_ids)} job từ {settings.LOCAL_JOB_EVENTS_FILE}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phát lại sự kiện job từ file JSONL vào MongoDB.")
+    parser.add_argument("--file", default=settings.LOCAL_JOB_EVENTS_FILE)
+    parser.add_argument("--batch-size", type=int, default=settings.LOCAL_JOB_EVENTS_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Số sự kiện mỗi giây (0 = nhanh nhất có thể).")
+    args = parser.parse_args()
+
+    if settings.PROVIDER_MODE == "local":
+        # Chỉ mục trong bộ nhớ thuộc về process API, worker riêng không cập nhật được
+        print("PROVIDER_MODE=local: API tự nạp file sự kiện khi khởi động, không cần chạy worker này.")
+        return
+    started = time.monotonic()
+    replayed = replay_job_events(args.file, apply_event_batch, args.batch_size, args.rate)
+    elapsed = time.monotonic() - started
+    print(f"Đã phát lại {replayed} sự kiện trong {elapsed:.1f}s ({replayed / max(elapsed, 1e-9):.1f} sự kiện/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,26 @@
 import json
-from datetime import datetime
-from typing import List, Optional
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from kafka import KafkaConsumer
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from kafka.errors import CommitFailedError, KafkaError
 from langchain_core.documents import Document
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
+from pymongo import DeleteMany, InsertOne, UpdateMany
 
 from config import settings
 from core.db import db
+from core.indexes import ensure_job_indexes
+from core.invalidation import publish_invalidation
 from core.llm import embedding_model
+from services.ingestion import CONTENT_HASH_KEY, RetryPolicy, is_transient_error, to_vector_records
+from services.job_documents import JobPayload, build_job_documents
+from workers.dead_letter import dead_letter_entry, dead_letter_sink
 
 # True nếu dùng Cloud, False nếu local
 use_sasl = settings.KAFKA_SECURITY_ENABLED
 
 
-class JobPayload(BaseModel):
-    jobId: str
-    description: str
-    title: str
-    requirements: Optional[str] = None
-    benefits: Optional[str] = None
-    skills: Optional[List[str]] = Field(default_factory=list)
-    category: Optional[str] = None
-    area: Optional[str] = None
-    minSalary: Optional[int] = None
-    maxSalary: Optional[int] = None
-    companyName: Optional[str] = None
-    location: Optional[dict] = Field(
-        default_factory=dict)  # {city, district, address}
-    type: Optional[str] = None  # e.g., FULL_TIME, PART_TIME
-    workType: Optional[str] = None  # e.g., ON_SITE, REMOTE
-    experience: Optional[str] = None  # e.g., '1-2 Năm'
-    # Dùng datetime để dễ dàng so sánh và query
-    deadline: Optional[datetime] = None
-
-
 class JobEvent(BaseModel):
     eventType: str
     timestamp: str
@@ -45,98 +29,85 @@ class JobEvent(BaseModel):
 # --- Logic xử lý ---
 
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000, chunk_overlap=200)
 jobs_collection = db["jobs_vector"]  # Tái sử dụng collection object
 
-
-def _prepare_documents(job: JobPayload) -> list[Document]:
+# Lỗi tạm thời (rate limit của embedding API, Mongo timeout) được retry với backoff;
+# khi tách từng job để tìm sự kiện lỗi chỉ retry một lần để không kéo dài khi sự cố kéo dài
+event_retry_policy = RetryPolicy(
+    max_retries=settings.KAFKA_EVENT_MAX_RETRIES,
+    base_delay=settings.KAFKA_EVENT_RETRY_BASE_SECONDS,
+    max_delay=settings.KAFKA_EVENT_RETRY_MAX_SECONDS,
+)
+isolation_retry_policy = RetryPolicy(
+    max_retries=1,
+    base_delay=settings.KAFKA_EVENT_RETRY_BASE_SECONDS,
+    max_delay=settings.KAFKA_EVENT_RETRY_MAX_SECONDS,
+)
+
+
+def _load_existing_hashes(job_ids: List[str]) -> Dict[str, Set[str]]:
+    """content_hash của các chunk hiện có, nhóm theo job_id."""
+    existing: Dict[str, Set[str]] = {job_id: set() for job_id in job_ids}
+    cursor = jobs_collection.find(
+        {"job_id": {"$in": job_ids}}, {"job_id": 1, CONTENT_HASH_KEY: 1})
+    for record in cursor:
+        if record.get(CONTENT_HASH_KEY):
+            existing[record["job_id"]].add(record[CONTENT_HASH_KEY])
+    return existing
+
+
+def _plan_job_upsert(job_id: str, documents: List[Document], existing_hashes: Set[str]) -> Tuple[List[Document], list]:
     """
-    Chuẩn bị văn bản và metadata từ một job để embedding.
-    Làm giàu nội dung và metadata để RAG tìm kiếm tốt hơn.
+    So sánh hash của chunk mới với chunk đã lưu:
+    - chunk không đổi nội dung: chỉ cập nhật metadata bằng update_many
+    - chunk mới/đổi nội dung: cần embed rồi thêm vào
+    - chunk không còn (hoặc chunk cũ chưa có hash): xóa
+    Trả về (các chunk cần embed, các thao tác xóa/cập nhật).
     """
-    # Ghép các trường văn bản quan trọng để tạo ngữ cảnh đầy đủ
-    content_parts = [
-        f"Công ty: {job.companyName if job.companyName else 'Chưa cập nhật'}",
-        f"Tiêu đề công việc: {job.title}",
-        f"Mô tả: {job.description}"
-    ]
-    if job.requirements:
-        content_parts.append(f"Yêu cầu: {job.requirements}")
-    if job.benefits:
-        content_parts.append(f"Phúc lợi: {job.benefits}")
-    if job.type or job.workType:
-        content_parts.append(
-            f"Loại công việc: {job.type if job.type else 'N/A'}, Hình thức làm việc: {job.workType if job.workType else 'N/A'}")
-    if job.experience:
-        content_parts.append(f"Yêu cầu kinh nghiệm: {job.experience}")
-    if job.location:
-        content_parts.append(
-            f"Địa điểm: {job.location.get('city', 'N/A')}, {job.location.get('district', 'N/A')}")
-    if job.skills:
-        content_parts.append(f"Kỹ năng: {', '.join(job.skills)}")
-    if job.minSalary is not None and job.maxSalary is not None:
-        content_parts.append(f"Mức lương: {job.minSalary} - {job.maxSalary}")
-
-    content = "\n".join(content_parts)
-
-    # Metadata chứa tất cả các trường có thể lọc được
-    # page content là cái dùng để embedding
-    # TODO: metadata là để filter nếu cần thêm filter in the future
-    metadata = {
-        "source": "job_posting",
-        "job_id": job.jobId,
-        "title": job.title,
-        "companyName": job.companyName,
-        "city": job.location.get('city') if job.location else None,
-        "category": job.category,
-        "experience": job.experience,
-        "workType": job.workType,
-        "type": job.type,
-        "area": job.area,
-        "deadline": job.deadline.isoformat() if job.deadline else None
-    }
-
-    # Một job có thể được chia thành nhiều document (chunk)
-    # Mỗi chunk sẽ có cùng metadata
-    doc = Document(page_content=content, metadata=metadata)
-    split_docs = text_splitter.split_documents([doc])
-    return split_docs
+    desired_hashes = [doc.metadata[CONTENT_HASH_KEY] for doc in documents]
+    unchanged = [h for h in desired_hashes if h in existing_hashes]
+    new_docs = [doc for doc in documents
+                if doc.metadata[CONTENT_HASH_KEY] not in existing_hashes]
+
+    operations = [DeleteMany(
+        {"job_id": job_id, CONTENT_HASH_KEY: {"$nin": desired_hashes}})]
+    if unchanged:
+        # Mọi chunk của một job có cùng metadata (trừ content_hash)
+        metadata = {key: value for key, value in documents[0].metadata.items()
+                    if key != CONTENT_HASH_KEY}
+        operations.append(UpdateMany(
+            {"job_id": job_id, CONTENT_HASH_KEY: {"$in": unchanged}}, {"$set": metadata}))
+    return new_docs, operations
 
 
 def upsert_job(job: JobPayload):
     """
     Thêm mới hoặc cập nhật một job vào vector store.
-    Logic: Xóa tất cả các chunk cũ của job, sau đó thêm các chunk mới.
+    Logic: chỉ embed lại các chunk có nội dung thay đổi; chunk giữ nguyên nội dung
+    chỉ được cập nhật metadata, chunk không còn dùng bị xóa.
     """
     job_id = job.jobId
     print(f"Bắt đầu UPSERT cho job_id: {job_id}")
 
-    # 1. Xóa tất cả các chunk cũ thuộc về job_id này
-    # Đây là cách làm đúng: xóa dựa trên metadata
-    delete_result = jobs_collection.delete_many({"job_id": job_id})
-    print(f"  - Đã xóa {delete_result.deleted_count} chunk cũ.")
-
-    # 2. Chuẩn bị và thêm các chunk mới
-    documents = _prepare_documents(job)
-    if not documents:
-        print(
-            f"  - Không có document nào được tạo cho job_id: {job_id}. Bỏ qua.")
-        return
+    documents = build_job_documents(job)
+    existing_hashes = _load_existing_hashes([job_id])[job_id]
+    new_docs, operations = _plan_job_upsert(job_id, documents, existing_hashes)
 
-    vs_jobs = MongoDBAtlasVectorSearch.from_documents(
-        documents=documents,
-        embedding=embedding_model,
-        collection=jobs_collection,
-        index_name="jobs_vector_index"  # Đảm bảo index name là đúng
-    )
-    print(f"  - Đã thêm {len(documents)} chunk mới cho job_id: {job_id}")
+    vectors = embedding_model.embed_documents(
+        [doc.page_content for doc in new_docs]) if new_docs else []
+    operations.extend(InsertOne(record)
+                      for record in to_vector_records(new_docs, vectors))
+    jobs_collection.bulk_write(operations, ordered=True)
+    print(
+        f"  - Embed {len(new_docs)} chunk mới, giữ nguyên {len(documents) - len(new_docs)} chunk cho job_id: {job_id}")
+    publish_invalidation([job_id], reason="JOB_UPSERTED")
 
 
 def delete_job(job_id: str):
     """Xóa tất cả các chunk liên quan đến một job_id."""
     print(f"Bắt đầu DELETE cho job_id: {job_id}")
     delete_result = jobs_collection.delete_many({"job_id": job_id})
+    publish_invalidation([job_id], reason="JOB_DELETED")
     if delete_result.deleted_count > 0:
         print(
             f"  - Đã xóa thành công {delete_result.deleted_count} chunk của job_id: {job_id}")
@@ -144,7 +115,7 @@ def delete_job(job_id: str):
         print(f"  - Không tìm thấy chunk nào để xóa cho job_id: {job_id}")
 
 
-def start_consumer():
+def _consumer_config(**overrides) -> dict:
     common_config = dict(
         bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split(','),
         value_deserializer=lambda m: json.loads(m.decode('utf-8')),
@@ -158,6 +129,37 @@ def start_consumer():
             'sasl_plain_username': settings.KAFKA_SASL_USERNAME,
             'sasl_plain_password': settings.KAFKA_SASL_PASSWORD
         })
+    common_config.update(overrides)
+    return common_config
+
+
+def _handle_event(events: List[JobEvent]) -> None:
+    for job_event in events:
+        event_type = job_event.eventType.upper()
+        payload = job_event.payload
+
+        print(
+            f"Nhận được sự kiện: {event_type} cho job_id: {payload.jobId}")
+
+        if event_type in ["JOB_CREATED", "JOB_UPDATED"]:
+            upsert_job(payload)
+        elif event_type == "JOB_DELETED":
+            delete_job(payload.jobId)
+        else:
+            print(f"Hành động không xác định: {event_type}")
+
+
+def start_consumer():
+    # Upsert/xóa theo job_id cần index, nếu không mỗi thao tác là một lần quét collection
+    ensure_job_indexes()
+    dead_letter_sink.ensure_indexes()
+    if settings.KAFKA_CONSUMER_MODE == "batch":
+        return start_batch_consumer()
+    if settings.KAFKA_CONSUMER_MODE == "pool":
+        from workers.kafka_worker_pool import start_pool_consumer
+        return start_pool_consumer()
+
+    common_config = _consumer_config()
     # consumer = KafkaConsumer(
     #     settings.KAFKA_JOB_EVENTS_TOPIC,
     #     bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split(','),
@@ -178,27 +180,196 @@ def start_consumer():
     print("Kafka consumer đã sẵn sàng. Đang chờ sự kiện job...")
 
     for message in consumer:
+        print(f"Nhận được message: {message.value}")
+        while True:
+            try:
+                # Validate bằng model JobEvent mới; message không hợp lệ được ghi vào DLQ
+                job_event = _parse_message(message)
+                if job_event is not None:
+                    apply_with_dead_letter([job_event], _handle_event)
+                break
+            except Exception as e:
+                # Lỗi tạm thời hoặc không ghi được DLQ: thử lại message này thay vì bỏ qua
+                print(f"Lỗi xử lý message: {message.value}. Lỗi: {e}. "
+                      f"Thử lại sau {settings.KAFKA_BATCH_RETRY_SECONDS}s.")
+                time.sleep(settings.KAFKA_BATCH_RETRY_SECONDS)
+
+
+# --- Chế độ micro-batch ---
+
+
+def _decode_event(raw_value) -> JobEvent:
+    if isinstance(raw_value, dict):
+        event_data = raw_value
+    else:
+        event_data = json.loads(raw_value.decode('utf-8') if isinstance(raw_value, bytes) else raw_value)
+    return JobEvent(**event_data)
+
+
+def _parse_event(raw_value) -> Optional[JobEvent]:
+    try:
+        return _decode_event(raw_value)
+    except Exception as e:
+        print(f"Bỏ qua message không hợp lệ: {raw_value!r}. Lỗi: {e}")
+        return None
+
+
+def _parse_message(message) -> Optional[JobEvent]:
+    """
+    Parse message Kafka; message không hợp lệ được đưa vào dead-letter queue.
+    Raise nếu không ghi được vào DLQ, để caller thử lại thay vì mất message.
+    """
+    try:
+        return _decode_event(message.value)
+    except Exception as e:
+        print(f"Đưa message không hợp lệ vào dead-letter queue: {message.value!r}. Lỗi: {e}")
+        dead_letter_sink.send(dead_letter_entry(
+            e, "parse", raw=message.value if not isinstance(message.value, dict) else json.dumps(message.value),
+            topic=message.topic, partition=message.partition, offset=message.offset))
+        return None
+
+
+def collapse_events(events: List[JobEvent]) -> Dict[str, JobEvent]:
+    """Gộp các sự kiện của cùng một jobId, chỉ giữ sự kiện cuối cùng."""
+    latest: Dict[str, JobEvent] = {}
+    for event in events:
+        latest.pop(event.payload.jobId, None)
+        latest[event.payload.jobId] = event
+    return latest
+
+
+def apply_event_batch(events: List[JobEvent]) -> None:
+    """
+    Áp dụng một batch sự kiện: embed tất cả chunk có nội dung thay đổi trong một
+    lần gọi embed_documents và ghi xóa/cập nhật/thêm bằng một lần bulk_write.
+    """
+    latest = collapse_events(events)
+    if not latest:
+        return
+
+    upsert_jobs: Dict[str, List[Document]] = {}
+    touched_job_ids = []
+    for job_id, event in latest.items():
+        event_type = event.eventType.upper()
+        if event_type in ["JOB_CREATED", "JOB_UPDATED"]:
+            upsert_jobs[job_id] = build_job_documents(event.payload)
+            touched_job_ids.append(job_id)
+        elif event_type == "JOB_DELETED":
+            touched_job_ids.append(job_id)
+        else:
+            print(f"Hành động không xác định: {event_type}")
+    if not touched_job_ids:
+        return
+
+    existing = _load_existing_hashes(list(upsert_jobs))
+    operations = []
+    new_docs: List[Document] = []
+    for job_id in touched_job_ids:
+        if job_id in upsert_jobs:
+            job_new_docs, job_operations = _plan_job_upsert(
+                job_id, upsert_jobs[job_id], existing[job_id])
+            new_docs.extend(job_new_docs)
+            operations.extend(job_operations)
+        else:
+            operations.append(DeleteMany({"job_id": job_id}))
+
+    vectors = embedding_model.embed_documents(
+        [doc.page_content for doc in new_docs]) if new_docs else []
+    operations.extend(InsertOne(record)
+                      for record in to_vector_records(new_docs, vectors))
+    # ordered=True: phải xóa chunk cũ trước khi thêm chunk mới
+    jobs_collection.bulk_write(operations, ordered=True)
+    total_chunks = sum(len(docs) for docs in upsert_jobs.values())
+    print(
+        f"Đã xử lý batch {len(events)} sự kiện ({len(latest)} job): embed {len(new_docs)}/{total_chunks} chunk.")
+    publish_invalidation(touched_job_ids, reason="JOB_BATCH")
+
+
+def apply_with_dead_letter(events: List[JobEvent],
+                           apply_batch: Callable[[List[JobEvent]], None] = apply_event_batch) -> None:
+    """
+    Áp dụng batch với retry (exponential backoff có jitter). Nếu vẫn lỗi do dữ liệu,
+    áp dụng lại sự kiện cuối của từng job để tách sự kiện lỗi vào dead-letter queue;
+    các job còn lại vẫn được ghi và offset có thể commit.
+
+    Lỗi tạm thời (rate limit, MongoDB mất kết nối/timeout) được raise lại để caller
+    tạm dừng và xử lý lại cả batch sau: tách từng job lúc đó chỉ tốn thêm request và
+    đưa cả những sự kiện hợp lệ vào DLQ. Cũng raise khi không ghi được vào DLQ.
+    """
+    if not events:
+        return
+    try:
+        event_retry_policy.call(lambda: apply_batch(events), f"Batch {len(events)} sự kiện")
+        # Entry DLQ cũ của các job này đã bị sự kiện mới hơn thay thế
+        dead_letter_sink.resolve(collapse_events(events))
+        return
+    except Exception as e:
+        if is_transient_error(e):
+            raise
+        print(f"Batch {len(events)} sự kiện vẫn lỗi sau khi retry: {e}. Tách từng job để tìm sự kiện lỗi.")
+    for job_id, event in collapse_events(events).items():
         try:
-            event_data = message.value
-            print(f"Nhận được message: {message.value}")
-            # Validate bằng model JobEvent mới
-            job_event = JobEvent(**event_data)
+            isolation_retry_policy.call(lambda: apply_batch([event]), f"Job {job_id}")
+            dead_letter_sink.resolve([job_id])
+        except Exception as e:
+            if is_transient_error(e):
+                # Sự cố bắt đầu giữa chừng: các job đã ghi sẽ được ghi lại (idempotent) khi xử lý lại batch
+                raise
+            print(f"Đưa sự kiện {event.eventType} của job_id {job_id} vào dead-letter queue. Lỗi: {e}")
+            dead_letter_sink.send(dead_letter_entry(e, "apply", event=event))
 
-            event_type = job_event.eventType.upper()
-            payload = job_event.payload
 
-            print(
-                f"Nhận được sự kiện: {event_type} cho job_id: {payload.jobId}")
+def _rewind(consumer: KafkaConsumer, records: dict) -> None:
+    """Đưa offset về đầu batch để batch được xử lý lại ở lần poll sau."""
+    for topic_partition, messages in records.items():
+        if messages:
+            consumer.seek(topic_partition, messages[0].offset)
 
-            if event_type in ["JOB_CREATED", "JOB_UPDATED"]:
-                upsert_job(payload)
-            elif event_type == "JOB_DELETED":
-                delete_job(payload.jobId)
-            else:
-                print(f"Hành động không xác định: {event_type}")
 
+def start_batch_consumer():
+    """
+    Consumer micro-batch: poll tối đa N record hoặc T ms, gộp theo jobId,
+    ghi hàng loạt rồi mới commit offset thủ công.
+    """
+    consumer = KafkaConsumer(
+        settings.KAFKA_JOB_EVENTS_TOPIC,
+        **_consumer_config(
+            # Tự parse để một message lỗi không làm dừng cả batch
+            value_deserializer=None,
+            enable_auto_commit=False,
+            max_poll_records=settings.KAFKA_BATCH_MAX_RECORDS,
+        )
+    )
+    print(
+        f"Kafka batch consumer đã sẵn sàng (tối đa {settings.KAFKA_BATCH_MAX_RECORDS} record / {settings.KAFKA_BATCH_MAX_WAIT_MS} ms).")
+
+    while True:
+        records = consumer.poll(
+            timeout_ms=settings.KAFKA_BATCH_MAX_WAIT_MS,
+            max_records=settings.KAFKA_BATCH_MAX_RECORDS)
+        if not records:
+            continue
+        messages = [message for partition_messages in records.values()
+                    for message in partition_messages]
+        try:
+            events = [event for event in (_parse_message(message)
+                                          for message in messages) if event]
+            apply_with_dead_letter(events)
         except Exception as e:
-            print(f"Lỗi xử lý message: {message.value}. Lỗi: {e}")
+            print(
+                f"Lỗi xử lý batch {len(messages)} message: {e}. Sẽ thử lại batch này.")
+            _rewind(consumer, records)
+            time.sleep(settings.KAFKA_BATCH_RETRY_SECONDS)
+            continue
+        try:
+            consumer.commit()
+        except CommitFailedError as e:
+            # Batch xử lý quá max_poll_interval_ms nên group đã rebalance. Lần poll sau
+            # consumer tham gia lại group và đọc tiếp từ offset đã commit; batch này
+            # có thể được xử lý lại (ghi idempotent theo content_hash).
+            print(f"Không commit được offset do rebalance: {e}. Poll lại từ offset đã commit.")
+        except KafkaError as e:
+            print(f"Không commit được offset: {e}. Batch có thể được xử lý lại.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,370 @@
+# FILE: workers/kafka_worker_pool.py
+"""
+Consumer Kafka chạy nhiều worker song song (KAFKA_CONSUMER_MODE=pool).
+
+- Thread consumer poll message và chia cho KAFKA_POOL_WORKERS worker theo
+  crc32(jobId): mọi sự kiện của một job đi vào cùng một worker và được xử lý
+  tuần tự, nên thứ tự theo jobId được giữ nguyên. Mỗi worker gom các sự kiện
+  đang chờ thành micro-batch và gọi apply_event_batch (một lần embed_documents).
+- Offset chỉ được commit tới message cuối cùng mà mọi message trước nó trong
+  partition đã xử lý xong.
+- Backpressure: partition có quá KAFKA_POOL_MAX_IN_FLIGHT_PER_PARTITION message
+  chưa xử lý xong bị pause, và được resume khi số này giảm còn một nửa.
+- Định kỳ in lag, throughput và số message đang xử lý của từng partition.
+- Mỗi lần được giao partition là một thế hệ (generation) mới; message của thế hệ
+  đã bị thu hồi bị bỏ khỏi hàng đợi và không được xử lý, vì consumer mới nhận
+  partition có thể đã xử lý lại chúng cùng các sự kiện mới hơn của cùng job.
+
+Worker là thread vì phần tốn thời gian (gọi embedding, ghi MongoDB) là I/O; các
+KafkaConsumer API (poll/pause/resume/commit) chỉ được gọi từ thread consumer.
+"""
+import itertools
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from kafka.structs import OffsetAndMetadata, TopicPartition
+
+from config import settings
+from workers.kafka_consumer import (
+    JobEvent,
+    _consumer_config,
+    _parse_message,
+    apply_event_batch,
+    apply_with_dead_letter,
+)
+
+
+@dataclass
+class WorkItem:
+    partition: TopicPartition
+    offset: int
+    # None nếu message không hợp lệ: vẫn đi qua worker để offset được commit đúng thứ tự
+    event: Optional[JobEvent]
+    generation: int
+
+
+@dataclass
+class PartitionState:
+    generation: int
+    # Offset đã giao cho worker nhưng chưa thể commit, theo thứ tự trong partition
+    pending: Deque[int] = field(default_factory=deque)
+    done: Set[int] = field(default_factory=set)
+    # Offset tiếp theo cần commit (offset cuối đã xử lý liên tục + 1)
+    watermark: Optional[int] = None
+    committed: Optional[int] = None
+    processed: int = 0
+    paused: bool = False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.pending) - len(self.done)
+
+    def complete(self, offset: int) -> None:
+        self.done.add(offset)
+        self.processed += 1
+        while self.pending and self.pending[0] in self.done:
+            self.done.discard(self.pending[0])
+            self.watermark = self.pending.popleft() + 1
+
+
+class WorkerPool:
+    def __init__(self, workers: int, batch_size: int, retry_seconds: float,
+                 apply_batch: Callable[[List[JobEvent]], None] = apply_event_batch):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.apply_batch = apply_batch
+        self.partitions: Dict[TopicPartition, PartitionState] = {}
+        self._generations = itertools.count(1)
+        # Partition của batch mà từng worker đang xử lý
+        self._active: Dict[int, Set[TopicPartition]] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._queues: List["queue.Queue[WorkItem]"] = [queue.Queue() for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._run_worker, args=(i, q), name=f"kafka-worker-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout=self.retry_seconds + 1)
+
+    def submit(self, partition: TopicPartition, offset: int, event: Optional[JobEvent]) -> None:
+        with self._lock:
+            state = self.partitions.get(partition)
+            if state is None:
+                state = self.partitions[partition] = PartitionState(generation=next(self._generations))
+            state.pending.append(offset)
+            item = WorkItem(partition, offset, event, state.generation)
+        key = event.payload.jobId if event is not None else str(partition)
+        self._queues[zlib.crc32(key.encode("utf-8")) % len(self._queues)].put(item)
+
+    def _is_current(self, item: WorkItem) -> bool:
+        state = self.partitions.get(item.partition)
+        return state is not None and state.generation == item.generation
+
+    def _claim(self, worker: int, items: List[WorkItem]) -> List[WorkItem]:
+        """Bỏ message của partition đã bị thu hồi và đánh dấu worker đang xử lý các partition còn lại."""
+        with self._lock:
+            items = [item for item in items if self._is_current(item)]
+            self._active[worker] = {item.partition for item in items}
+        return items
+
+    def _run_worker(self, worker: int, work_queue: "queue.Queue[WorkItem]") -> None:
+        while not self._stopping.is_set():
+            try:
+                items = [work_queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Gom các sự kiện đang chờ thành một batch (một lần gọi embedding)
+            while len(items) < self.batch_size:
+                try:
+                    items.append(work_queue.get_nowait())
+                except queue.Empty:
+                    break
+            items = self._claim(worker, items)
+            try:
+                if items and self._apply(items):
+                    self._complete(items)
+            finally:
+                with self._lock:
+                    self._active.pop(worker, None)
+
+    def _apply(self, items: List[WorkItem]) -> bool:
+        events = [item.event for item in items if item.event is not None]
+        while not self._stopping.is_set():
+            try:
+                # Sự kiện vẫn lỗi sau khi retry được đưa vào dead-letter queue
+                apply_with_dead_letter(events, self.apply_batch)
+                return True
+            except Exception as e:
+                # Lỗi tạm thời hoặc không ghi được DLQ: thử lại cùng batch, các sự kiện sau
+                # của cùng job phải chờ để giữ thứ tự
+                print(f"Lỗi xử lý batch {len(events)} sự kiện: {e}. Thử lại sau {self.retry_seconds}s.")
+                self._stopping.wait(self.retry_seconds)
+                with self._lock:
+                    if not any(self._is_current(item) for item in items):
+                        # Partition đã bị thu hồi: consumer mới nhận partition sẽ xử lý lại
+                        return False
+        return False
+
+    def _complete(self, items: List[WorkItem]) -> None:
+        with self._lock:
+            for item in items:
+                # Message của partition đã bị thu hồi (kể cả khi được giao lại) thì bỏ qua
+                if self._is_current(item):
+                    self.partitions[item.partition].complete(item.offset)
+
+    def in_flight(self, partitions) -> int:
+        with self._lock:
+            return sum(self.partitions[tp].in_flight for tp in partitions if tp in self.partitions)
+
+    def commit_offsets(self, partitions=None) -> Dict[TopicPartition, OffsetAndMetadata]:
+        """Offset cần commit của các partition có tiến triển kể từ lần commit trước."""
+        offsets = {}
+        with self._lock:
+            for tp, state in self.partitions.items():
+                if partitions is not None and tp not in partitions:
+                    continue
+                if state.watermark is not None and state.watermark != state.committed:
+                    offsets[tp] = OffsetAndMetadata(state.watermark, "", -1)
+        return offsets
+
+    def mark_committed(self, offsets: Dict[TopicPartition, OffsetAndMetadata]) -> None:
+        with self._lock:
+            for tp, offset in offsets.items():
+                if tp in self.partitions:
+                    self.partitions[tp].committed = offset.offset
+
+    def drop(self, partitions) -> int:
+        """Bỏ trạng thái và các message chưa xử lý của partition bị thu hồi; trả về số message bị bỏ."""
+        partitions = set(partitions)
+        with self._lock:
+            for tp in partitions:
+                self.partitions.pop(tp, None)
+        removed = 0
+        for work_queue in self._queues:
+            with work_queue.mutex:
+                kept = [item for item in work_queue.queue if item.partition not in partitions]
+                removed += len(work_queue.queue) - len(kept)
+                work_queue.queue.clear()
+                work_queue.queue.extend(kept)
+        return removed
+
+    def active(self, partitions) -> bool:
+        """Có worker nào đang xử lý batch chứa message của các partition này không."""
+        with self._lock:
+            return any(active & set(partitions) for active in self._active.values())
+
+    def backpressure(self, max_in_flight: int):
+        """Trả về (partition cần pause, partition cần resume) theo số message đang xử lý."""
+        to_pause, to_resume = [], []
+        with self._lock:
+            for tp, state in self.partitions.items():
+                if not state.paused and state.in_flight >= max_in_flight:
+                    state.paused = True
+                    to_pause.append(tp)
+                elif state.paused and state.in_flight <= max_in_flight // 2:
+                    state.paused = False
+                    to_resume.append(tp)
+        return to_pause, to_resume
+
+    def take_stats(self) -> Dict[TopicPartition, tuple]:
+        """(watermark, số đang xử lý, số đã xử lý từ lần gọi trước, paused) của từng partition."""
+        with self._lock:
+            stats = {tp: (state.watermark, state.in_flight, state.processed, state.paused)
+                     for tp, state in self.partitions.items()}
+            for state in self.partitions.values():
+                state.processed = 0
+        return stats
+
+
+class PoolRebalanceListener(ConsumerRebalanceListener):
+    """Khi mất partition: chờ xử lý xong phần đang dở và commit trước khi consumer khác nhận partition."""
+
+    def __init__(self, pool: WorkerPool, consumer_ref: Callable[[], KafkaConsumer], timeout_seconds: float):
+        self.pool = pool
+        self.consumer_ref = consumer_ref
+        self.timeout_seconds = timeout_seconds
+
+    def on_partitions_revoked(self, revoked):
+        revoked = set(revoked)
+        if not revoked:
+            return
+        deadline = time.monotonic() + self.timeout_seconds
+        while self.pool.in_flight(revoked) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        offsets = self.pool.commit_offsets(revoked)
+        # Bỏ message chưa xử lý trước khi trả partition, để chúng không được áp dụng
+        # sau các sự kiện mới hơn mà consumer mới nhận partition xử lý
+        removed = self.pool.drop(revoked)
+        if removed:
+            print(f"Hết {self.timeout_seconds}s chờ xử lý partition bị thu hồi, "
+                  f"bỏ {removed} message chưa xử lý; consumer khác sẽ xử lý lại.")
+        # Batch đang chạy dở không dừng giữa chừng được: chờ nó xong trước khi trả partition
+        deadline = time.monotonic() + self.timeout_seconds
+        while self.pool.active(revoked) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if self.pool.active(revoked):
+            print(f"Batch của partition bị thu hồi vẫn đang chạy sau {self.timeout_seconds}s.")
+        if offsets:
+            try:
+                self.consumer_ref().commit(offsets)
+            except Exception as e:
+                print(f"Không commit được offset khi rebalance: {e}")
+
+    def on_partitions_assigned(self, assigned):
+        print(f"Được giao partition: {sorted(tp.partition for tp in assigned)}")
+
+
+class WorkerPoolConsumer:
+    def __init__(self, workers: int, max_in_flight_per_partition: int, report_seconds: float):
+        self.max_in_flight = max_in_flight_per_partition
+        self.report_seconds = report_seconds
+        self.pool = WorkerPool(
+            workers=workers,
+            batch_size=settings.KAFKA_BATCH_MAX_RECORDS,
+            retry_seconds=settings.KAFKA_BATCH_RETRY_SECONDS,
+        )
+        self.consumer = KafkaConsumer(
+            **_consumer_config(
+                # Tự parse để một message lỗi không làm dừng cả batch
+                value_deserializer=None,
+                enable_auto_commit=False,
+                max_poll_records=settings.KAFKA_BATCH_MAX_RECORDS,
+            )
+        )
+        self.consumer.subscribe(
+            [settings.KAFKA_JOB_EVENTS_TOPIC],
+            listener=PoolRebalanceListener(
+                self.pool, lambda: self.consumer, settings.KAFKA_POOL_REVOKE_TIMEOUT_SECONDS))
+        self._last_report = time.monotonic()
+
+    def _apply_backpressure(self) -> None:
+        to_pause, to_resume = self.pool.backpressure(self.max_in_flight)
+        if to_pause:
+            self.consumer.pause(*to_pause)
+        if to_resume:
+            self.consumer.resume(*to_resume)
+
+    def _commit(self) -> None:
+        offsets = self.pool.commit_offsets()
+        if not offsets:
+            return
+        try:
+            self.consumer.commit(offsets)
+            self.pool.mark_committed(offsets)
+        except Exception as e:
+            # Lần commit sau sẽ gửi lại offset mới nhất
+            print(f"Không commit được offset: {e}")
+
+    def _report(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_report
+        if elapsed < self.report_seconds:
+            return
+        self._last_report = now
+        for tp, (watermark, in_flight, processed, paused) in sorted(self.pool.take_stats().items()):
+            highwater = self.consumer.highwater(tp)
+            lag = highwater - watermark if highwater is not None and watermark is not None else "?"
+            print(f"[partition {tp.partition}] lag={lag} đang xử lý={in_flight} "
+                  f"{processed / elapsed:.1f} sự kiện/s{' (paused)' if paused else ''}")
+
+    def _submit(self, records) -> bool:
+        """
+        Parse và giao message cho worker. Nếu không ghi được message lỗi vào DLQ,
+        partition đó được seek về message này và các message sau nó trong lần poll
+        chưa được giao; trả về False để consumer tạm dừng trước lần poll sau.
+        """
+        ok = True
+        for tp, messages in records.items():
+            for message in messages:
+                try:
+                    event = _parse_message(message)
+                except Exception as e:
+                    print(f"Không ghi được message lỗi vào dead-letter queue: {e}. "
+                          f"Đọc lại partition {tp.partition} từ offset {message.offset}.")
+                    self.consumer.seek(tp, message.offset)
+                    ok = False
+                    break
+                self.pool.submit(tp, message.offset, event)
+        return ok
+
+    def run(self) -> None:
+        self.pool.start()
+        print(f"Kafka pool consumer đã sẵn sàng ({self.pool.workers} worker, "
+              f"tối đa {self.max_in_flight} message đang xử lý mỗi partition).")
+        try:
+            while True:
+                records = self.consumer.poll(
+                    timeout_ms=settings.KAFKA_BATCH_MAX_WAIT_MS,
+                    max_records=settings.KAFKA_BATCH_MAX_RECORDS)
+                if not self._submit(records):
+                    time.sleep(self.pool.retry_seconds)
+                self._apply_backpressure()
+                self._commit()
+                self._report()
+        finally:
+            self.pool.stop()
+            self._commit()
+            self.consumer.close()
+
+
+def start_pool_consumer():
+    WorkerPoolConsumer(
+        workers=settings.KAFKA_POOL_WORKERS,
+        max_in_flight_per_partition=settings.KAFKA_POOL_MAX_IN_FLIGHT_PER_PARTITION,
+        report_seconds=settings.KAFKA_POOL_REPORT_SECONDS,
+    ).run()